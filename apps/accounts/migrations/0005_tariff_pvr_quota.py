@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_remove_price_from_tariff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tariff',
+            name='pvr_quota_gb',
+            field=models.PositiveIntegerField(default=0, help_text='PVR storage in GB (0 = unlimited)'),
+        ),
+    ]
@@ -63,6 +63,7 @@ class Tariff(TimeStampedModel):
     has_pvr = models.BooleanField(default=True)
     has_vod = models.BooleanField(default=True)
     has_catchup = models.BooleanField(default=True)
+    pvr_quota_gb = models.PositiveIntegerField(default=0, help_text='PVR storage in GB (0 = unlimited)')
 
     # Channel packages (grupos de canales)
     channel_packages = models.ManyToManyField(
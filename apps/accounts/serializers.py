@@ -9,7 +9,7 @@ class TariffSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'price', 'duration_days',
             'max_devices', 'max_concurrent_streams',
             'has_timeshift', 'has_pvr', 'has_vod', 'has_catchup',
-            'is_active'
+            'pvr_quota_gb', 'is_active'
         ]
 
 
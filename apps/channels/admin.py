@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Channel, ChannelPackage, ChannelStream, Favorite
+from .models import Category, Channel, ChannelPackage, ChannelStream, Favorite, ImportJob, M3uSource, StreamHealth
 
 
 @admin.register(Category)
@@ -64,3 +64,30 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'channel', 'order', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('user__username', 'channel__name')
+
+
+@admin.register(M3uSource)
+class M3uSourceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'url', 'import_type', 'is_active', 'last_update', 'auto_update')
+    list_filter = ('is_active', 'auto_update', 'import_type')
+    search_fields = ('name', 'url')
+    readonly_fields = ('last_update',)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source', 'import_type', 'status', 'parsed', 'created', 'updated', 'errors', 'created_at')
+    list_filter = ('status', 'import_type')
+    readonly_fields = (
+        'file_size', 'bytes_done', 'chunks_done', 'parsed', 'created', 'updated',
+        'unchanged', 'errors', 'error_samples', 'error_message', 'started_at', 'finished_at'
+    )
+
+
+@admin.register(StreamHealth)
+class StreamHealthAdmin(admin.ModelAdmin):
+    list_display = ('stream', 'checked_at', 'is_up', 'status_code', 'latency_ms', 'bitrate', 'error')
+    list_filter = ('is_up',)
+    search_fields = ('stream__channel__name', 'stream__url')
+    list_select_related = ('stream__channel',)
+    date_hierarchy = 'checked_at'
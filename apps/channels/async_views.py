@@ -0,0 +1,32 @@
+"""
+Async HLS proxy endpoint for ASGI deployments (see hls.py).
+"""
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .hls import aget_playlist, check_token, decode_url, sign_url
+from .m3u import TOKEN_PLACEHOLDER
+
+
+async def hls_playlist(request):
+    """Serve a rewritten upstream playlist with the viewer's token filled in."""
+    token = request.GET.get('token', '')
+    if check_token(token) is None:
+        return HttpResponseForbidden('Invalid or expired token')
+
+    url = decode_url(request.GET.get('u', ''))
+    if not url or not url.startswith(('http://', 'https://')):
+        return HttpResponseBadRequest('Invalid playlist')
+    if not constant_time_compare(request.GET.get('s', ''), sign_url(url)):
+        return HttpResponseForbidden('Invalid signature')
+
+    template = await aget_playlist(url)
+    if template is None:
+        return HttpResponse('Upstream unavailable', status=502)
+
+    response = HttpResponse(
+        template.replace(TOKEN_PLACEHOLDER, token),
+        content_type='application/vnd.apple.mpegurl',
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
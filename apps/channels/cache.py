@@ -0,0 +1,241 @@
+"""
+Cached channel lineups, genre lists, playlists and favorites.
+
+Lineups are stored in Redis as JSON per tariff so the sync and async portal
+views share the same blobs; the M3U export of a lineup is cached next to it
+as a template with placeholders for the per-user parts. Favorites are a Redis set of channel ids per
+user. Any failure talking to Redis falls back to the database.
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.db.models import Q
+
+from apps.core.images import image_url
+from apps.core.redis_client import (
+    acached_json, cached_json, get_async_redis, get_redis, store_json
+)
+from .m3u import render_m3u
+from .models import Category, Channel, Favorite
+from .streams import STREAMS_KEY
+
+logger = logging.getLogger(__name__)
+
+LINEUP_KEY = 'lineup:tariff:{}'
+GENRES_KEY = 'lineup:genres'
+PLAYLIST_KEY = 'lineup:playlist:{}:{}'
+FAVORITES_KEY = 'favorites:user:{}'
+FAVORITES_TTL = 60 * 60 * 24
+
+# Members of a favorites set are channel ids; this one only marks the set as
+# loaded so users without favorites don't hit the database on every page
+LOADED_MARKER = '0'
+
+
+def lineup_key(tariff_id):
+    return LINEUP_KEY.format(tariff_id or 0)
+
+
+def _lineup_queryset(tariff_id):
+    channels = Channel.objects.filter(is_active=True).order_by('number')
+    if tariff_id:
+        channels = channels.filter(
+            Q(packages__tariffs__id=tariff_id) | Q(packages__isnull=True)
+        ).distinct()
+    return channels
+
+
+def _channel_card(ch):
+    return {
+        'id': str(ch.id),
+        'name': ch.name,
+        'number': ch.number,
+        'cmd': ch.stream_url,
+        'logo': image_url(ch.logo_display_url, 'logo'),
+        'censored': ch.is_adult,
+        'hd': 1 if ch.is_hd else 0,
+        'archive': 1 if ch.has_timeshift else 0,
+        'archive_range': ch.timeshift_hours,
+        'tv_genre_id': str(ch.category_id or ''),
+        'xmltv_id': ch.epg_id,
+    }
+
+
+def _genres_queryset():
+    return Category.objects.filter(is_active=True).order_by('order')
+
+
+def _genre_item(cat):
+    return {
+        'id': str(cat.id),
+        'title': cat.name,
+        'alias': cat.alias,
+        'active_sub': True,
+        'censored': cat.is_adult,
+    }
+
+
+def build_lineup(tariff_id=None):
+    """Build the channel cards visible to a tariff (None = no tariff)."""
+    return [_channel_card(ch) for ch in _lineup_queryset(tariff_id)]
+
+
+async def abuild_lineup(tariff_id=None):
+    return [_channel_card(ch) async for ch in _lineup_queryset(tariff_id)]
+
+
+def build_genres():
+    return [_genre_item(cat) for cat in _genres_queryset()]
+
+
+async def abuild_genres():
+    return [_genre_item(cat) async for cat in _genres_queryset()]
+
+
+def _cached(key, builder):
+    return cached_json(key, builder, settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+async def _acached(key, builder):
+    return await acached_json(key, builder, settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+def get_lineup(tariff_id=None):
+    """Get the cached lineup for a tariff, building it on a miss."""
+    return _cached(lineup_key(tariff_id), lambda: build_lineup(tariff_id))
+
+
+async def aget_lineup(tariff_id=None):
+    return await _acached(lineup_key(tariff_id), lambda: abuild_lineup(tariff_id))
+
+
+def in_lineup(tariff_id, channel_id):
+    """Whether a tariff's (cached) lineup includes the channel."""
+    return any(card['id'] == str(channel_id) for card in get_lineup(tariff_id))
+
+
+def get_genres():
+    """Get the cached list of active channel genres."""
+    return _cached(GENRES_KEY, build_genres)
+
+
+async def aget_genres():
+    return await _acached(GENRES_KEY, abuild_genres)
+
+
+def refresh_lineup(tariff_id=None):
+    """Rebuild and store a tariff's lineup (cache warm-up)."""
+    store_json(lineup_key(tariff_id), build_lineup(tariff_id), settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+def refresh_genres():
+    store_json(GENRES_KEY, build_genres(), settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+def get_playlist(tariff_id=None, plus=True):
+    """
+    M3U template of a tariff's lineup (see m3u.render_m3u), rendered from
+    the cached lineup and genres on a miss.
+    """
+    key = PLAYLIST_KEY.format(tariff_id or 0, 'plus' if plus else 'basic')
+    try:
+        template = get_redis().get(key)
+        if template is not None:
+            return template
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading {key}: {e}")
+
+    groups = {g['id']: g['title'] for g in get_genres()}
+    template = render_m3u(get_lineup(tariff_id), groups, plus)
+    try:
+        get_redis().set(key, template, ex=settings.QUATTRETV['LINEUP_CACHE_TTL'])
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable writing {key}: {e}")
+    return template
+
+
+def invalidate_lineups():
+    """Drop every cached lineup, playlist and stream list and the genre list."""
+    try:
+        client = get_redis()
+        keys = list(client.scan_iter(match=LINEUP_KEY.format('*')))
+        keys += client.scan_iter(match=PLAYLIST_KEY.format('*', '*'))
+        keys += client.scan_iter(match=STREAMS_KEY.format('*'))
+        client.delete(GENRES_KEY, *keys)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable invalidating lineups: {e}")
+
+
+def _favorites_queryset(user_id):
+    return Favorite.objects.filter(user_id=user_id).values_list('channel_id', flat=True)
+
+
+def get_favorite_ids(user_id):
+    """Set of a user's favorite channel ids (as strings, like lineup cards)."""
+    key = FAVORITES_KEY.format(user_id)
+    try:
+        members = get_redis().smembers(key)
+        if members:
+            return members - {LOADED_MARKER}
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading {key}: {e}")
+        return {str(i) for i in _favorites_queryset(user_id)}
+
+    channel_ids = {str(i) for i in _favorites_queryset(user_id)}
+    try:
+        pipe = get_redis().pipeline()
+        pipe.sadd(key, LOADED_MARKER, *channel_ids)
+        pipe.expire(key, FAVORITES_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable writing {key}: {e}")
+    return channel_ids
+
+
+async def aget_favorite_ids(user_id):
+    key = FAVORITES_KEY.format(user_id)
+    client = get_async_redis()
+    try:
+        members = await client.smembers(key)
+        if members:
+            return members - {LOADED_MARKER}
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading {key}: {e}")
+        return {str(i) async for i in _favorites_queryset(user_id)}
+
+    channel_ids = {str(i) async for i in _favorites_queryset(user_id)}
+    try:
+        pipe = client.pipeline()
+        pipe.sadd(key, LOADED_MARKER, *channel_ids)
+        pipe.expire(key, FAVORITES_TTL)
+        await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable writing {key}: {e}")
+    return channel_ids
+
+
+def update_favorite(user_id, channel_id, added):
+    """
+    Write-through of a Favorite row change. Only a loaded set is patched;
+    a missing one is rebuilt from the database on the next read.
+    """
+    key = FAVORITES_KEY.format(user_id)
+
+    def patch(pipe):
+        # Watched: if the set expires or is dropped meanwhile, don't
+        # recreate it without LOADED_MARKER (it would pass as complete)
+        if not pipe.exists(key):
+            return
+        pipe.multi()
+        if added:
+            pipe.sadd(key, channel_id)
+        else:
+            pipe.srem(key, channel_id)
+        pipe.expire(key, FAVORITES_TTL)
+
+    try:
+        # Retried on WatchError
+        get_redis().transaction(patch, key)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable updating {key}: {e}")
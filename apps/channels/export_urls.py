@@ -0,0 +1,9 @@
+"""
+URLs for the get.php playlist export.
+"""
+from django.urls import path
+from . import export_views
+
+urlpatterns = [
+    path('', export_views.get_playlist_view, name='get_playlist'),
+]
@@ -0,0 +1,64 @@
+"""
+Playlist export for third-party players (Xtream-style get.php).
+
+    /get.php?username=USER&password=PASS&type=m3u_plus
+
+Stream URLs are signed with the token of one of the user's active devices
+(the most recently seen one, or `mac=` to pick it).
+"""
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from apps.accounts.models import User
+from .cache import get_playlist
+from .m3u import fill_m3u
+
+
+def authenticate_subscriber(request):
+    """
+    User for the username/password query params, or an HttpResponse to
+    return instead.
+    """
+    username = request.GET.get('username', '')
+    password = request.GET.get('password', '')
+    user = User.objects.filter(username=username, is_active=True).select_related('tariff').first()
+    if not user or not password or not user.check_password(password):
+        return HttpResponseForbidden('Invalid credentials')
+    if not user.is_subscription_active:
+        return HttpResponseForbidden('Subscription expired')
+    return user
+
+
+def playlist_device(request, user):
+    """Device whose token signs the stream URLs."""
+    devices = user.devices.filter(is_active=True).order_by(F('last_seen').desc(nulls_last=True))
+    mac = request.GET.get('mac')
+    if mac:
+        devices = devices.filter(mac_address=mac.upper().replace('-', ':'))
+    return devices.first()
+
+
+@require_GET
+def get_playlist_view(request):
+    """Stream the user's lineup as M3U (`type=m3u` or `m3u_plus`)."""
+    user = authenticate_subscriber(request)
+    if isinstance(user, HttpResponse):
+        return user
+    device = playlist_device(request, user)
+    if not device:
+        return HttpResponseForbidden('No active device')
+
+    playlist_type = request.GET.get('type', 'm3u_plus')
+    if playlist_type not in ('m3u', 'm3u_plus'):
+        return HttpResponse('Unsupported type', status=400)
+
+    template = get_playlist(user.tariff_id, plus=(playlist_type == 'm3u_plus'))
+    base_url = request.build_absolute_uri('/').rstrip('/')
+
+    response = StreamingHttpResponse(
+        fill_m3u(template, device.token, base_url),
+        content_type='audio/x-mpegurl; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="quattretv.m3u"'
+    return response
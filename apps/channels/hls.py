@@ -0,0 +1,236 @@
+"""
+HLS manifest proxy.
+
+Players get a link to /hls/playlist.m3u8 carrying the upstream playlist URL
+(signed, so the proxy can't be pointed anywhere else) and a signed device
+token. The proxy fetches the upstream playlist and rewrites it:
+
+- variant and rendition playlists (master playlists) go back through the
+  proxy, keeping the viewer's token;
+- segments, keys and init sections become absolute upstream URLs with the
+  token appended, so the streaming server can check it.
+
+The rewritten playlist is cached in Redis for about one target duration
+with TOKEN_PLACEHOLDER in place of the token and shared by every viewer;
+only one request per refresh goes upstream, the rest wait for its result.
+"""
+import asyncio
+import base64
+import hashlib
+import logging
+import re
+import secrets
+import time
+import weakref
+from urllib.parse import parse_qs, urlencode, urljoin, urlsplit
+
+import httpx
+import redis
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from apps.core.redis_client import get_async_redis
+from .m3u import TOKEN_PLACEHOLDER
+from .streams import with_token
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_KEY = 'hls:playlist:{}'
+LOCK_KEY = 'hls:lock:{}'
+LOCK_TTL = 5
+# How long other requests wait for the one fetching upstream
+LOCK_WAIT = 3.0
+LOCK_POLL = 0.05
+
+MIN_TTL = 1
+MAX_LIVE_TTL = 10
+MASTER_TTL = 60
+VOD_TTL = 300
+
+PROXY_PATH = '/hls/playlist.m3u8'
+URI_ATTR_RE = re.compile(r'URI="([^"]*)"')
+# Tags whose URI is another playlist (the rest point at keys/init segments)
+PLAYLIST_URI_TAGS = ('#EXT-X-MEDIA:', '#EXT-X-I-FRAME-STREAM-INF:')
+
+_http_clients = weakref.WeakKeyDictionary()
+
+
+# ============== Signing ==============
+
+def sign_url(url):
+    return salted_hmac('hls-url', url).hexdigest()[:20]
+
+
+def encode_url(url):
+    return base64.urlsafe_b64encode(url.encode()).decode().rstrip('=')
+
+
+def decode_url(value):
+    try:
+        return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def make_token(device_id, ttl=None):
+    """Signed token for a device: '<device id>.<expiry>.<signature>'."""
+    expires = int(time.time()) + (ttl or settings.QUATTRETV['HLS_TOKEN_TTL'])
+    payload = f'{device_id}.{expires}'
+    return f"{payload}.{salted_hmac('hls-token', payload).hexdigest()[:20]}"
+
+
+def check_token(token):
+    """Device id of a valid, unexpired token; None otherwise."""
+    try:
+        device_id, expires, signature = token.split('.')
+        expired = int(expires) < time.time()
+    except ValueError:
+        return None
+    expected = salted_hmac('hls-token', f'{device_id}.{expires}').hexdigest()[:20]
+    if expired or not constant_time_compare(signature, expected):
+        return None
+    return int(device_id) if device_id.isdigit() else None
+
+
+def proxy_path(url, token=TOKEN_PLACEHOLDER):
+    """Proxy link (path and query) for an upstream playlist."""
+    query = urlencode({'u': encode_url(url), 's': sign_url(url)})
+    return f'{PROXY_PATH}?{query}&token={token}'
+
+
+def upstream_url(link):
+    """Upstream URL behind a proxy link (other links are returned as-is)."""
+    parts = urlsplit(link)
+    if parts.path != PROXY_PATH:
+        return link
+    query = parse_qs(parts.query)
+    url = decode_url(query.get('u', [''])[0])
+    if not url or not constant_time_compare(query.get('s', [''])[0], sign_url(url)):
+        return link
+    return url
+
+
+# ============== Rewriting ==============
+
+def playlist_ttl(text):
+    """Seconds a rewritten playlist may be served from cache."""
+    if '#EXT-X-STREAM-INF' in text:
+        return MASTER_TTL
+    if '#EXT-X-ENDLIST' in text:
+        return VOD_TTL
+    match = re.search(r'#EXT-X-TARGETDURATION:\s*(\d+)', text)
+    target = int(match.group(1)) if match else MAX_LIVE_TTL
+    return max(MIN_TTL, min(target, MAX_LIVE_TTL))
+
+
+def rewrite_playlist(text, base_url):
+    """
+    Rewrite an upstream playlist as a template (see module docstring).
+    `base_url` is the URL it was fetched from (after redirects).
+    """
+    is_master = '#EXT-X-STREAM-INF' in text
+
+    def media_url(uri):
+        return with_token(urljoin(base_url, uri), TOKEN_PLACEHOLDER)
+
+    def playlist_url(uri):
+        return proxy_path(urljoin(base_url, uri))
+
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            if 'URI="' in line:
+                rewrite = playlist_url if line.startswith(PLAYLIST_URI_TAGS) else media_url
+                line = URI_ATTR_RE.sub(lambda m: f'URI="{rewrite(m.group(1))}"', line)
+            lines.append(line)
+        elif is_master:
+            lines.append(playlist_url(line))
+        else:
+            lines.append(media_url(line))
+    return '\n'.join(lines) + '\n'
+
+
+# ============== Fetching ==============
+
+def _get_http_client():
+    """One pooled client per event loop (like redis_client.get_async_redis)."""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=settings.QUATTRETV['STREAM_PROBE_TIMEOUT'],
+            follow_redirects=True,
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def _fetch_and_store(url, key):
+    response = await _get_http_client().get(url)
+    response.raise_for_status()
+    text = response.text
+    if not text.lstrip().startswith('#EXTM3U'):
+        raise ValueError('Not an HLS playlist')
+    template = rewrite_playlist(text, str(response.url))
+    try:
+        await get_async_redis().set(key, template, ex=playlist_ttl(text))
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable writing {key}: {e}")
+    return template
+
+
+async def _release_lock(client, key, token):
+    """Delete a fetch lock only if it is still ours (it may have expired and been taken)."""
+    try:
+        async with client.pipeline() as pipe:
+            await pipe.watch(key)
+            if await pipe.get(key) == token:
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+    except redis.RedisError:
+        # WatchError included: someone else has it now
+        pass
+
+
+async def aget_playlist(url):
+    """
+    Rewritten playlist template of an upstream URL; None if upstream fails.
+    Concurrent misses are collapsed into a single upstream fetch.
+    """
+    url_key = hashlib.sha1(url.encode()).hexdigest()[:16]
+    key = PLAYLIST_KEY.format(url_key)
+    lock_key = LOCK_KEY.format(url_key)
+    lock_token = None
+    client = get_async_redis()
+    try:
+        template = await client.get(key)
+        if template is not None:
+            return template
+
+        token = secrets.token_hex(8)
+        if await client.set(lock_key, token, nx=True, ex=LOCK_TTL):
+            lock_token = token
+        else:
+            # Someone else is fetching it: wait for their result
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL)
+                template = await client.get(key)
+                if template is not None:
+                    return template
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading {key}: {e}")
+
+    try:
+        return await _fetch_and_store(url, key)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"HLS upstream {url} failed: {e}")
+        return None
+    finally:
+        # Waiters that gave up fetch too, but never release a lock they don't hold
+        if lock_token:
+            await _release_lock(client, lock_key, lock_token)
@@ -0,0 +1,9 @@
+"""
+URLs for the HLS manifest proxy.
+"""
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('playlist.m3u8', async_views.hls_playlist, name='hls_playlist'),
+]
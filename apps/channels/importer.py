@@ -0,0 +1,244 @@
+"""
+Set-based M3U channel import.
+
+Channels, categories and main streams are loaded once into lookup maps; the
+entries of a playlist are matched in memory (by tvg-id, then by name) and the
+resulting creates/updates are written with bulk_create/bulk_update inside a
+single transaction. A dry run returns the same report without writing.
+"""
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.core.warmup import schedule_warmup
+from .cache import invalidate_lineups
+from .models import Category, Channel, ChannelStream
+
+# Radio numbering starts after this to avoid clashing with TV (number is unique)
+RADIO_NUMBER_BASE = 1000
+
+CHANNEL_UPDATE_FIELDS = [
+    'stream_url', 'logo_url', 'category', 'epg_id', 'is_hd', 'is_4k', 'is_radio',
+    'has_catchup', 'timeshift_hours',
+]
+
+MAX_LENGTHS = {
+    'name': Channel._meta.get_field('name').max_length,
+    'url': Channel._meta.get_field('stream_url').max_length,
+    'logo': Channel._meta.get_field('logo_url').max_length,
+    'tvg_id': Channel._meta.get_field('epg_id').max_length,
+    'group': Category._meta.get_field('name').max_length,
+}
+
+
+def quality_flags(name):
+    upper = name.upper()
+    return {
+        'is_hd': 'HD' in upper or '1080' in name,
+        'is_4k': '4K' in upper or 'UHD' in upper,
+    }
+
+
+def display(value):
+    return '' if value is None else str(value)
+
+
+def validate_entry(entry):
+    """Error message for an entry that can't be imported, None if valid."""
+    if not entry.get('name') or not entry.get('url'):
+        return 'Falta nombre o URL'
+    for key, max_length in MAX_LENGTHS.items():
+        if len(entry.get(key) or '') > max_length:
+            return f'{key} supera {max_length} caracteres'
+    return None
+
+
+class ChannelImporter:
+    """
+    Import parsed M3U entries (dicts with name, url and optionally tvg_id,
+    logo, group and catchup_days) as TV or radio channels.
+
+    The lookup maps live for the lifetime of the importer, so it can be fed
+    several chunks of the same playlist; channels created by one entry are
+    matched by later ones just like in a sequential import. A dry run
+    leaves the maps as if it had been applied, so use a fresh importer for
+    the real run.
+    """
+
+    def __init__(self, is_radio=False):
+        self.is_radio = is_radio
+
+        self.categories = {c.name: c for c in Category.objects.all()}
+        self.aliases = set(Category.objects.values_list('alias', flat=True))
+
+        self.by_epg_id = {}
+        self.by_name = {}
+        for channel in Channel.objects.select_related('category'):
+            self._remember(channel)
+
+        # Main (highest priority) stream of each channel
+        self.streams = {}
+        for stream in ChannelStream.objects.order_by('channel_id', '-priority'):
+            self.streams.setdefault(stream.channel_id, stream)
+
+        numbers = Channel.objects.aggregate(
+            tv=Max('number', filter=Q(is_radio=False)),
+            radio=Max('number', filter=Q(is_radio=True)),
+        )
+        self.next_number = {
+            False: numbers['tv'] or 0,
+            True: numbers['radio'] or RADIO_NUMBER_BASE,
+        }
+        self.used_numbers = set(Channel.objects.values_list('number', flat=True))
+
+    def _remember(self, channel):
+        if channel.epg_id:
+            self.by_epg_id.setdefault(channel.epg_id, channel)
+        self.by_name.setdefault(channel.name.lower(), channel)
+
+    def _find(self, entry):
+        if entry.get('tvg_id') and entry['tvg_id'] in self.by_epg_id:
+            return self.by_epg_id[entry['tvg_id']]
+        return self.by_name.get(entry['name'].lower())
+
+    def _next_number(self):
+        # Correlative, skipping numbers taken by the other list
+        number = self.next_number[self.is_radio] + 1
+        while number in self.used_numbers:
+            number += 1
+        self.next_number[self.is_radio] = number
+        self.used_numbers.add(number)
+        return number
+
+    def _category(self, name, new_categories):
+        category = self.categories.get(name)
+        if category is None:
+            max_length = Category._meta.get_field('alias').max_length
+            alias = base = slugify(name)[:max_length].rstrip('-') or 'sin-categoria'
+            suffix = 2
+            while alias in self.aliases:
+                # Cut the base so the -N suffix still fits
+                tail = f'-{suffix}'
+                alias = base[:max_length - len(tail)].rstrip('-') + tail
+                suffix += 1
+            category = Category(name=name, alias=alias, is_active=True)
+            self.categories[name] = category
+            self.aliases.add(alias)
+            new_categories.append(category)
+        return category
+
+    def run(self, entries, dry_run=False):
+        """
+        Import a batch of entries and return a report:
+        counts plus the created channels, field-level diffs of updated ones,
+        new categories and rejected entries.
+        """
+        report = {
+            'parsed': 0,
+            'created': [],
+            'updated': [],
+            'unchanged': 0,
+            'categories': [],
+            'errors': [],
+        }
+        new_categories = []
+        new_channels = []
+        changed_channels = {}
+        changed_fields = set()
+        new_streams = []
+        changed_streams = {}
+
+        for entry in entries:
+            report['parsed'] += 1
+            error = validate_entry(entry)
+            if error:
+                report['errors'].append({'name': entry.get('name', ''), 'error': error})
+                continue
+
+            category = self._category(entry['group'], new_categories) if entry.get('group') else None
+            values = {
+                'stream_url': entry['url'],
+                'is_radio': self.is_radio,
+                **quality_flags(entry['name']),
+            }
+            if entry.get('logo'):
+                values['logo_url'] = entry['logo']
+            if category:
+                values['category'] = category
+            if entry.get('tvg_id'):
+                values['epg_id'] = entry['tvg_id']
+            if (entry.get('catchup_days') or 0) > 0:
+                values['has_catchup'] = True
+                values['timeshift_hours'] = entry['catchup_days'] * 24
+
+            channel = self._find(entry)
+            if channel is None:
+                channel = Channel(
+                    name=entry['name'],
+                    number=self._next_number(),
+                    is_active=True,
+                    **{'logo_url': '', 'epg_id': '', **values},
+                )
+                self._remember(channel)
+                new_channels.append(channel)
+                report['created'].append({'name': channel.name, 'number': channel.number})
+                continue
+
+            changes = {}
+            for field, value in values.items():
+                old = getattr(channel, field)
+                if old != value:
+                    changes[field] = (display(old), display(value))
+                    setattr(channel, field, value)
+            self._remember(channel)
+
+            # Channels created earlier in this import are saved with their
+            # latest values; existing ones get their main stream synced
+            if channel.pk is not None:
+                if changes:
+                    changed_channels[channel.pk] = channel
+                    changed_fields.update(changes)
+                stream = self.streams.get(channel.pk)
+                if stream is None:
+                    stream = ChannelStream(channel=channel, name='Principal', priority=100)
+                    self.streams[channel.pk] = stream
+                    new_streams.append(stream)
+                if stream.url != entry['url']:
+                    stream.url = entry['url']
+                    if stream.pk:
+                        changed_streams[stream.pk] = stream
+
+            if changes:
+                report['updated'].append({'name': channel.name, 'number': channel.number, 'changes': changes})
+            else:
+                report['unchanged'] += 1
+
+        report['categories'] = [c.name for c in new_categories]
+        if dry_run:
+            return report
+
+        now = timezone.now()
+        with transaction.atomic():
+            Category.objects.bulk_create(new_categories)
+            Channel.objects.bulk_create(new_channels)
+
+            for channel in new_channels:
+                stream = ChannelStream(channel=channel, url=channel.stream_url, name='Principal', priority=100)
+                self.streams[channel.pk] = stream
+                new_streams.append(stream)
+            ChannelStream.objects.bulk_create(new_streams)
+
+            for obj in [*changed_channels.values(), *changed_streams.values()]:
+                obj.updated_at = now
+            if changed_channels:
+                # Only the columns that actually changed somewhere
+                fields = [f for f in CHANNEL_UPDATE_FIELDS if f in changed_fields]
+                Channel.objects.bulk_update(changed_channels.values(), fields + ['updated_at'], batch_size=500)
+            ChannelStream.objects.bulk_update(changed_streams.values(), ['url', 'updated_at'], batch_size=500)
+
+            # Bulk writes don't send signals
+            transaction.on_commit(invalidate_lineups)
+            transaction.on_commit(schedule_warmup)
+
+        return report
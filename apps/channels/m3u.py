@@ -0,0 +1,181 @@
+"""
+M3U/M3U8 playlist parsing and rendering.
+
+Playlists are read line by line, so large provider files (and uploads
+already on disk) never need to be held in memory as a single string.
+Every `key="value"` attribute of an #EXTINF line is extracted in a single
+pass with one compiled pattern.
+"""
+import re
+
+ATTR_RE = re.compile(r'([A-Za-z0-9_-]+)="([^"]*)"')
+# The run of attributes at the start of an #EXTINF line: it ends at the
+# first comma outside an attribute (what follows is the channel name)
+ATTRS_SPAN_RE = re.compile(r'(?:[^,"]*?[A-Za-z0-9_-]+="[^"]*")*')
+
+# M3U attribute -> record key
+ATTR_KEYS = {
+    'tvg-id': 'tvg_id',
+    'tvg-name': 'tvg_name',
+    'tvg-logo': 'logo',
+    'group-title': 'group',
+    'catchup': 'catchup',
+    'catchup-source': 'catchup_source',
+}
+
+
+def decode_lines(lines):
+    """Decode byte lines as UTF-8, falling back to latin-1."""
+    for line in lines:
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                line = line.decode('latin-1')
+        yield line
+
+
+def parse_extinf(line):
+    """Parse an #EXTINF line into a record (without url)."""
+    end = ATTRS_SPAN_RE.match(line, 8).end()
+    attrs = dict(ATTR_RE.findall(line, 8, end))
+    record = {attrs_key: attrs[attr] for attr, attrs_key in ATTR_KEYS.items() if attr in attrs}
+
+    if 'tvg-chno' in attrs:
+        try:
+            record['number'] = int(attrs['tvg-chno'])
+        except ValueError:
+            pass
+    if 'catchup-days' in attrs:
+        try:
+            record['catchup_days'] = int(attrs['catchup-days'])
+        except ValueError:
+            pass
+
+    # Channel name: after the comma that follows the last attribute
+    _, comma, name = line[end:].partition(',')
+    name = name.strip()
+    if comma and name:
+        record['name'] = name
+    elif 'tvg-name' in attrs:
+        record['name'] = attrs['tvg-name']
+
+    record['attrs'] = attrs
+    return record
+
+
+def iter_m3u(lines):
+    """
+    Yield channel records lazily from M3U lines (str or bytes).
+
+    Records have name and url plus, when present, tvg_id, tvg_name, logo,
+    group (group-title or #EXTGRP), number (tvg-chno), catchup,
+    catchup_days, catchup_source, vlc_opts (#EXTVLCOPT) and the raw attrs.
+    """
+    current_channel = None
+    group = None
+    vlc_opts = {}
+
+    for line in decode_lines(lines):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line[0] == '#':
+            if line.startswith('#EXTINF:'):
+                current_channel = parse_extinf(line)
+            elif line.startswith('#EXTGRP:'):
+                group = line[8:].strip()
+            elif line.startswith('#EXTVLCOPT:'):
+                key, _, value = line[11:].partition('=')
+                vlc_opts[key.strip()] = value.strip()
+            continue
+
+        if current_channel is None:
+            continue
+
+        # This is the URL line - clean Stalker "ffmpeg " prefix if present
+        url = line[7:] if line.startswith('ffmpeg ') else line
+        current_channel['url'] = url
+        if group and not current_channel.get('group'):
+            current_channel['group'] = group
+        if vlc_opts:
+            current_channel['vlc_opts'] = vlc_opts
+        if current_channel.get('name'):
+            yield current_channel
+        # #EXTGRP/#EXTVLCOPT may come before or after #EXTINF, never past the URL
+        current_channel = None
+        group = None
+        vlc_opts = {}
+
+
+def parse_m3u(content):
+    """Parse M3U/M3U8 content and extract channel data."""
+    return list(iter_m3u(content.splitlines()))
+
+
+# ============== Rendering ==============
+
+# Filled in per request when a cached render is served
+TOKEN_PLACEHOLDER = '{{token}}'
+BASE_URL_PLACEHOLDER = '{{base_url}}'
+
+
+def _attr(value):
+    return str(value).replace('"', "'")
+
+
+def render_extinf(card, group='', plus=True):
+    """#EXTINF line of a lineup card; `plus` adds the extended attributes."""
+    name = card['name']
+    if not plus:
+        return f'#EXTINF:-1,{name}'
+
+    logo = card.get('logo') or ''
+    if logo.startswith('/'):
+        logo = BASE_URL_PLACEHOLDER + logo
+    attrs = [
+        f'tvg-id="{_attr(card.get("xmltv_id") or "")}"',
+        f'tvg-name="{_attr(name)}"',
+        f'tvg-logo="{_attr(logo)}"',
+        f'tvg-chno="{card["number"]}"',
+        f'group-title="{_attr(group)}"',
+    ]
+    if card.get('archive'):
+        attrs.append('catchup="default"')
+        attrs.append(f'catchup-days="{max(1, card.get("archive_range", 0) // 24)}"')
+    return f'#EXTINF:-1 {" ".join(attrs)},{name}'
+
+
+def render_m3u(cards, groups, plus=True):
+    """
+    Render lineup cards as a playlist template.
+
+    Stream URLs carry TOKEN_PLACEHOLDER and uploaded logos
+    BASE_URL_PLACEHOLDER, so one render serves every user of a tariff.
+    `groups` maps genre id -> title.
+    """
+    lines = ['#EXTM3U']
+    for card in cards:
+        url = card['cmd']
+        separator = '&' if '?' in url else '?'
+        lines.append(render_extinf(card, groups.get(card.get('tv_genre_id'), ''), plus))
+        lines.append(f'{url}{separator}token={TOKEN_PLACEHOLDER}')
+    return '\n'.join(lines) + '\n'
+
+
+def fill_m3u(template, token, base_url, chunk_size=64 * 1024):
+    """
+    Yield a rendered template in chunks with the placeholders filled in.
+    Chunks end on line boundaries so no placeholder is ever split.
+    """
+    start = 0
+    while start < len(template):
+        end = template.find('\n', start + chunk_size)
+        end = len(template) if end == -1 else end + 1
+        yield (
+            template[start:end]
+            .replace(TOKEN_PLACEHOLDER, token)
+            .replace(BASE_URL_PLACEHOLDER, base_url)
+        )
+        start = end
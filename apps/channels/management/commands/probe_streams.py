@@ -0,0 +1,47 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from apps.channels.models import ChannelStream
+from apps.channels.prober import probe_streams, probe_urls
+
+
+class Command(BaseCommand):
+    help = 'Check stream availability, latency and bitrate (HLS playlist + first segment)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Streams probed at once (default: STREAM_PROBE_CONCURRENCY)')
+        parser.add_argument('--timeout', type=int, help='Seconds per request (default: STREAM_PROBE_TIMEOUT)')
+        parser.add_argument('--channel', type=int, action='append', help='Only streams of this channel id')
+        parser.add_argument(
+            '--url', action='append',
+            help='Probe this URL only, without saving anything (e.g. a local test server)'
+        )
+
+    def handle(self, *args, **options):
+        if options['url']:
+            results = asyncio.run(probe_urls(options['url'], options['concurrency'], options['timeout']))
+            rows = [(url, result) for url, result in results.items()]
+        else:
+            streams = None
+            if options['channel']:
+                streams = ChannelStream.objects.filter(
+                    channel_id__in=options['channel'], is_active=True
+                ).select_related('channel')
+            rows = [
+                (f'{stream.channel.name} / {stream.name}', result)
+                for stream, result in probe_streams(streams, options['concurrency'], options['timeout'])
+            ]
+
+        for label, result in rows:
+            latency = f"{result['latency_ms']} ms" if result['latency_ms'] is not None else '-'
+            bitrate = f"{result['bitrate'] / 1_000_000:.1f} Mb/s" if result['bitrate'] else '-'
+            line = f'  {label[:48]:<48} {latency:>8} {bitrate:>11}'
+            if result['ok']:
+                self.stdout.write(line)
+            else:
+                self.stdout.write(self.style.ERROR(f"{line}  {result['error']}"))
+
+        down = sum(1 for _, result in rows if not result['ok'])
+        style = self.style.WARNING if down else self.style.SUCCESS
+        self.stdout.write(style(f'{len(rows)} streams probed, {down} down'))
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0002_channel_is_radio'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='M3uSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100)),
+                ('url', models.URLField(help_text='M3U/M3U8 playlist URL', max_length=500)),
+                ('import_type', models.CharField(choices=[('tv', 'TV'), ('radio', 'Radio')], default='tv', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_update', models.DateTimeField(blank=True, null=True)),
+                ('update_interval', models.PositiveIntegerField(default=86400, help_text='Update interval in seconds')),
+                ('auto_update', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'M3U Source',
+                'verbose_name_plural': 'M3U Sources',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('file', models.FileField(blank=True, upload_to='imports/')),
+                ('import_type', models.CharField(choices=[('tv', 'TV'), ('radio', 'Radio')], default='tv', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En curso'), ('done', 'Completada'), ('failed', 'Fallida')], db_index=True, default='pending', max_length=10)),
+                ('file_size', models.PositiveBigIntegerField(default=0)),
+                ('bytes_done', models.PositiveBigIntegerField(default=0, help_text='File offset after the last committed chunk')),
+                ('chunks_done', models.PositiveIntegerField(default=0)),
+                ('parsed', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('unchanged', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('error_samples', models.JSONField(blank=True, default=list)),
+                ('error_message', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('source', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='channels.m3usource')),
+            ],
+            options={
+                'verbose_name': 'Import Job',
+                'verbose_name_plural': 'Import Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0003_import_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_at', models.DateTimeField(db_index=True)),
+                ('is_up', models.BooleanField()),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, help_text='Time to the playlist response', null=True)),
+                ('bitrate', models.PositiveIntegerField(blank=True, help_text='bits/s', null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('stream', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_checks', to='channels.channelstream')),
+            ],
+            options={
+                'verbose_name': 'Stream Health',
+                'verbose_name_plural': 'Stream Health',
+                'ordering': ['-checked_at'],
+                'indexes': [models.Index(fields=['stream', '-checked_at'], name='channels_st_stream__e212f3_idx')],
+            },
+        ),
+    ]
@@ -163,6 +163,32 @@ class ChannelStream(TimeStampedModel, ActivableModel):
         return f"{self.channel.name} - {self.name}"
 
 
+class StreamHealth(models.Model):
+    """Result of one stream probe (history; the latest state lives in Redis)."""
+    stream = models.ForeignKey(
+        ChannelStream,
+        on_delete=models.CASCADE,
+        related_name='health_checks'
+    )
+    checked_at = models.DateTimeField(db_index=True)
+    is_up = models.BooleanField()
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    latency_ms = models.PositiveIntegerField(null=True, blank=True, help_text='Time to the playlist response')
+    bitrate = models.PositiveIntegerField(null=True, blank=True, help_text='bits/s')
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = 'Stream Health'
+        verbose_name_plural = 'Stream Health'
+        ordering = ['-checked_at']
+        indexes = [
+            models.Index(fields=['stream', '-checked_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.stream} {'up' if self.is_up else 'down'} ({self.checked_at})"
+
+
 class Favorite(TimeStampedModel):
     """User's favorite channels."""
     user = models.ForeignKey(
@@ -185,3 +211,88 @@ class Favorite(TimeStampedModel):
 
     def __str__(self):
         return f"{self.user.username} - {self.channel.name}"
+
+
+class ImportType(models.TextChoices):
+    TV = 'tv', 'TV'
+    RADIO = 'radio', 'Radio'
+
+
+class M3uSource(TimeStampedModel):
+    """Remote M3U playlist imported periodically."""
+    name = models.CharField(max_length=100)
+    url = models.URLField(max_length=500, help_text='M3U/M3U8 playlist URL')
+    import_type = models.CharField(max_length=10, choices=ImportType.choices, default=ImportType.TV)
+    is_active = models.BooleanField(default=True)
+    last_update = models.DateTimeField(null=True, blank=True)
+    update_interval = models.PositiveIntegerField(
+        default=86400,
+        help_text='Update interval in seconds'
+    )
+    auto_update = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = 'M3U Source'
+        verbose_name_plural = 'M3U Sources'
+
+    def __str__(self):
+        return self.name
+
+
+class ImportJob(TimeStampedModel):
+    """Background M3U import, processed in committed chunks."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pendiente'
+        RUNNING = 'running', 'En curso'
+        DONE = 'done', 'Completada'
+        FAILED = 'failed', 'Fallida'
+
+    source = models.ForeignKey(
+        M3uSource,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    created_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    file = models.FileField(upload_to='imports/', blank=True)
+    import_type = models.CharField(max_length=10, choices=ImportType.choices, default=ImportType.TV)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, db_index=True)
+
+    # Progress, saved with every committed chunk
+    file_size = models.PositiveBigIntegerField(default=0)
+    bytes_done = models.PositiveBigIntegerField(default=0, help_text='File offset after the last committed chunk')
+    chunks_done = models.PositiveIntegerField(default=0)
+    parsed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    error_samples = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True)
+
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Import Job'
+        verbose_name_plural = 'Import Jobs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self):
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.file_size:
+            return 0
+        return min(99, int(self.bytes_done * 100 / self.file_size))
@@ -0,0 +1,185 @@
+"""
+Stream health prober.
+
+Every active HTTP(S) ChannelStream is checked concurrently with asyncio
+(bounded by a semaphore): the playlist is fetched, a master playlist is
+followed to its first variant, and the first segment of the media playlist
+is downloaded to measure the real bitrate (its size over its #EXTINF
+duration). Non-HLS streams only need to start sending data. Results go to Redis (read by the failover engine in
+apps.channels.streams) and to the StreamHealth history table.
+"""
+import asyncio
+import logging
+import time
+from urllib.parse import urljoin
+
+import httpx
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChannelStream, StreamHealth
+from .streams import store_probe_results
+
+logger = logging.getLogger(__name__)
+
+# Enough to prove a segment downloads without pulling whole 4K chunks
+SEGMENT_MAX_BYTES = 2 * 1024 * 1024
+# Also caps what is read of a non-HLS (endless) stream
+PLAYLIST_MAX_BYTES = 256 * 1024
+# StreamHealth.bitrate is a PositiveIntegerField
+MAX_BITRATE = 2_147_483_647
+
+USER_AGENT = 'QuattreTV-Prober/1.0'
+
+
+class ProbeError(Exception):
+    pass
+
+
+def parse_playlist(text, base_url):
+    """
+    Minimal HLS parsing: (variants, segments).
+    variants: [(url, bandwidth)] of a master playlist.
+    segments: [(url, duration)] of a media playlist.
+    """
+    variants, segments = [], []
+    pending_bandwidth = pending_duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            pending_bandwidth = 0
+            for attr in line[18:].split(','):
+                key, _, value = attr.partition('=')
+                if key.strip() == 'BANDWIDTH' and value.isdigit():
+                    pending_bandwidth = int(value)
+        elif line.startswith('#EXTINF:'):
+            try:
+                pending_duration = float(line[8:].split(',', 1)[0])
+            except ValueError:
+                pending_duration = 0.0
+        elif not line.startswith('#'):
+            url = urljoin(base_url, line)
+            if pending_bandwidth is not None:
+                variants.append((url, pending_bandwidth))
+            elif pending_duration is not None:
+                segments.append((url, pending_duration))
+            pending_bandwidth = pending_duration = None
+    return variants, segments
+
+
+async def _read(client, url, max_bytes):
+    """(status, body bytes up to max_bytes, full size or None if unknown) of a GET."""
+    async with client.stream('GET', url) as response:
+        if response.status_code >= 400:
+            raise ProbeError(f'HTTP {response.status_code}', response.status_code)
+        length = response.headers.get('Content-Length')
+        size = int(length) if length and length.isdigit() else None
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) >= max_bytes:
+                return response.status_code, bytes(body[:max_bytes]), size
+        return response.status_code, bytes(body), len(body)
+
+
+async def probe_url(client, url):
+    """
+    Probe one stream URL. Returns a dict with ok, status_code, latency_ms,
+    bitrate (bits/s, None if unknown) and error.
+    """
+    result = {'ok': False, 'status_code': None, 'latency_ms': None, 'bitrate': None, 'error': ''}
+    started = time.perf_counter()
+    try:
+        status, body, _ = await _read(client, url, PLAYLIST_MAX_BYTES)
+        result['status_code'] = status
+        result['latency_ms'] = int((time.perf_counter() - started) * 1000)
+
+        if not body.lstrip().startswith(b'#EXTM3U'):
+            # Plain HTTP/TS stream: it's up if it sends data
+            if not body:
+                raise ProbeError('Empty response')
+            result['ok'] = True
+            return result
+
+        variants, segments = parse_playlist(body.decode('utf-8', 'replace'), url)
+        if variants:
+            variant_url, bandwidth = variants[0]
+            result['bitrate'] = min(bandwidth, MAX_BITRATE) or None
+            _, body, _ = await _read(client, variant_url, PLAYLIST_MAX_BYTES)
+            _, segments = parse_playlist(body.decode('utf-8', 'replace'), variant_url)
+        if not segments:
+            raise ProbeError('Playlist without segments')
+
+        segment_url, duration = segments[0]
+        _, data, size = await _read(client, segment_url, SEGMENT_MAX_BYTES)
+        if not data:
+            raise ProbeError('Empty segment')
+        # A partial read without Content-Length keeps the variant BANDWIDTH
+        # (download speed says nothing about the stream)
+        if size and duration > 0:
+            result['bitrate'] = min(int(size * 8 / duration), MAX_BITRATE)
+        result['ok'] = True
+    except ProbeError as e:
+        result['error'] = e.args[0]
+        if len(e.args) > 1:
+            result['status_code'] = e.args[1]
+    except httpx.TimeoutException:
+        result['error'] = 'Timeout'
+    except httpx.HTTPError as e:
+        result['error'] = f'{type(e).__name__}: {e}'[:255]
+    return result
+
+
+async def probe_urls(urls, concurrency=None, timeout=None, transport=None):
+    """
+    Probe many URLs with at most `concurrency` in flight.
+    Returns {url: result}. `transport` lets callers plug in a test transport.
+    """
+    concurrency = concurrency or settings.QUATTRETV['STREAM_PROBE_CONCURRENCY']
+    timeout = timeout or settings.QUATTRETV['STREAM_PROBE_TIMEOUT']
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(
+        timeout=timeout, limits=limits, transport=transport,
+        follow_redirects=True, headers={'User-Agent': USER_AGENT},
+    ) as client:
+        async def bounded(url):
+            async with semaphore:
+                return url, await probe_url(client, url)
+
+        return dict(await asyncio.gather(*(bounded(url) for url in set(urls))))
+
+
+def probe_streams(streams=None, concurrency=None, timeout=None):
+    """
+    Probe active HTTP(S) ChannelStreams (all by default), store the results
+    and return (stream, result) pairs.
+    """
+    full_run = streams is None
+    if full_run:
+        streams = ChannelStream.objects.filter(is_active=True, channel__is_active=True).select_related('channel')
+    streams = [s for s in streams if s.url.startswith(('http://', 'https://'))]
+    if not streams:
+        return []
+
+    results = asyncio.run(probe_urls([s.url for s in streams], concurrency, timeout))
+
+    now = timezone.now()
+    StreamHealth.objects.bulk_create([
+        StreamHealth(
+            stream=stream,
+            checked_at=now,
+            is_up=results[stream.url]['ok'],
+            status_code=results[stream.url]['status_code'],
+            latency_ms=results[stream.url]['latency_ms'],
+            bitrate=results[stream.url]['bitrate'],
+            error=results[stream.url]['error'],
+        )
+        for stream in streams
+    ], batch_size=1000)
+
+    store_probe_results(results, replace=full_run)
+    return [(stream, results[stream.url]) for stream in streams]
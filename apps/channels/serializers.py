@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Category, Channel, ChannelPackage, ChannelStream, Favorite
+from .models import Category, Channel, ChannelPackage, ChannelStream, Favorite, M3uSource
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -79,3 +79,12 @@ class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
         fields = ['id', 'channel', 'channel_id', 'order', 'created_at']
+
+
+class M3uSourceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = M3uSource
+        fields = [
+            'id', 'name', 'url', 'import_type', 'is_active',
+            'last_update', 'update_interval', 'auto_update'
+        ]
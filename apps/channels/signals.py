@@ -0,0 +1,40 @@
+"""
+Keep cached lineups and favorites in sync with the database.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from apps.accounts.models import Tariff
+from apps.core.warmup import schedule_warmup
+from .cache import invalidate_lineups, update_favorite
+from .models import Category, Channel, ChannelPackage, ChannelStream, Favorite
+
+
+@receiver([post_save, post_delete], sender=Channel)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=ChannelPackage)
+@receiver([post_save, post_delete], sender=ChannelStream)
+@receiver(post_delete, sender=Tariff)
+def catalog_changed(sender, **kwargs):
+    invalidate_lineups()
+    transaction.on_commit(schedule_warmup)
+
+
+@receiver(m2m_changed, sender=Channel.packages.through)
+@receiver(m2m_changed, sender=Tariff.channel_packages.through)
+def packages_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_lineups()
+        transaction.on_commit(schedule_warmup)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: update_favorite(instance.user_id, instance.channel_id, True))
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_favorite(instance.user_id, instance.channel_id, False))
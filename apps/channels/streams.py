@@ -0,0 +1,203 @@
+"""
+Stream selection and failover.
+
+Each channel has a list of candidate streams: its active ChannelStreams by
+priority, then Channel.stream_url and Channel.backup_stream_url if they are
+not already among them. Health is tracked per upstream URL in Redis:
+
+- the stream prober stores its last result in the STREAM_HEALTH_KEY hash
+  (results older than HEALTH_MAX_AGE are ignored);
+- players report playback errors; a URL that ERROR_REPORT_THRESHOLD
+  different devices failed on within ERROR_REPORT_WINDOW counts as down.
+
+select_stream() returns the best healthy candidate for a device, so a dead
+origin fails over to the next stream without anyone touching the admin.
+If every candidate looks down the preferred one is returned anyway.
+"""
+import hashlib
+import json
+import logging
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import redis
+from django.conf import settings
+
+from apps.core.redis_client import cached_json, get_redis
+from apps.devices.models import DeviceType
+from .models import ChannelStream, StreamType
+
+logger = logging.getLogger(__name__)
+
+STREAMS_KEY = 'streams:channel:{}'
+STREAM_HEALTH_KEY = 'streams:health'
+STREAM_ERRORS_KEY = 'streams:errors:{}'
+
+HEALTH_MAX_AGE = 60 * 15
+ERROR_REPORT_WINDOW = 120
+ERROR_REPORT_THRESHOLD = 3
+
+# Highest quality first
+QUALITY_RANK = {'4k': 5, '1080p': 4, '720p': 3, '480p': 2, '360p': 1, 'auto': 0}
+
+# Best quality each device type should get when there is a choice
+DEVICE_MAX_QUALITY = {
+    DeviceType.MAG: '1080p',
+    DeviceType.ANDROID: '1080p',
+    DeviceType.IOS: '1080p',
+    DeviceType.WEB: '1080p',
+}
+
+# Stream types each device type can play (others: any)
+DEVICE_STREAM_TYPES = {
+    DeviceType.WEB: {StreamType.HLS, StreamType.DASH, StreamType.HTTP},
+    DeviceType.IOS: {StreamType.HLS, StreamType.HTTP},
+}
+
+
+def _url_key(url):
+    return hashlib.sha1(url.encode()).hexdigest()[:16]
+
+
+def strip_token(url):
+    """Upstream URL of a tokenized link handed to a player."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'token']
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def with_token(url, token):
+    """Append the device token to a stream URL, keeping any query string."""
+    separator = '&' if urlsplit(url).query else '?'
+    return f'{url}{separator}token={token}'
+
+
+# ============== Candidates ==============
+
+def build_candidates(channel):
+    candidates = [
+        {'url': s.url, 'type': s.stream_type, 'quality': s.quality, 'priority': s.priority}
+        for s in ChannelStream.objects.filter(channel=channel, is_active=True).order_by('-priority')
+    ]
+    urls = {c['url'] for c in candidates}
+    for url in (channel.stream_url, channel.backup_stream_url):
+        if url and url not in urls:
+            # Below any ChannelStream, main before backup
+            candidates.append({'url': url, 'type': channel.stream_type, 'quality': 'auto', 'priority': -len(urls)})
+            urls.add(url)
+    return candidates
+
+
+def get_candidates(channel):
+    """Cached candidate streams of a channel (invalidated with the lineups)."""
+    return cached_json(
+        STREAMS_KEY.format(channel.id),
+        lambda: build_candidates(channel),
+        settings.QUATTRETV['LINEUP_CACHE_TTL'],
+    )
+
+
+# ============== Health ==============
+
+def store_probe_results(results, replace=False):
+    """
+    Store prober results ({url: {'ok': bool, ...metrics}}). Streams seen up
+    forget their client error reports; `replace` drops URLs not in results.
+    """
+    if not results:
+        return
+    now = int(time.time())
+    try:
+        pipe = get_redis().pipeline(transaction=replace)
+        if replace:
+            pipe.delete(STREAM_HEALTH_KEY)
+        pipe.hset(STREAM_HEALTH_KEY, mapping={
+            url: json.dumps({**result, 'checked_at': now}) for url, result in results.items()
+        })
+        for url, result in results.items():
+            if result['ok']:
+                pipe.delete(STREAM_ERRORS_KEY.format(_url_key(url)))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable recording stream health: {e}")
+
+
+def report_error(url, reporter):
+    """
+    A player failed on `url` (tokenized links are accepted). `reporter`
+    identifies the device, so one box retrying doesn't take a stream down.
+    """
+    key = STREAM_ERRORS_KEY.format(_url_key(strip_token(url)))
+    try:
+        pipe = get_redis().pipeline()
+        pipe.sadd(key, reporter)
+        pipe.expire(key, ERROR_REPORT_WINDOW)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reporting stream error: {e}")
+
+
+def probe_results(urls):
+    """Last stored prober result per URL (None if never probed)."""
+    try:
+        values = get_redis().hmget(STREAM_HEALTH_KEY, urls) if urls else []
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading stream health: {e}")
+        return dict.fromkeys(urls)
+    return {url: json.loads(v) if v else None for url, v in zip(urls, values)}
+
+
+def health_states(urls):
+    """url -> True (up), False (down) or None (unknown), in one round trip."""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hmget(STREAM_HEALTH_KEY, urls)
+        for url in urls:
+            pipe.scard(STREAM_ERRORS_KEY.format(_url_key(url)))
+        probes, *errors = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading stream health: {e}")
+        return dict.fromkeys(urls)
+
+    now = time.time()
+    states = {}
+    for url, probe, error_count in zip(urls, probes, errors):
+        state = None
+        if probe:
+            probe = json.loads(probe)
+            if now - probe['checked_at'] <= HEALTH_MAX_AGE:
+                state = probe['ok']
+        if error_count >= ERROR_REPORT_THRESHOLD:
+            state = False
+        states[url] = state
+    return states
+
+
+# ============== Selection ==============
+
+def rank_candidates(candidates, states, device_type=None):
+    """Candidates sorted best first for a device."""
+    max_quality = QUALITY_RANK.get(DEVICE_MAX_QUALITY.get(device_type), max(QUALITY_RANK.values()))
+    playable = DEVICE_STREAM_TYPES.get(device_type)
+
+    def sort_key(c):
+        quality = QUALITY_RANK.get(c['quality'], 0)
+        return (
+            states.get(c['url']) is False,
+            playable is not None and c['type'] not in playable,
+            quality > max_quality,
+            -c['priority'],
+            -quality,
+        )
+    return sorted(candidates, key=sort_key)
+
+
+def select_stream(channel, device_type=None):
+    """Upstream URL to play a channel on a device type."""
+    candidates = get_candidates(channel)
+    if not candidates:
+        return channel.stream_url
+    if len(candidates) == 1:
+        return candidates[0]['url']
+    states = health_states([c['url'] for c in candidates])
+    return rank_candidates(candidates, states, device_type)[0]['url']
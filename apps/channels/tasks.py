@@ -0,0 +1,205 @@
+"""
+Celery tasks for M3U channel imports and stream health checks.
+"""
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+import requests
+from celery import shared_task
+from django.core.files import File
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Entries per committed chunk
+IMPORT_CHUNK_SIZE = 500
+# Rejected entries kept on the job for display
+MAX_ERROR_SAMPLES = 50
+
+
+def iter_chunks(entries, size):
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def record_chunk(job, report, offset):
+    """Add a chunk report to the job progress and save it."""
+    job.bytes_done = offset
+    job.chunks_done += 1
+    job.parsed += report['parsed']
+    job.created += len(report['created'])
+    job.updated += len(report['updated'])
+    job.unchanged += report['unchanged']
+    job.errors += len(report['errors'])
+    job.error_samples = (job.error_samples + report['errors'])[:MAX_ERROR_SAMPLES]
+    job.save()
+
+
+def import_entries(is_radio, entries):
+    """
+    Import entries one at a time, each in its own transaction, for a chunk
+    the database rejected as a whole; only the offending entries are lost.
+    Returns a fresh importer to carry on with and the merged report.
+    """
+    from .importer import ChannelImporter
+
+    importer = ChannelImporter(is_radio=is_radio)
+    report = {'parsed': 0, 'created': [], 'updated': [], 'unchanged': 0, 'errors': []}
+    for entry in entries:
+        try:
+            with transaction.atomic():
+                part = importer.run([entry])
+        except (DataError, IntegrityError) as e:
+            # Its lookup maps may hold objects that were never saved
+            importer = ChannelImporter(is_radio=is_radio)
+            part = {'parsed': 1, 'created': [], 'updated': [], 'unchanged': 0,
+                    'errors': [{'name': entry.get('name', ''), 'error': str(e)}]}
+        report['parsed'] += part['parsed']
+        report['created'] += part['created']
+        report['updated'] += part['updated']
+        report['unchanged'] += part['unchanged']
+        report['errors'] += part['errors']
+    return importer, report
+
+
+@shared_task(bind=True, acks_late=True, max_retries=3, default_retry_delay=60)
+def run_import_job(self, job_id):
+    """
+    Import an uploaded/downloaded playlist chunk by chunk.
+
+    Every chunk is committed together with the job progress, including the
+    file offset it ended at; a retried or re-queued job seeks there and
+    carries on instead of starting over. A chunk the database rejects is
+    imported entry by entry, so bad data can't block the rest of the file.
+    The job stays running while Celery retries it and is only marked failed
+    (and resumable from the portal) once the retries are used up.
+    """
+    from .importer import ChannelImporter
+    from .m3u import iter_m3u
+    from .models import ImportJob
+
+    try:
+        job = ImportJob.objects.get(id=job_id)
+    except ImportJob.DoesNotExist:
+        logger.error(f"Import job {job_id} not found")
+        return
+    if job.status == ImportJob.Status.DONE:
+        return
+
+    job.status = ImportJob.Status.RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.error_message = ''
+    job.save(update_fields=['status', 'started_at', 'error_message', 'updated_at'])
+
+    is_radio = job.import_type == 'radio'
+    try:
+        importer = ChannelImporter(is_radio=is_radio)
+        with job.file.open('rb') as f:
+            job.file_size = job.file.size
+            f.seek(job.bytes_done)
+            # readline keeps f.tell() on the line boundary (File.__iter__ reads ahead)
+            for chunk in iter_chunks(iter_m3u(iter(f.readline, b'')), IMPORT_CHUNK_SIZE):
+                try:
+                    with transaction.atomic():
+                        record_chunk(job, importer.run(chunk), f.tell())
+                except (DataError, IntegrityError) as e:
+                    logger.warning(
+                        f"Import job {job.id}: chunk {job.chunks_done + 1} rejected ({e}), importing it entry by entry"
+                    )
+                    importer, report = import_entries(is_radio, chunk)
+                    record_chunk(job, report, f.tell())
+    except Exception as e:
+        logger.error(f"Import job {job.id} failed at offset {job.bytes_done}: {e}")
+        job.error_message = str(e)
+        if self.request.retries < self.max_retries:
+            # Still running as far as the portal is concerned
+            job.save(update_fields=['error_message', 'updated_at'])
+            raise self.retry(exc=e)
+        job.status = ImportJob.Status.FAILED
+        job.save(update_fields=['status', 'error_message', 'updated_at'])
+        raise
+
+    job.status = ImportJob.Status.DONE
+    job.bytes_done = job.file_size
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'bytes_done', 'finished_at', 'updated_at'])
+    logger.info(
+        f"Import job {job.id} done: {job.parsed} parsed, {job.created} created, "
+        f"{job.updated} updated, {job.errors} errors"
+    )
+
+
+@shared_task
+def import_m3u_source(source_id):
+    """Download a remote playlist and import it as a job."""
+    from .models import ImportJob, M3uSource
+
+    try:
+        source = M3uSource.objects.get(id=source_id)
+    except M3uSource.DoesNotExist:
+        logger.error(f"M3U source {source_id} not found")
+        return
+
+    logger.info(f"Importing M3U from: {source.name}")
+
+    # Stream the download to disk instead of holding it in memory
+    with tempfile.NamedTemporaryFile(suffix='.m3u', delete=False) as tmp:
+        try:
+            with requests.get(source.url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for block in response.iter_content(chunk_size=64 * 1024):
+                    tmp.write(block)
+        except requests.RequestException as e:
+            logger.error(f"Error downloading M3U from {source.name}: {e}")
+            os.unlink(tmp.name)
+            raise
+
+    try:
+        job = ImportJob(source=source, import_type=source.import_type)
+        with open(tmp.name, 'rb') as f:
+            job.file.save(f'source-{source.id}.m3u', File(f), save=False)
+        job.file_size = job.file.size
+        job.save()
+    finally:
+        os.unlink(tmp.name)
+
+    source.last_update = timezone.now()
+    source.save(update_fields=['last_update'])
+
+    run_import_job.delay(job.id)
+
+
+@shared_task
+def update_all_m3u_sources():
+    """Import every active M3U source whose update interval has elapsed."""
+    from .models import M3uSource
+
+    now = timezone.now()
+    for source in M3uSource.objects.filter(is_active=True, auto_update=True):
+        if source.last_update and source.last_update + timedelta(seconds=source.update_interval) > now:
+            continue
+        import_m3u_source.delay(source.id)
+
+
+@shared_task
+def probe_streams():
+    """Check every active stream and prune old health history."""
+    from django.conf import settings
+    from .models import StreamHealth
+    from .prober import probe_streams as run_probe
+
+    results = run_probe()
+    down = sum(1 for _, result in results if not result['ok'])
+    logger.info(f"Probed {len(results)} streams, {down} down")
+
+    cutoff = timezone.now() - timedelta(days=settings.QUATTRETV['STREAM_HEALTH_RETENTION_DAYS'])
+    StreamHealth.objects.filter(checked_at__lt=cutoff).delete()
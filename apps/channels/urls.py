@@ -6,6 +6,7 @@ app_name = 'channels'
 
 router = DefaultRouter()
 router.register(r'categories', views.CategoryViewSet)
+router.register(r'm3u-sources', views.M3uSourceViewSet)
 router.register(r'', views.ChannelViewSet, basename='channel')
 router.register(r'packages', views.ChannelPackageViewSet)
 router.register(r'streams', views.ChannelStreamViewSet)
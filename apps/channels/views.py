@@ -3,10 +3,12 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.db.models import Q
-from .models import Category, Channel, ChannelPackage, ChannelStream, Favorite
+from .models import Category, Channel, ChannelPackage, ChannelStream, Favorite, M3uSource
+from .streams import report_error, select_stream
 from .serializers import (
     CategorySerializer, ChannelListSerializer, ChannelDetailSerializer,
-    ChannelPackageSerializer, ChannelStreamSerializer, FavoriteSerializer
+    ChannelPackageSerializer, ChannelStreamSerializer, FavoriteSerializer,
+    M3uSourceSerializer
 )
 
 
@@ -34,7 +36,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
         return ChannelListSerializer
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'stream_url', 'report_error']:
             return [IsAuthenticated()]
         return [IsAdminUser()]
 
@@ -62,11 +64,24 @@ class ChannelViewSet(viewsets.ModelViewSet):
         channel = self.get_object()
         # TODO: Generate authenticated stream URL with token
         return Response({
-            'url': channel.stream_url,
+            'url': select_stream(channel, request.query_params.get('device_type')),
             'backup_url': channel.backup_stream_url,
             'type': channel.stream_type,
         })
 
+    @action(detail=True, methods=['post'])
+    def report_error(self, request, pk=None):
+        """Report that a stream URL of this channel failed to play."""
+        self.get_object()
+        url = request.data.get('url')
+        if not url:
+            return Response(
+                {'error': 'url required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        report_error(url, f'user:{request.user.id}')
+        return Response({'status': 'reported'})
+
     @action(detail=False, methods=['get'])
     def by_number(self, request):
         """Get channel by number."""
@@ -120,7 +135,10 @@ class FavoriteViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def toggle(self, request):
-        """Toggle favorite status for a channel."""
+        """
+        Toggle favorite status for a channel.
+        The portal's favorites cache follows through the Favorite signals.
+        """
         channel_id = request.data.get('channel_id')
         if not channel_id:
             return Response(
@@ -138,3 +156,17 @@ class FavoriteViewSet(viewsets.ModelViewSet):
             return Response({'status': 'removed'})
 
         return Response({'status': 'added', 'id': favorite.id})
+
+
+class M3uSourceViewSet(viewsets.ModelViewSet):
+    queryset = M3uSource.objects.all()
+    serializer_class = M3uSourceSerializer
+    permission_classes = [IsAdminUser]
+
+    @action(detail=True, methods=['post'])
+    def update_now(self, request, pk=None):
+        """Trigger an import of this source."""
+        source = self.get_object()
+        from .tasks import import_m3u_source
+        import_m3u_source.delay(source.id)
+        return Response({'status': 'Import scheduled'})
@@ -0,0 +1,30 @@
+"""
+Authentication helpers for async (non-DRF) views.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.stalker_api.authentication import MACAuthentication
+
+
+async def aauthenticate(request):
+    """
+    Resolve the API user for an async view.
+    Tries JWT, session and MAC auth in the same order as REST_FRAMEWORK.
+    """
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        if result:
+            return result[0]
+
+        user = await request.auser()
+        if user.is_authenticated:
+            return user
+
+        result = await MACAuthentication().aauthenticate(request)
+        if result:
+            return result[0]
+    except APIException:
+        pass
+    return None
@@ -0,0 +1,13 @@
+"""
+URLs for the image proxy.
+"""
+from django.urls import path
+from . import image_views
+
+urlpatterns = [
+    path(
+        '<slug:profile>/<str:signature>/<str:encoded>.<str:extension>',
+        image_views.image_proxy,
+        name='image_proxy',
+    ),
+]
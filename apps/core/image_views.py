@@ -0,0 +1,30 @@
+"""
+Async image proxy endpoint for ASGI deployments (see images.py).
+"""
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotModified, HttpResponseRedirect
+
+from .images import CONTENT_TYPES, PROFILES, aget_image, verify
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+async def image_proxy(request, profile, signature, encoded, extension):
+    """Serve a source image resized for a profile (the original if that fails)."""
+    url = verify(profile, signature, encoded)
+    if url is None:
+        return HttpResponseForbidden('Invalid signature')
+
+    result = await aget_image(url, profile)
+    if result is None:
+        # Better the full-size original than no image
+        return HttpResponseRedirect(url)
+
+    data, key = result
+    etag = f'"{key[:32]}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(data, content_type=CONTENT_TYPES[PROFILES[profile][2]])
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE
+    return response
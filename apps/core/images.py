@@ -0,0 +1,288 @@
+"""
+Image proxy for channel logos and VOD posters.
+
+Logos and posters point at arbitrary third-party hosts and are often
+full-size originals. With IMAGE_PROXY_ENABLED, the links handed out become
+/img/<profile>/<signature>/<url>, which fetches the original once, fits it
+into the profile's box (never upscaled) with Pillow and re-encodes it.
+
+Results live on disk under IMAGE_CACHE_DIR, named after a hash of the
+source URL and the profile, and are served with immutable cache headers
+(a new source URL is a new link). Reads refresh the file's mtime at most
+once per TOUCH_INTERVAL; when the cache grows past IMAGE_CACHE_MAX_MB the
+evict_image_cache task deletes the least recently used files.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import os
+import time
+import weakref
+from pathlib import Path
+
+import httpx
+import redis
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+from PIL import Image, ImageOps
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height, format)
+PROFILES = {
+    'logo': (256, 256, 'PNG'),
+    'logo-sm': (96, 96, 'PNG'),
+    # MAG boxes at 1080p
+    'poster': (480, 720, 'JPEG'),
+    'backdrop': (1280, 720, 'JPEG'),
+    # Mobile app thumbnails
+    'poster-sm': (240, 360, 'JPEG'),
+}
+CONTENT_TYPES = {'PNG': 'image/png', 'JPEG': 'image/jpeg'}
+EXTENSIONS = {'PNG': 'png', 'JPEG': 'jpg'}
+JPEG_QUALITY = 82
+# Bump to regenerate every cached image after changing the processing
+VERSION = 1
+
+MAX_SOURCE_BYTES = 15 * 1024 * 1024
+MAX_SOURCE_PIXELS = 40_000_000
+TOUCH_INTERVAL = 60 * 60
+FAILED_KEY = 'img:failed:{}'
+FAILED_TTL = 5 * 60
+SIZE_KEY = 'img:cache:bytes'
+EVICT_SCHEDULED_KEY = 'img:cache:evict'
+# Eviction leaves the cache at this fraction of the limit
+EVICT_TARGET = 0.9
+
+_http_clients = weakref.WeakKeyDictionary()
+# One fetch per image and process; the rest wait for it
+_locks = weakref.WeakValueDictionary()
+
+
+# ============== Links ==============
+
+def sign_url(url, profile):
+    return salted_hmac('image-url', f'{profile}:{url}').hexdigest()[:20]
+
+
+def encode_url(url):
+    return base64.urlsafe_b64encode(url.encode()).decode().rstrip('=')
+
+
+def decode_url(value):
+    try:
+        return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def image_url(url, profile):
+    """Proxy link for an external image; other URLs are returned as-is."""
+    if not settings.QUATTRETV['IMAGE_PROXY_ENABLED'] or not url.startswith(('http://', 'https://')):
+        return url
+    extension = EXTENSIONS[PROFILES[profile][2]]
+    path = f'/img/{profile}/{sign_url(url, profile)}/{encode_url(url)}.{extension}'
+    return settings.QUATTRETV['PUBLIC_URL'].rstrip('/') + path
+
+
+def verify(profile, signature, encoded):
+    """Source URL of a proxy link, None if the link is not ours."""
+    if profile not in PROFILES:
+        return None
+    url = decode_url(encoded)
+    if not url or not constant_time_compare(signature, sign_url(url, profile)):
+        return None
+    return url
+
+
+# ============== Disk cache ==============
+
+def cache_dir():
+    return Path(settings.QUATTRETV['IMAGE_CACHE_DIR'])
+
+
+def cache_key(url, profile):
+    return hashlib.sha256(f'{VERSION}:{profile}:{url}'.encode()).hexdigest()
+
+
+def cache_path(key, profile):
+    return cache_dir() / key[:2] / f'{key}.{EXTENSIONS[PROFILES[profile][2]]}'
+
+
+def read_cached(path):
+    """Bytes of a cached image (refreshing its LRU time), None on a miss."""
+    try:
+        stat = path.stat()
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    if stat.st_mtime < time.time() - TOUCH_INTERVAL:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    return data
+
+
+def write_cached(path, data):
+    """Store an image atomically and schedule an eviction if over the limit."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    try:
+        r = get_redis()
+        total = r.incrby(SIZE_KEY, len(data))
+        limit = settings.QUATTRETV['IMAGE_CACHE_MAX_MB'] * 1024 * 1024
+        if total > limit and r.set(EVICT_SCHEDULED_KEY, 1, nx=True, ex=60):
+            from .tasks import evict_image_cache
+            evict_image_cache.delay()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable accounting image cache: {e}")
+
+
+def evict(max_bytes=None):
+    """Delete least recently used images until the cache fits; returns files deleted."""
+    max_bytes = max_bytes or settings.QUATTRETV['IMAGE_CACHE_MAX_MB'] * 1024 * 1024
+    files = []
+    total = 0
+    stack = [str(cache_dir())]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+        except FileNotFoundError:
+            continue
+
+    deleted = 0
+    if total > max_bytes:
+        target = max_bytes * EVICT_TARGET
+        files.sort()
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            deleted += 1
+
+    r = get_redis()
+    r.set(SIZE_KEY, total)
+    r.delete(EVICT_SCHEDULED_KEY)
+    return deleted
+
+
+# ============== Processing ==============
+
+def render(data, profile):
+    """Fit source bytes into a profile and re-encode; raises ValueError on bad input."""
+    width, height, fmt = PROFILES[profile]
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_SOURCE_PIXELS:
+            raise ValueError(f'image too large ({image.width}x{image.height})')
+        # JPEG sources are decoded straight at a reduced scale
+        image.draft('RGB', (width, height))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            # Palette images would be resized without filtering
+            image = image.convert('RGBA')
+        image.thumbnail((width, height), Image.LANCZOS)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(str(e)) from e
+
+    out = io.BytesIO()
+    if fmt == 'JPEG':
+        if image.mode != 'RGB':
+            # Transparent areas become white
+            background = Image.new('RGB', image.size, 'white')
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+
+def mark_failed(key):
+    try:
+        get_redis().set(FAILED_KEY.format(key), 1, ex=FAILED_TTL)
+    except redis.RedisError:
+        pass
+
+
+def recently_failed(key):
+    try:
+        return bool(get_redis().exists(FAILED_KEY.format(key)))
+    except redis.RedisError:
+        return False
+
+
+# ============== Proxy ==============
+
+def _get_http_client():
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=settings.QUATTRETV['STREAM_PROBE_TIMEOUT'],
+            follow_redirects=True,
+            headers={'User-Agent': 'QuattreTV image proxy'},
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def _download(url):
+    async with _get_http_client().stream('GET', url) as response:
+        response.raise_for_status()
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_SOURCE_BYTES:
+                raise ValueError('image too large')
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+async def aget_image(url, profile):
+    """(bytes, etag) of a resized image, from the disk cache or the source; None if it fails."""
+    key = cache_key(url, profile)
+    path = cache_path(key, profile)
+    data = await asyncio.to_thread(read_cached, path)
+    if data is not None:
+        return data, key
+    if await asyncio.to_thread(recently_failed, key):
+        return None
+
+    lock = _locks.get(key)
+    if lock is None:
+        lock = _locks[key] = asyncio.Lock()
+    async with lock:
+        # Someone else may have made it meanwhile
+        data = await asyncio.to_thread(read_cached, path)
+        if data is not None:
+            return data, key
+        try:
+            source = await _download(url)
+            data = await asyncio.to_thread(render, source, profile)
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Image proxy can't process {url}: {e}")
+            await asyncio.to_thread(mark_failed, key)
+            return None
+        await asyncio.to_thread(write_cached, path, data)
+    return data, key
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.warmup import warm_caches
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the portal caches (lineups, genres, VOD categories, EPG days)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Parallel jobs (default: WARMUP_WORKERS)')
+
+    def handle(self, *args, **options):
+        results = warm_caches(workers=options['workers'])
+
+        for name, seconds, error in results:
+            if error:
+                self.stdout.write(self.style.ERROR(f'  {name:<32} {seconds * 1000:8.1f} ms  {error}'))
+            else:
+                self.stdout.write(f'  {name:<32} {seconds * 1000:8.1f} ms')
+
+        failed = sum(1 for _, _, error in results if error)
+        if failed:
+            raise CommandError(f'{failed} of {len(results)} warm-up jobs failed')
+        self.stdout.write(self.style.SUCCESS(f'Warmed {len(results)} caches'))
@@ -29,6 +29,8 @@ urlpatterns = [
     path('channels/', views.channels_list, name='channels'),
     path('channels/create/', views.channel_create, name='channel_create'),
     path('channels/import/', views.channels_import, name='channels_import'),
+    path('channels/import/jobs/<int:job_id>/', views.import_job, name='import_job'),
+    path('channels/import/jobs/<int:job_id>/resume/', views.import_job_resume, name='import_job_resume'),
     path('channels/<int:channel_id>/', views.channel_edit, name='channel_edit'),
     path('channels/<int:channel_id>/delete/', views.channel_delete, name='channel_delete'),
 
@@ -49,6 +51,7 @@ urlpatterns = [
 
     # Streams
     path('streams/', views.streams_list, name='streams'),
+    path('streams/probe/', views.streams_probe, name='streams_probe'),
 
     # Logs
     path('logs/', views.logs_list, name='logs'),
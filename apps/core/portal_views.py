@@ -8,12 +8,18 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
+from django.core.files.base import ContentFile
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Count, Q
 
 from apps.accounts.models import User, Tariff
 from apps.devices.models import Device
-from apps.channels.models import Channel, Category, ChannelStream
+from apps.channels.importer import ChannelImporter
+from apps.channels.m3u import iter_m3u, parse_m3u
+from apps.channels.models import Channel, Category, ChannelStream, ImportJob
+from apps.channels.streams import probe_results
+from apps.channels.tasks import probe_streams, run_import_job
 
 
 def get_base_stats():
@@ -503,202 +509,94 @@ def channels_import(request):
             messages.error(request, 'Debes subir un archivo M3U o pegar el contenido')
             return redirect('portal:channels_import')
 
-        # Get content
+        # Get import type from form (tv or radio)
+        import_type = request.POST.get('import_type', 'tv')
+
+        if request.POST.get('dry_run') == '1':
+            # Preview runs inline; the upload is read line by line
+            channels_data = iter_m3u(m3u_file) if m3u_file else parse_m3u(m3u_text)
+            importer = ChannelImporter(is_radio=(import_type == 'radio'))
+            report = importer.run(channels_data, dry_run=True)
+            if not report['parsed']:
+                messages.error(request, 'No se encontraron canales válidos en el archivo')
+                return redirect('portal:channels_import')
+
+            context = {
+                'active_page': 'channels',
+                'stats': get_base_stats(),
+                'report': report,
+                'm3u_text': m3u_text,
+                'import_type': import_type,
+                'jobs': ImportJob.objects.select_related('source')[:10],
+            }
+            return render(request, 'portal/pages/channels_import.html', context)
+
+        # The import itself runs as a background job on a file on disk
+        job = ImportJob(import_type=import_type, created_by=request.user)
         if m3u_file:
-            raw_content = m3u_file.read()
-            try:
-                content = raw_content.decode('utf-8')
-            except UnicodeDecodeError:
-                content = raw_content.decode('latin-1')
+            job.file.save(m3u_file.name, m3u_file, save=False)
         else:
-            content = m3u_text
+            job.file.save('pasted.m3u', ContentFile(m3u_text.encode('utf-8')), save=False)
+        job.file_size = job.file.size
+        job.save()
+        transaction.on_commit(lambda: run_import_job.delay(job.id))
 
-        # Parse M3U
-        channels_data = parse_m3u(content)
+        return redirect('portal:import_job', job_id=job.id)
 
-        if not channels_data:
-            messages.error(request, 'No se encontraron canales válidos en el archivo')
-            return redirect('portal:channels_import')
+    # GET request - show import form
+    context = {
+        'active_page': 'channels',
+        'stats': get_base_stats(),
+        'jobs': ImportJob.objects.select_related('source')[:10],
+    }
+    return render(request, 'portal/pages/channels_import.html', context)
 
-        # Import channels
-        created = 0
-        updated = 0
-        errors = 0
 
-        # Get import type from form (tv or radio)
-        import_type = request.POST.get('import_type', 'tv')
-        is_radio_import = (import_type == 'radio')
-
-        # Get current max numbers for TV and Radio
-        # TV starts at 1, Radio starts at 1001 to avoid conflicts (number field is unique)
-        max_tv_number = Channel.objects.filter(is_radio=False).order_by('-number').values_list('number', flat=True).first() or 0
-        max_radio_number = Channel.objects.filter(is_radio=True).order_by('-number').values_list('number', flat=True).first() or 1000
-
-        for ch_data in channels_data:
-            try:
-                # Get or create category
-                category = None
-                if ch_data.get('group'):
-                    category, _ = Category.objects.get_or_create(
-                        name=ch_data['group'],
-                        defaults={
-                            'alias': slugify(ch_data['group']),
-                            'is_active': True
-                        }
-                    )
-
-                # Use the import type selected by the user (TV or Radio button)
-                is_radio = is_radio_import
-
-                # Check if channel exists (by epg_id or name)
-                existing = None
-
-                # Try by epg_id first
-                if ch_data.get('tvg_id'):
-                    existing = Channel.objects.filter(epg_id=ch_data['tvg_id']).first()
-
-                # Then try by name (exact match)
-                if not existing:
-                    existing = Channel.objects.filter(name__iexact=ch_data['name']).first()
-
-                if existing:
-                    # Update existing channel
-                    existing.stream_url = ch_data['url']
-                    if ch_data.get('logo'):
-                        existing.logo_url = ch_data['logo']
-                    if category:
-                        existing.category = category
-                    if ch_data.get('tvg_id'):
-                        existing.epg_id = ch_data['tvg_id']
-                    existing.is_hd = 'HD' in ch_data['name'].upper() or '1080' in ch_data['name']
-                    existing.is_4k = '4K' in ch_data['name'].upper() or 'UHD' in ch_data['name'].upper()
-                    existing.is_radio = is_radio
-                    existing.save()
-
-                    # Update or create stream
-                    stream = existing.streams.order_by('-priority').first()
-                    if stream:
-                        stream.url = ch_data['url']
-                        stream.save()
-                    else:
-                        ChannelStream.objects.create(
-                            channel=existing,
-                            url=ch_data['url'],
-                            name='Principal',
-                            priority=100,
-                        )
-                    updated += 1
-                else:
-                    # Create new channel with correlative number
-                    if is_radio:
-                        max_radio_number += 1
-                        new_number = max_radio_number
-                    else:
-                        max_tv_number += 1
-                        new_number = max_tv_number
-
-                    channel = Channel.objects.create(
-                        name=ch_data['name'],
-                        number=new_number,
-                        stream_url=ch_data['url'],
-                        logo_url=ch_data.get('logo', ''),
-                        category=category,
-                        epg_id=ch_data.get('tvg_id', ''),
-                        is_hd='HD' in ch_data['name'].upper() or '1080' in ch_data['name'],
-                        is_4k='4K' in ch_data['name'].upper() or 'UHD' in ch_data['name'].upper(),
-                        is_radio=is_radio,
-                        is_active=True
-                    )
-                    # Create stream
-                    ChannelStream.objects.create(
-                        channel=channel,
-                        url=ch_data['url'],
-                        name='Principal',
-                        priority=100,
-                    )
-                    created += 1
-
-            except Exception as e:
-                errors += 1
-
-        messages.success(request, f'Importación completada: {len(channels_data)} parseados, {created} creados, {updated} actualizados, {errors} errores')
-        return redirect('portal:channels')
+def import_job_data(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress_percent,
+        'parsed': job.parsed,
+        'created': job.created,
+        'updated': job.updated,
+        'unchanged': job.unchanged,
+        'errors': job.errors,
+        'error_samples': job.error_samples,
+        'error_message': job.error_message,
+    }
+
+
+@staff_member_required
+def import_job(request, job_id):
+    """Progress of an M3U import job; the page polls it with ?format=json."""
+    job = get_object_or_404(ImportJob.objects.select_related('source'), id=job_id)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse(import_job_data(job))
 
-    # GET request - show import form
     context = {
         'active_page': 'channels',
         'stats': get_base_stats(),
+        'job': job,
     }
-    return render(request, 'portal/pages/channels_import.html', context)
+    return render(request, 'portal/pages/import_job.html', context)
 
 
-def parse_m3u(content):
-    """Parse M3U/M3U8 content and extract channel data."""
-    import re
+@staff_member_required
+def import_job_resume(request, job_id):
+    """Re-queue a failed import job; it resumes after the last committed chunk."""
+    if request.method == 'POST':
+        job = get_object_or_404(ImportJob, id=job_id)
+        # Conditional, so a double submit can't queue two overlapping runs
+        if ImportJob.objects.filter(id=job.id, status=ImportJob.Status.FAILED).update(
+            status=ImportJob.Status.PENDING
+        ):
+            run_import_job.delay(job.id)
+        return redirect('portal:import_job', job_id=job.id)
 
-    channels = []
-    # Handle both Windows (\r\n) and Unix (\n) line endings
-    content = content.replace('\r\n', '\n').replace('\r', '\n')
-    lines = content.strip().split('\n')
-
-    current_channel = None
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        if line.startswith('#EXTINF:'):
-            # Parse EXTINF line
-            current_channel = {}
-
-            # Extract attributes
-            # tvg-id
-            tvg_id_match = re.search(r'tvg-id="([^"]*)"', line)
-            if tvg_id_match:
-                current_channel['tvg_id'] = tvg_id_match.group(1)
-
-            # tvg-chno (channel number)
-            tvg_chno_match = re.search(r'tvg-chno="([^"]*)"', line)
-            if tvg_chno_match:
-                try:
-                    current_channel['number'] = int(tvg_chno_match.group(1))
-                except ValueError:
-                    pass
-
-            # tvg-name
-            tvg_name_match = re.search(r'tvg-name="([^"]*)"', line)
-            if tvg_name_match:
-                current_channel['tvg_name'] = tvg_name_match.group(1)
-
-            # tvg-logo
-            logo_match = re.search(r'tvg-logo="([^"]*)"', line)
-            if logo_match:
-                current_channel['logo'] = logo_match.group(1)
-
-            # group-title
-            group_match = re.search(r'group-title="([^"]*)"', line)
-            if group_match:
-                current_channel['group'] = group_match.group(1)
-
-            # Channel name (after the last comma)
-            name_match = re.search(r',\s*(.+)$', line)
-            if name_match:
-                current_channel['name'] = name_match.group(1).strip()
-            elif tvg_name_match:
-                current_channel['name'] = tvg_name_match.group(1)
-
-        elif line and not line.startswith('#') and current_channel:
-            # This is the URL line - clean Stalker "ffmpeg " prefix if present
-            url = line
-            if url.startswith('ffmpeg '):
-                url = url[7:]  # Remove "ffmpeg " prefix
-            current_channel['url'] = url
-            if current_channel.get('name') and current_channel.get('url'):
-                channels.append(current_channel)
-            current_channel = None
-
-    return channels
+    return JsonResponse({'status': 'error'}, status=400)
 
 
 def slugify(text):
@@ -750,10 +648,22 @@ def tariffs_list(request):
     return render(request, 'portal/pages/tariffs.html', context)
 
 
+def pvr_quota_gb(request):
+    """PVR quota from a tariff form (0 = unlimited); None and an error message if invalid."""
+    value = (request.POST.get('pvr_quota_gb') or '0').strip()
+    if not value.isdigit():
+        messages.error(request, 'La cuota de grabaciones debe ser un número entero de GB (0 = sin límite)')
+        return None
+    return int(value)
+
+
 @staff_member_required
 def tariff_create(request):
     """Create new tariff."""
     if request.method == 'POST':
+        quota_gb = pvr_quota_gb(request)
+        if quota_gb is None:
+            return redirect('portal:tariffs')
         tariff = Tariff.objects.create(
             name=request.POST.get('name'),
             duration_days=int(request.POST.get('duration_days', 0)),
@@ -763,6 +673,7 @@ def tariff_create(request):
             has_catchup='has_catchup' in request.POST,
             has_vod='has_vod' in request.POST,
             has_pvr='has_pvr' in request.POST,
+            pvr_quota_gb=quota_gb,
         )
 
         # Añadir canales seleccionados
@@ -781,6 +692,9 @@ def tariff_edit(request, tariff_id):
     tariff = get_object_or_404(Tariff, id=tariff_id)
 
     if request.method == 'POST':
+        quota_gb = pvr_quota_gb(request)
+        if quota_gb is None:
+            return redirect('portal:tariff_edit', tariff_id=tariff.id)
         tariff.name = request.POST.get('name')
         tariff.duration_days = int(request.POST.get('duration_days', 0))
         tariff.max_devices = int(request.POST.get('max_devices', 5))
@@ -789,6 +703,7 @@ def tariff_edit(request, tariff_id):
         tariff.has_catchup = 'has_catchup' in request.POST
         tariff.has_vod = 'has_vod' in request.POST
         tariff.has_pvr = 'has_pvr' in request.POST
+        tariff.pvr_quota_gb = quota_gb
         tariff.is_active = 'is_active' in request.POST
         tariff.save()
 
@@ -863,7 +778,7 @@ def vod_list(request):
 # Streams
 @staff_member_required
 def streams_list(request):
-    """Active streams list."""
+    """Active connections and health of every stream."""
     now = timezone.now()
     online_threshold = now - timedelta(minutes=5)
 
@@ -871,15 +786,52 @@ def streams_list(request):
         last_seen__gte=online_threshold
     ).select_related('user', 'last_channel')
 
+    # Uptime of the last 24 h from the probe history
+    since = now - timedelta(hours=24)
+    streams = list(
+        ChannelStream.objects.filter(is_active=True, channel__is_active=True)
+        .select_related('channel')
+        .annotate(
+            checks=Count('health_checks', filter=Q(health_checks__checked_at__gte=since)),
+            checks_up=Count('health_checks', filter=Q(
+                health_checks__checked_at__gte=since, health_checks__is_up=True
+            )),
+        )
+        .order_by('channel__number', '-priority')
+    )
+    results = probe_results([s.url for s in streams])
+    for stream in streams:
+        stream.health = results.get(stream.url)
+        stream.uptime = round(stream.checks_up * 100 / stream.checks) if stream.checks else None
+
+    health_filter = request.GET.get('health')
+    if health_filter == 'down':
+        streams = [s for s in streams if s.health and not s.health['ok']]
+    elif health_filter == 'unknown':
+        streams = [s for s in streams if not s.health]
+
     context = {
         'active_page': 'streams',
         'stats': get_base_stats(),
         'active_devices': active_devices,
+        'streams': streams,
+        'health_filter': health_filter or '',
     }
 
     return render(request, 'portal/pages/streams.html', context)
 
 
+@staff_member_required
+def streams_probe(request):
+    """Queue a health check of every stream."""
+    if request.method == 'POST':
+        probe_streams.delay()
+        messages.success(request, 'Comprobación de streams en marcha; recarga en unos segundos.')
+        return redirect('portal:streams')
+
+    return JsonResponse({'status': 'error'}, status=400)
+
+
 # Logs
 @staff_member_required
 def logs_list(request):
@@ -0,0 +1,88 @@
+"""
+Shared Redis clients.
+
+The Django cache covers simple key/value caching; these clients are for the
+places that need raw Redis (JSON blobs shared between sync and async views,
+sets, pub/sub).
+"""
+import asyncio
+import json
+import logging
+import weakref
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_sync_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    """Return the process-wide sync Redis client."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _sync_client
+
+
+def get_async_redis():
+    """
+    Return an asyncio Redis client bound to the running event loop.
+
+    Connection pools can't be shared between loops, and async views served
+    under WSGI get a fresh loop per request, so keep one client per loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        _async_clients[loop] = client
+    return client
+
+
+def store_json(key, value, ttl):
+    """Store a JSON blob, ignoring (but logging) Redis failures."""
+    try:
+        get_redis().set(key, json.dumps(value), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable writing {key}: {e}")
+
+
+def cached_json(key, builder, ttl):
+    """
+    Read a JSON blob, building and storing it on a miss.
+    If Redis is down the value is built on every call.
+    """
+    try:
+        raw = get_redis().get(key)
+        if raw is not None:
+            return json.loads(raw)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading {key}: {e}")
+        return builder()
+
+    value = builder()
+    store_json(key, value, ttl)
+    return value
+
+
+async def acached_json(key, builder, ttl):
+    """Async cached_json(); `builder` is a coroutine function."""
+    client = get_async_redis()
+    try:
+        raw = await client.get(key)
+        if raw is not None:
+            return json.loads(raw)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading {key}: {e}")
+        return await builder()
+
+    value = await builder()
+    try:
+        await client.set(key, json.dumps(value), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable writing {key}: {e}")
+    return value
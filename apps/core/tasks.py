@@ -0,0 +1,21 @@
+"""
+Celery tasks for core services.
+"""
+from celery import shared_task
+
+
+@shared_task
+def warm_caches():
+    """Rebuild the portal caches."""
+    from .warmup import warm_caches
+
+    results = warm_caches()
+    return {name: round(seconds, 3) for name, seconds, _ in results}
+
+
+@shared_task
+def evict_image_cache():
+    """Trim the image proxy disk cache to IMAGE_CACHE_MAX_MB."""
+    from .images import evict
+
+    return evict()
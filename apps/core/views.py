@@ -1,14 +1,39 @@
+import redis
 from django.conf import settings
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from .warmup import schedule_warmup, warm_state
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
-    """Health check endpoint."""
-    return Response({'status': 'ok'})
+    """
+    Health check endpoint.
+    Not ready (503) until the caches have been warmed.
+    """
+    try:
+        state = warm_state()
+    except redis.RedisError:
+        # Without Redis every read goes to the database, which still works
+        return Response({'status': 'ok', 'cache': 'unavailable'})
+
+    if not state:
+        schedule_warmup(countdown=0)
+        return Response(
+            {'status': 'warming', 'cache': 'cold'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    return Response({
+        'status': 'ok',
+        'cache': 'warm',
+        'warmed_at': state['finished_at'],
+        'warmup_seconds': float(state['duration']),
+    })
 
 
 @api_view(['GET'])
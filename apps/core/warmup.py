@@ -0,0 +1,122 @@
+"""
+Cache warm-up.
+
+Rebuilds the caches the portal reads on every boot (lineups per tariff,
+genres, VOD categories and home rows, EPG days, lost timeshift indexes) in
+parallel, so a deploy
+or a Redis flush doesn't send the first wave of boxes to the database. The
+health check reports "warming" until a full warm-up has completed. The flag
+lives in Redis with no TTL, so a flush clears it along with the caches; the
+caches themselves expire and are invalidated as usual and rebuild on read,
+which doesn't make the node unready.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from kombu.exceptions import OperationalError as BrokerError
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+WARM_KEY = 'cache:warm'
+SCHEDULED_KEY = 'cache:warm:scheduled'
+SCHEDULE_DEBOUNCE = 60  # seconds
+
+
+def warmup_jobs():
+    """(name, callable) for every cache to rebuild."""
+    from apps.accounts.models import Tariff
+    from apps.channels.cache import refresh_genres, refresh_lineup
+    from apps.channels.models import Channel
+    from apps.epg.cache import refresh_epg_day, warm_days
+    from apps.timeshift.index import ensure_index
+    from apps.vod.cache import refresh_vod_categories
+    from apps.vod.home import refresh_rows as refresh_vod_home
+
+    jobs = [
+        ('lineup:none', lambda: refresh_lineup(None)),
+        ('genres', refresh_genres),
+        ('vod:categories', refresh_vod_categories),
+        ('vod:home', refresh_vod_home),
+    ]
+    for tariff_id in Tariff.objects.values_list('id', flat=True):
+        jobs.append((f'lineup:tariff:{tariff_id}', lambda t=tariff_id: refresh_lineup(t)))
+    for day in warm_days():
+        jobs.append((f'epg:day:{day.isoformat()}', lambda d=day: refresh_epg_day(d)))
+    # Only rebuilt when lost (e.g. after a Redis flush)
+    for channel in Channel.objects.filter(has_timeshift=True, is_active=True):
+        jobs.append((f'timeshift:index:{channel.id}', lambda c=channel: ensure_index(c)))
+    return jobs
+
+
+def _run_job(job):
+    name, func = job
+    started = time.perf_counter()
+    error = None
+    try:
+        func()
+    except Exception as e:
+        logger.exception(f"Cache warm-up job {name} failed")
+        error = str(e)
+    finally:
+        # Worker threads open their own database connection
+        connection.close()
+    return name, time.perf_counter() - started, error
+
+
+def warm_caches(workers=None):
+    """
+    Run every warm-up job and mark the caches warm if all of them succeed.
+    Returns a list of (name, seconds, error) per job.
+    """
+    workers = workers or settings.QUATTRETV['WARMUP_WORKERS']
+    started = time.perf_counter()
+
+    # Changes committed from now on need another run
+    get_redis().delete(SCHEDULED_KEY)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run_job, warmup_jobs()))
+
+    failed = [name for name, _, error in results if error]
+    duration = time.perf_counter() - started
+    if failed:
+        logger.warning(f"Cache warm-up finished with errors in {duration:.2f}s: {', '.join(failed)}")
+    else:
+        get_redis().hset(WARM_KEY, mapping={
+            'finished_at': timezone.now().isoformat(),
+            'duration': f'{duration:.3f}',
+            'jobs': len(results),
+        })
+        logger.info(f"Cache warm-up finished in {duration:.2f}s ({len(results)} jobs)")
+    return results
+
+
+def warm_state():
+    """
+    Info about the last complete warm-up, None while cold (never warmed
+    since Redis started empty). Raises RedisError if Redis is down.
+    """
+    return get_redis().hgetall(WARM_KEY) or None
+
+
+def schedule_warmup(countdown=5):
+    """
+    Queue a warm-up, coalescing bursts of changes (e.g. an M3U import) into
+    a single run.
+    """
+    from .tasks import warm_caches as warm_caches_task
+
+    try:
+        if not get_redis().set(SCHEDULED_KEY, 1, nx=True, ex=SCHEDULE_DEBOUNCE):
+            return
+        warm_caches_task.apply_async(countdown=countdown)
+    except (redis.RedisError, BrokerError) as e:
+        # Runs from on_commit: a broker outage must not fail the save
+        logger.warning(f"Could not schedule cache warm-up: {e}")
@@ -88,15 +88,23 @@ class Device(TimeStampedModel, ActivableModel):
         self.save(update_fields=['token', 'token_expires'])
         return self.token
 
-    def update_activity(self, ip_address=None, channel=None):
-        """Update last seen timestamp."""
+    def _touch(self, ip_address=None, channel=None):
         self.last_seen = timezone.now()
         if ip_address:
             self.last_ip = ip_address
         if channel:
             self.last_channel = channel
+
+    def update_activity(self, ip_address=None, channel=None):
+        """Update last seen timestamp."""
+        self._touch(ip_address, channel)
         self.save(update_fields=['last_seen', 'last_ip', 'last_channel'])
 
+    async def aupdate_activity(self, ip_address=None, channel=None):
+        """Async version of update_activity()."""
+        self._touch(ip_address, channel)
+        await self.asave(update_fields=['last_seen', 'last_ip', 'last_channel'])
+
     @property
     def is_online(self):
         if not self.last_seen:
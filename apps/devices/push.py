@@ -0,0 +1,198 @@
+"""
+Push delivery of DeviceMessages over Redis pub/sub.
+
+Each message is published on the channel of its audience (one device, all
+devices of a user, or everyone) and the id is remembered as the channel's
+latest. Devices keep a delivery cursor in Redis, so a watchdog poll only
+touches the database when one of its channels has something newer.
+"""
+import asyncio
+import json
+import logging
+from datetime import timedelta
+
+import redis
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.redis_client import get_redis, get_async_redis
+from .models import DeviceMessage
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_ALL = 'device:events:all'
+CHANNEL_USER = 'device:events:user:{}'
+CHANNEL_DEVICE = 'device:events:device:{}'
+LATEST_KEY = '{}:latest'
+CURSOR_KEY = 'device:events:cursor:{}'
+
+# Messages older than this are never pushed to a device
+MAX_MESSAGE_AGE = timedelta(days=1)
+
+
+def message_channel(message):
+    if message.device_id:
+        return CHANNEL_DEVICE.format(message.device_id)
+    if message.user_id:
+        return CHANNEL_USER.format(message.user_id)
+    return CHANNEL_ALL
+
+
+def device_channels(device):
+    return [
+        CHANNEL_DEVICE.format(device.id),
+        CHANNEL_USER.format(device.user_id),
+        CHANNEL_ALL,
+    ]
+
+
+def message_event(message):
+    """Stalker watchdog event for a message."""
+    return {
+        'id': message.id,
+        'event': 'reload_portal' if message.message_type == 'reload' else 'send_msg',
+        'title': message.title,
+        'msg': message.message,
+        'message_type': message.message_type,
+        'device_id': message.device_id,
+        'need_confirm': 0,
+        'reboot_after_ok': 0,
+    }
+
+
+def publish_message(message):
+    """Publish a saved message to the devices it is addressed to."""
+    channel = message_channel(message)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.set(LATEST_KEY.format(channel), message.id)
+        pipe.publish(channel, json.dumps(message_event(message)))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish device message {message.id}: {e}")
+
+
+def pending_messages(device, after_id=0):
+    """Messages for a device newer than its cursor, oldest first."""
+    now = timezone.now()
+    return DeviceMessage.objects.filter(
+        Q(device=device, is_read=False) |
+        Q(device__isnull=True, user_id=device.user_id) |
+        Q(device__isnull=True, user__isnull=True),
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+        id__gt=after_id,
+        created_at__gte=now - MAX_MESSAGE_AGE,
+    ).order_by('id')
+
+
+async def aget_cursor(device):
+    cursor = await get_async_redis().get(CURSOR_KEY.format(device.id))
+    return int(cursor or 0)
+
+
+async def ahas_pending(device, cursor):
+    """Cheap Redis-only check for messages newer than the cursor."""
+    keys = [LATEST_KEY.format(channel) for channel in device_channels(device)]
+    latest = await get_async_redis().mget(keys)
+    return any(int(value) > cursor for value in latest if value)
+
+
+async def amark_delivered(device, event):
+    """Advance the device cursor and mark device-targeted messages read."""
+    await get_async_redis().set(
+        CURSOR_KEY.format(device.id), event['id'],
+        ex=int(MAX_MESSAGE_AGE.total_seconds())
+    )
+    if event.get('device_id'):
+        await DeviceMessage.objects.filter(id=event['id']).aupdate(is_read=True)
+
+
+class DeviceSubscription:
+    """Pub/sub subscription to every channel a device listens on."""
+
+    def __init__(self, device):
+        self.device = device
+        self.pubsub = None
+
+    async def __aenter__(self):
+        self.pubsub = get_async_redis().pubsub()
+        await self.pubsub.subscribe(*device_channels(self.device))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.pubsub.unsubscribe()
+        await self.pubsub.aclose()
+
+    async def next_event(self, timeout):
+        """Wait up to `timeout` seconds for an event, None if nothing arrives."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            # Returns None early for ignored (subscribe) messages
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message is None:
+                continue
+            try:
+                return json.loads(message['data'])
+            except (TypeError, ValueError):
+                continue
+
+
+async def _apending_event(device, cursor):
+    if not await ahas_pending(device, cursor):
+        return None
+    message = await pending_messages(device, cursor).afirst()
+    return message_event(message) if message else None
+
+
+async def anext_event(device, wait=0):
+    """
+    Return the next undelivered event for a device.
+
+    With `wait` > 0 this long-polls pub/sub for up to that many seconds
+    when nothing is pending. Returns None if there is nothing to deliver.
+    """
+    cursor = await aget_cursor(device)
+    event = await _apending_event(device, cursor)
+
+    if not event and wait > 0:
+        async with DeviceSubscription(device) as subscription:
+            # Check again now that we are subscribed, so nothing published
+            # in between is lost
+            event = await _apending_event(device, cursor)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + wait
+            while not event and loop.time() < deadline:
+                event = await subscription.next_event(deadline - loop.time())
+                if event and event['id'] <= cursor:
+                    event = None
+
+    if event:
+        await amark_delivered(device, event)
+    return event
+
+
+async def astream_events(device, heartbeat):
+    """
+    Yield every event for a device: first what is pending, then live ones.
+    Yields None every `heartbeat` seconds without events.
+    """
+    async with DeviceSubscription(device) as subscription:
+        cursor = await aget_cursor(device)
+        async for message in pending_messages(device, cursor):
+            event = message_event(message)
+            await amark_delivered(device, event)
+            cursor = event['id']
+            yield event
+
+        while True:
+            event = await subscription.next_event(heartbeat)
+            if event is None:
+                yield None
+            elif event['id'] > cursor:
+                await amark_delivered(device, event)
+                cursor = event['id']
+                yield event
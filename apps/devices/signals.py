@@ -0,0 +1,15 @@
+"""
+Push new device messages as soon as they are committed.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import DeviceMessage
+from .push import publish_message
+
+
+@receiver(post_save, sender=DeviceMessage)
+def message_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: publish_message(instance))
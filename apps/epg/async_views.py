@@ -0,0 +1,77 @@
+"""
+Async EPG endpoints for ASGI deployments.
+
+Same payloads as ProgramViewSet.now/grid, served on the event loop.
+"""
+from datetime import timedelta
+
+from django.http import JsonResponse
+from django.utils import timezone
+
+from apps.core.authentication import aauthenticate
+from .models import Program
+from .serializers import ProgramSerializer, ProgramCompactSerializer
+
+
+def not_authenticated():
+    return JsonResponse(
+        {'detail': 'Authentication credentials were not provided.'},
+        status=401
+    )
+
+
+async def programs_now(request):
+    """Get currently playing programs."""
+    if not await aauthenticate(request):
+        return not_authenticated()
+
+    now = timezone.now()
+    programs = Program.objects.filter(
+        start_time__lte=now,
+        end_time__gte=now
+    ).select_related('channel')
+
+    channel_id = request.GET.get('channel')
+    if channel_id:
+        programs = programs.filter(channel_id=channel_id)
+
+    programs = [p async for p in programs]
+    return JsonResponse(ProgramSerializer(programs, many=True).data, safe=False)
+
+
+async def programs_grid(request):
+    """Get EPG grid for multiple channels."""
+    if not await aauthenticate(request):
+        return not_authenticated()
+
+    channel_ids = request.GET.getlist('channels')
+    hours = int(request.GET.get('hours', 6))
+
+    now = timezone.now()
+    start = now - timedelta(hours=1)  # Include current program
+    end = now + timedelta(hours=hours)
+
+    queryset = Program.objects.filter(
+        end_time__gte=start,
+        start_time__lte=end
+    ).select_related('channel').order_by('channel__number', 'start_time')
+
+    if channel_ids:
+        queryset = queryset.filter(channel_id__in=channel_ids)
+
+    # Group by channel
+    grid = {}
+    async for program in queryset:
+        channel_id = str(program.channel_id)
+        if channel_id not in grid:
+            grid[channel_id] = {
+                'channel_id': program.channel_id,
+                'channel_name': program.channel.name,
+                'channel_number': program.channel.number,
+                'programs': []
+            }
+        grid[channel_id]['programs'].append(
+            ProgramCompactSerializer(program).data
+        )
+
+    return JsonResponse(list(grid.values()), safe=False)
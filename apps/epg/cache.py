@@ -0,0 +1,202 @@
+"""
+Cached EPG day blobs.
+
+Each UTC day is a Redis hash of channel id -> JSON list of that channel's
+programs overlapping the day, so a lineup page or a short EPG only reads
+the channels it needs. Days are (re)built by the cache warm-up; a day that
+isn't cached falls back to querying the database.
+"""
+import json
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+import redis
+from django.utils import timezone
+
+from apps.core.redis_client import get_async_redis, get_redis
+from .models import Program
+
+logger = logging.getLogger(__name__)
+
+EPG_DAY_KEY = 'epg:day:{}'
+EPG_DAY_TTL = 60 * 60 * 48
+LOADED_FIELD = '_loaded'
+SHORT_EPG_SIZE = 10
+
+
+def day_key(day):
+    return EPG_DAY_KEY.format(day.isoformat())
+
+
+def utc_today():
+    return timezone.now().astimezone(dt_timezone.utc).date()
+
+
+def warm_days():
+    """Days kept warm: today and tomorrow."""
+    today = utc_today()
+    return [today, today + timedelta(days=1)]
+
+
+def item_time(ts):
+    """Aware UTC datetime of a cached program timestamp."""
+    return datetime.fromtimestamp(ts, dt_timezone.utc)
+
+
+def _program_item(prog):
+    return {
+        'id': str(prog.id),
+        'start': int(prog.start_time.timestamp()),
+        'end': int(prog.end_time.timestamp()),
+        'name': prog.title,
+        'descr': prog.description[:200] if prog.description else '',
+    }
+
+
+def build_epg_day(day):
+    """Programs overlapping a UTC day, grouped by channel id."""
+    start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+    programs = Program.objects.filter(
+        start_time__lt=start + timedelta(days=1),
+        end_time__gt=start,
+    ).order_by('start_time').only('id', 'channel_id', 'title', 'description', 'start_time', 'end_time')
+
+    channels = {}
+    for prog in programs.iterator(chunk_size=2000):
+        channels.setdefault(str(prog.channel_id), []).append(_program_item(prog))
+    return channels
+
+
+def refresh_epg_day(day):
+    """Rebuild and store a day; readers never see a half-written hash."""
+    channels = build_epg_day(day)
+    key = day_key(day)
+    mapping = {ch: json.dumps(items) for ch, items in channels.items()}
+    mapping[LOADED_FIELD] = '1'
+
+    pipe = get_redis().pipeline(transaction=True)
+    pipe.delete(key)
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, EPG_DAY_TTL)
+    pipe.execute()
+
+
+def invalidate_epg():
+    """Drop every cached EPG day."""
+    try:
+        client = get_redis()
+        keys = list(client.scan_iter(match=EPG_DAY_KEY.format('*')))
+        if keys:
+            client.delete(*keys)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable invalidating EPG: {e}")
+
+
+def _decode_day(values):
+    """HMGET result (loaded flag first) -> list per channel, None if not cached."""
+    if not values or values[0] is None:
+        return None
+    return [json.loads(v) if v else [] for v in values[1:]]
+
+
+def get_epg_day(day, channel_ids):
+    """Cached programs of some channels for a day, None if the day is cold."""
+    try:
+        values = get_redis().hmget(day_key(day), [LOADED_FIELD, *map(str, channel_ids)])
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading EPG: {e}")
+        return None
+    return _decode_day(values)
+
+
+async def aget_epg_day(day, channel_ids):
+    try:
+        values = await get_async_redis().hmget(day_key(day), [LOADED_FIELD, *map(str, channel_ids)])
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading EPG: {e}")
+        return None
+    return _decode_day(values)
+
+
+# ============== Now playing ==============
+
+def _now_playing_query(channel_ids, now):
+    return Program.objects.filter(
+        channel_id__in=channel_ids,
+        start_time__lte=now,
+        end_time__gte=now
+    )
+
+
+def _current_items(channel_ids, days, now_ts):
+    current = {}
+    for channel_id, items in zip(channel_ids, days):
+        for item in items:
+            if item['start'] > now_ts:
+                break
+            if item['end'] >= now_ts:
+                current[int(channel_id)] = item
+                break
+    return current
+
+
+def now_playing(channel_ids):
+    """Program airing right now per channel id, as cached program items."""
+    now = timezone.now()
+    days = get_epg_day(utc_today(), channel_ids)
+    if days is not None:
+        return _current_items(channel_ids, days, now.timestamp())
+    return {p.channel_id: _program_item(p) for p in _now_playing_query(channel_ids, now)}
+
+
+async def anow_playing(channel_ids):
+    now = timezone.now()
+    days = await aget_epg_day(utc_today(), channel_ids)
+    if days is not None:
+        return _current_items(channel_ids, days, now.timestamp())
+    return {p.channel_id: _program_item(p) async for p in _now_playing_query(channel_ids, now)}
+
+
+# ============== Short EPG ==============
+
+def _short_epg_query(channel_id, now):
+    return Program.objects.filter(
+        channel_id=channel_id,
+        end_time__gte=now
+    ).order_by('start_time')[:SHORT_EPG_SIZE]
+
+
+def _upcoming(items, now_ts, seen):
+    for item in items:
+        if item['end'] >= now_ts and item['id'] not in seen:
+            seen.add(item['id'])
+            yield item
+
+
+def short_epg(channel_id):
+    """Next programs on a channel, starting with the current one."""
+    now = timezone.now()
+    today = utc_today()
+    result, seen = [], set()
+    for day in (today, today + timedelta(days=1)):
+        days = get_epg_day(day, [channel_id])
+        if days is None:
+            return [_program_item(p) for p in _short_epg_query(channel_id, now)]
+        result.extend(_upcoming(days[0], now.timestamp(), seen))
+        if len(result) >= SHORT_EPG_SIZE:
+            break
+    return result[:SHORT_EPG_SIZE]
+
+
+async def ashort_epg(channel_id):
+    now = timezone.now()
+    today = utc_today()
+    result, seen = [], set()
+    for day in (today, today + timedelta(days=1)):
+        days = await aget_epg_day(day, [channel_id])
+        if days is None:
+            return [_program_item(p) async for p in _short_epg_query(channel_id, now)]
+        result.extend(_upcoming(days[0], now.timestamp(), seen))
+        if len(result) >= SHORT_EPG_SIZE:
+            break
+    return result[:SHORT_EPG_SIZE]
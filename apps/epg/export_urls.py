@@ -0,0 +1,9 @@
+"""
+URLs for the xmltv.php guide export.
+"""
+from django.urls import path
+from . import export_views
+
+urlpatterns = [
+    path('', export_views.get_xmltv_view, name='get_xmltv'),
+]
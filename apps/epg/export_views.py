@@ -0,0 +1,42 @@
+"""
+XMLTV export for third-party players (Xtream-style xmltv.php).
+
+    /xmltv.php?username=USER&password=PASS
+
+Serves the pre-built gzip file of the user's tariff as-is to clients that
+accept gzip, and decompresses it on the fly for the rest.
+"""
+import gzip
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from apps.channels.export_views import authenticate_subscriber
+from .xmltv import get_xmltv
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _read_chunks(f):
+    with f:
+        yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+
+
+@require_GET
+def get_xmltv_view(request):
+    """Stream the guide of the user's entitled channels."""
+    user = authenticate_subscriber(request)
+    if isinstance(user, HttpResponse):
+        return user
+
+    path = get_xmltv(user.tariff_id)
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = FileResponse(open(path, 'rb'), content_type='application/xml; charset=utf-8')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(
+            _read_chunks(gzip.open(path, 'rb')),
+            content_type='application/xml; charset=utf-8',
+        )
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -101,9 +101,22 @@ def update_epg_source(source_id):
                 start_time__gte=timezone.now()
             ).delete()
 
-            Program.objects.bulk_create(programs_to_create, batch_size=1000)
+            created = Program.objects.bulk_create(programs_to_create, batch_size=1000)
             logger.info(f"Created {len(programs_to_create)} programs")
 
+            # Cached EPG days are stale now
+            from apps.core.warmup import schedule_warmup
+            from .cache import invalidate_epg
+            invalidate_epg()
+            schedule_warmup()
+            refresh_xmltv_exports.delay()
+
+            # Series recordings for the new programmes
+            from apps.pvr.tasks import apply_recording_rules
+            ids = [p.id for p in created if p.id]
+            if ids:
+                apply_recording_rules.delay(min(ids), max(ids))
+
         source.last_update = timezone.now()
         source.save(update_fields=['last_update'])
 
@@ -122,6 +135,19 @@ def update_all_epg_sources():
         update_epg_source.delay(source.id)
 
 
+@shared_task
+def refresh_xmltv_exports():
+    """Rebuild the XMLTV file of every tariff (and of users without one)."""
+    from apps.accounts.models import Tariff
+    from .xmltv import build_xmltv
+
+    for tariff_id in [None, *Tariff.objects.values_list('id', flat=True)]:
+        try:
+            build_xmltv(tariff_id)
+        except Exception as e:
+            logger.error(f"Error building XMLTV for tariff {tariff_id or 0}: {e}")
+
+
 @shared_task
 def cleanup_old_programs():
     """Delete programs older than 7 days."""
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 
 app_name = 'epg'
 
@@ -9,5 +9,8 @@ router.register(r'sources', views.EpgSourceViewSet)
 router.register(r'programs', views.ProgramViewSet)
 
 urlpatterns = [
+    # Async versions of the hot read endpoints (take precedence over the router)
+    path('programs/now/', async_views.programs_now, name='programs-now'),
+    path('programs/grid/', async_views.programs_grid, name='programs-grid'),
     path('', include(router.urls)),
 ]
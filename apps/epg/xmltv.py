@@ -0,0 +1,137 @@
+"""
+XMLTV export for third-party players.
+
+The guide of a tariff is written element by element straight from a
+server-side cursor into a gzip file (no tree is built in memory) and kept on
+disk, so xmltv.php only streams a pre-built file. Files are rebuilt after
+every EPG ingest.
+"""
+import gzip
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from xml.sax.saxutils import XMLGenerator
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Program
+
+logger = logging.getLogger(__name__)
+
+XMLTV_TIME_FORMAT = '%Y%m%d%H%M%S %z'
+
+
+def export_dir():
+    return Path(settings.QUATTRETV['XMLTV_CACHE_DIR'])
+
+
+def export_path(tariff_id):
+    return export_dir() / f'tariff-{tariff_id or 0}.xml.gz'
+
+
+def _text_element(xml, name, text, attrs=None):
+    xml.startElement(name, attrs or {})
+    xml.characters(text)
+    xml.endElement(name)
+    xml.ignorableWhitespace('\n')
+
+
+def write_xmltv(out, cards):
+    """
+    Write the guide of some lineup cards as XMLTV to a binary file.
+
+    Channels are identified by their xmltv_id (epg_id); cards without one
+    have no guide and are skipped. Past programs are kept for the
+    timeshift window so catchup players can show them. Uploaded logos are
+    made absolute with the PUBLIC_URL setting.
+    """
+    base_url = settings.QUATTRETV['PUBLIC_URL'].rstrip('/')
+    channels = {}
+    for card in cards:
+        if card.get('xmltv_id'):
+            channels.setdefault(card['xmltv_id'], card)
+    xmltv_ids = {int(card['id']): xmltv_id for xmltv_id, card in channels.items()}
+
+    xml = XMLGenerator(out, encoding='utf-8', short_empty_elements=True)
+    xml.startDocument()
+    xml.startElement('tv', {'generator-info-name': 'QuattreTV'})
+    xml.ignorableWhitespace('\n')
+
+    for xmltv_id, card in channels.items():
+        xml.startElement('channel', {'id': xmltv_id})
+        _text_element(xml, 'display-name', card['name'])
+        logo = card.get('logo') or ''
+        if logo:
+            if logo.startswith('/'):
+                logo = base_url + logo
+            xml.startElement('icon', {'src': logo})
+            xml.endElement('icon')
+        xml.endElement('channel')
+        xml.ignorableWhitespace('\n')
+
+    since = timezone.now() - timedelta(hours=settings.QUATTRETV['TIMESHIFT_HOURS'])
+    programs = Program.objects.filter(
+        channel_id__in=list(xmltv_ids),
+        end_time__gte=since,
+    ).order_by('channel_id', 'start_time').only(
+        'channel_id', 'title', 'description', 'category', 'episode_title',
+        'start_time', 'end_time', 'icon',
+    )
+
+    count = 0
+    for prog in programs.iterator(chunk_size=2000):
+        xml.startElement('programme', {
+            'start': prog.start_time.strftime(XMLTV_TIME_FORMAT),
+            'stop': prog.end_time.strftime(XMLTV_TIME_FORMAT),
+            'channel': xmltv_ids[prog.channel_id],
+        })
+        _text_element(xml, 'title', prog.title)
+        if prog.episode_title:
+            _text_element(xml, 'sub-title', prog.episode_title)
+        if prog.description:
+            _text_element(xml, 'desc', prog.description)
+        if prog.category:
+            _text_element(xml, 'category', prog.category)
+        if prog.icon:
+            xml.startElement('icon', {'src': prog.icon})
+            xml.endElement('icon')
+        xml.endElement('programme')
+        xml.ignorableWhitespace('\n')
+        count += 1
+
+    xml.endElement('tv')
+    xml.endDocument()
+    return count
+
+
+def build_xmltv(tariff_id=None):
+    """
+    (Re)build the gzipped XMLTV file of a tariff and return its path.
+    The file is written next to the old one and swapped in atomically.
+    """
+    from apps.channels.cache import get_lineup
+
+    path = export_path(tariff_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as out:
+            count = write_xmltv(out, get_lineup(tariff_id))
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+    logger.info(f"XMLTV for tariff {tariff_id or 0}: {count} programs")
+    return path
+
+
+def get_xmltv(tariff_id=None):
+    """Path of the tariff's XMLTV file, building it if there is none yet."""
+    path = export_path(tariff_id)
+    if not path.exists():
+        path = build_xmltv(tariff_id)
+    return path
+
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Recording, RecordingRule
+from .models import CaptureAsset, Recording, RecordingRule, StorageUsage
 
 
 @admin.register(Recording)
@@ -8,7 +8,7 @@ class RecordingAdmin(admin.ModelAdmin):
     list_filter = ('status', 'channel', 'start_time')
     search_fields = ('title', 'user__username')
     date_hierarchy = 'start_time'
-    raw_id_fields = ('user', 'channel', 'program')
+    raw_id_fields = ('user', 'channel', 'program', 'asset')
 
 
 @admin.register(RecordingRule)
@@ -16,3 +16,20 @@ class RecordingRuleAdmin(admin.ModelAdmin):
     list_display = ('name', 'user', 'channel', 'title_contains', 'is_active')
     list_filter = ('is_active', 'channel')
     search_fields = ('name', 'user__username', 'title_contains')
+
+
+@admin.register(CaptureAsset)
+class CaptureAssetAdmin(admin.ModelAdmin):
+    list_display = ('channel', 'program', 'start_time', 'end_time', 'status', 'ref_count')
+    list_filter = ('status', 'channel')
+    date_hierarchy = 'start_time'
+    raw_id_fields = ('channel', 'program')
+    readonly_fields = ('ref_count',)
+
+
+@admin.register(StorageUsage)
+class StorageUsageAdmin(admin.ModelAdmin):
+    list_display = ('user', 'bytes_used', 'updated_at')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('bytes_used', 'updated_at')
@@ -5,3 +5,6 @@ class PvrConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.pvr'
     verbose_name = 'PVR (Recording)'
+
+    def ready(self):
+        from . import signals  # noqa: F401
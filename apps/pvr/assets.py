@@ -0,0 +1,98 @@
+"""
+Shared network-PVR captures.
+
+Recordings of the same channel window (padding included) point at one
+CaptureAsset, which counts its references: 2,000 users recording the same
+match means one capture and one file. A recording lets go of its asset when
+it is cancelled, fails, has its file deleted or is deleted; the asset goes
+away with the last reference and its file is queued for deletion.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import CaptureAsset, Recording, RecordingStatus
+from .storage import queue_deletion, uncharge
+
+# Recordings in these states don't hold on to a capture
+RELEASED_STATUSES = (RecordingStatus.CANCELLED, RecordingStatus.FAILED)
+
+
+def asset_key(recording):
+    return recording.channel_id, recording.actual_start_time, recording.actual_end_time
+
+
+def _lock_assets(keys):
+    """Assets of the given windows, locked; {key: asset}."""
+    keys = set(keys)
+    assets = CaptureAsset.objects.select_for_update().filter(
+        channel_id__in={k[0] for k in keys},
+        start_time__in={k[1] for k in keys},
+    )
+    return {
+        (a.channel_id, a.start_time, a.end_time): a
+        for a in assets
+        if (a.channel_id, a.start_time, a.end_time) in keys
+    }
+
+
+def attach(recordings):
+    """Point recordings without an asset at the shared capture of their window."""
+    by_key = defaultdict(list)
+    for recording in recordings:
+        if recording.asset_id is None and recording.status not in RELEASED_STATUSES:
+            by_key[asset_key(recording)].append(recording)
+    if not by_key:
+        return
+
+    with transaction.atomic():
+        CaptureAsset.objects.bulk_create([
+            CaptureAsset(channel_id=channel_id, start_time=start, end_time=end, program_id=group[0].program_id)
+            for (channel_id, start, end), group in by_key.items()
+        ], ignore_conflicts=True)
+
+        assets = _lock_assets(by_key)
+        attached = []
+        for key, group in by_key.items():
+            asset = assets[key]
+            asset.ref_count += len(group)
+            for recording in group:
+                recording.asset = asset
+            attached.extend(group)
+        CaptureAsset.objects.bulk_update(assets.values(), ['ref_count'])
+        Recording.objects.bulk_update(attached, ['asset'], batch_size=1000)
+
+
+def detach(recordings):
+    """
+    Drop the asset references of recordings. Assets left without references
+    are deleted and their files removed once the transaction commits.
+    """
+    counts = defaultdict(int)
+    for recording in recordings:
+        if recording.asset_id:
+            counts[recording.asset_id] += 1
+    if not counts:
+        return
+
+    with transaction.atomic():
+        Recording.objects.filter(id__in=[r.id for r in recordings]).update(asset=None)
+        uncharge(recordings)
+        assets = CaptureAsset.objects.select_for_update().filter(id__in=counts)
+        orphans, kept = [], []
+        for asset in assets:
+            asset.ref_count = max(asset.ref_count - counts[asset.id], 0)
+            (kept if asset.ref_count else orphans).append(asset)
+        CaptureAsset.objects.bulk_update(kept, ['ref_count'])
+        if orphans:
+            CaptureAsset.objects.filter(id__in=[a.id for a in orphans]).delete()
+            queue_deletion([a.file_path for a in orphans])
+
+    for recording in recordings:
+        recording.asset = None
+
+
+def release(recording_ids):
+    """detach() by recording id (for bulk status updates)."""
+    detach(list(Recording.objects.filter(id__in=recording_ids, asset__isnull=False)))
+
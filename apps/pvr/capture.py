@@ -0,0 +1,377 @@
+"""
+PVR capture workers.
+
+When the scheduler starts a CaptureAsset it is assigned to a capture node by
+rendezvous hashing of its channel over the live nodes (channel affinity:
+every capture of a channel lands on the same node while it is up) and its id
+is pushed on that node's Redis queue.
+
+Each node (`manage.py run_capture_worker`) runs up to PVR_CAPTURE_WORKERS
+captures as asyncio tasks. A capture follows the channel's live HLS playlist
+and streams every new segment straight to a .ts file, chunk by chunk, until
+the asset's end time. Progress (size and seconds captured) is written for
+all running captures at once every PROGRESS_INTERVAL seconds.
+
+Nodes heartbeat in Redis; captures of a node that stops heartbeating are
+handed to another live node, and a restarted node resumes its own.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from urllib.parse import urljoin
+
+import httpx
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from apps.channels.streams import report_error, select_stream
+from apps.core.redis_client import get_async_redis, get_redis
+from .assets import release
+from .models import CaptureAsset, Recording, RecordingStatus
+from .storage import asset_path, charge, queue_deletion
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'pvr:capture:queue:{}'
+NODES_KEY = 'pvr:capture:nodes'
+
+NODE_TTL = 30
+HEARTBEAT = 10
+PROGRESS_INTERVAL = 10
+# Wait before resuming a capture whose stream failed
+RETRY_DELAY = 5
+CHUNK_SIZE = 64 * 1024
+USER_AGENT = 'QuattreTV-Capture/1.0'
+
+SEQUENCE_RE = re.compile(r'#EXT-X-MEDIA-SEQUENCE:\s*(\d+)')
+TARGET_RE = re.compile(r'#EXT-X-TARGETDURATION:\s*(\d+)')
+
+
+# ============== Assignment ==============
+
+def live_nodes(client=None):
+    client = client or get_redis()
+    return client.zrangebyscore(NODES_KEY, time.time() - NODE_TTL, '+inf')
+
+
+def pick_node(channel_id, nodes):
+    """Rendezvous hashing: the same channel goes to the same node."""
+    return max(nodes, key=lambda node: hashlib.sha1(f'{node}:{channel_id}'.encode()).digest())
+
+
+def dispatch(asset_ids):
+    """Assign started assets to capture nodes and queue them there."""
+    if not asset_ids:
+        return
+    try:
+        client = get_redis()
+        nodes = live_nodes(client)
+    except redis.RedisError as e:
+        logger.warning(f"Can't dispatch captures, Redis unavailable: {e}")
+        return
+    if not nodes:
+        # Picked up by the first node that comes up (see requeue_orphans)
+        logger.warning(f"No capture nodes alive for {len(asset_ids)} captures")
+        return
+
+    assignments = {
+        asset_id: pick_node(channel_id, nodes)
+        for asset_id, channel_id in CaptureAsset.objects.filter(id__in=asset_ids).values_list('id', 'channel_id')
+    }
+    CaptureAsset.objects.filter(id__in=assignments).update(capture_node=Case(
+        *(When(id=asset_id, then=Value(node)) for asset_id, node in assignments.items()),
+        output_field=CharField(),
+    ))
+    pipe = client.pipeline()
+    for asset_id, node in assignments.items():
+        pipe.rpush(QUEUE_KEY.format(node), asset_id)
+    pipe.execute()
+
+
+def requeue_orphans(nodes):
+    """
+    Re-dispatch running captures whose node is gone (or never got one).
+    Conditional updates keep two nodes from claiming the same asset.
+    """
+    if not nodes:
+        return 0
+    orphans = CaptureAsset.objects.filter(
+        status=RecordingStatus.RECORDING, end_time__gt=timezone.now()
+    ).exclude(capture_node__in=nodes).values_list('id', 'channel_id', 'capture_node')
+
+    client = get_redis()
+    requeued = 0
+    for asset_id, channel_id, old_node in orphans:
+        node = pick_node(channel_id, nodes)
+        if CaptureAsset.objects.filter(id=asset_id, capture_node=old_node).update(capture_node=node):
+            client.rpush(QUEUE_KEY.format(node), asset_id)
+            requeued += 1
+    return requeued
+
+
+# ============== Capturing ==============
+
+def parse_media_playlist(text, base_url):
+    """(first media sequence, [(url, duration)], target duration, ended)."""
+    sequence = SEQUENCE_RE.search(text)
+    target = TARGET_RE.search(text)
+    segments = []
+    duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXTINF:'):
+            try:
+                duration = float(line[8:].split(',', 1)[0])
+            except ValueError:
+                duration = 0.0
+        elif line and not line.startswith('#') and duration is not None:
+            segments.append((urljoin(base_url, line), duration))
+            duration = None
+    return (
+        int(sequence.group(1)) if sequence else 0,
+        segments,
+        int(target.group(1)) if target else 6,
+        '#EXT-X-ENDLIST' in text,
+    )
+
+
+async def media_playlist_url(client, url):
+    """Follow a master playlist to its highest-bandwidth variant."""
+    response = await client.get(url)
+    response.raise_for_status()
+    text = response.text
+    if '#EXT-X-STREAM-INF' not in text:
+        return str(response.url)
+    best, best_bandwidth = None, -1
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            match = re.search(r'BANDWIDTH=(\d+)', line)
+            pending = int(match.group(1)) if match else 0
+        elif line and not line.startswith('#') and pending is not None:
+            if pending > best_bandwidth:
+                best, best_bandwidth = urljoin(str(response.url), line), pending
+            pending = None
+    if best is None:
+        raise ValueError('Master playlist without variants')
+    return best
+
+
+async def capture_stream(client, url, out, end_ts, progress=None):
+    """
+    Append the live HLS stream at `url` to the binary file `out` until
+    `end_ts` (epoch) or the end of the playlist. Segments are streamed to
+    disk chunk by chunk. `progress` (a dict) gets 'bytes' and 'seconds'
+    as it goes. Returns it.
+    """
+    progress = progress if progress is not None else {}
+    progress.setdefault('bytes', 0)
+    progress.setdefault('seconds', 0.0)
+    playlist_url = await media_playlist_url(client, url)
+    next_sequence = None
+
+    while time.time() < end_ts:
+        response = await client.get(playlist_url)
+        response.raise_for_status()
+        first, segments, target, ended = parse_media_playlist(response.text, str(response.url))
+        if next_sequence is None:
+            # Join live: start from the newest segment
+            next_sequence = first + max(len(segments) - 1, 0)
+        elif next_sequence < first:
+            logger.warning(f"Capture of {url} fell behind: {first - next_sequence} segments lost")
+            next_sequence = first
+
+        for sequence, (segment_url, duration) in enumerate(segments, start=first):
+            if sequence < next_sequence:
+                continue
+            async with client.stream('GET', segment_url) as segment:
+                segment.raise_for_status()
+                async for chunk in segment.aiter_bytes(CHUNK_SIZE):
+                    out.write(chunk)
+                    progress['bytes'] += len(chunk)
+            progress['seconds'] += duration
+            next_sequence = sequence + 1
+            if time.time() >= end_ts:
+                break
+
+        if ended:
+            break
+        await asyncio.sleep(max(target / 2, 0.5))
+    out.flush()
+    return progress
+
+
+def asset_stream_url(path):
+    public_url = settings.QUATTRETV['PUBLIC_URL']
+    if not public_url:
+        return ''
+    relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    return urljoin(public_url.rstrip('/') + '/', settings.MEDIA_URL + relative)
+
+
+def finish_asset(asset_id, path, progress, error=''):
+    """
+    Store the final result of a capture; nothing captured fails its
+    recordings. False if the asset no longer exists.
+
+    Plain UPDATEs without the status: the scheduler may be marking the
+    asset COMPLETED at the same time, and that must not be written back.
+    """
+    assets = CaptureAsset.objects.filter(id=asset_id)
+    size = progress.get('bytes')
+    if not size:
+        message = error or 'Nothing captured'
+        if not assets.update(
+            file_path='', file_size=None, stream_url='', status=RecordingStatus.FAILED, error_message=message,
+        ):
+            return False
+        failed = list(Recording.objects.filter(asset_id=asset_id).values_list('id', flat=True))
+        Recording.objects.filter(id__in=failed).update(status=RecordingStatus.FAILED, error_message=message)
+        release(failed)
+        queue_deletion([path])
+        return True
+
+    fields = {'file_path': path, 'file_size': size, 'stream_url': asset_stream_url(path)}
+    if progress.get('seconds'):
+        fields['duration'] = int(progress['seconds'])
+    if error:
+        fields['error_message'] = error
+    if not assets.update(**fields):
+        return False
+    charge(CaptureAsset(id=asset_id, file_size=size))
+    return True
+
+
+class CaptureWorker:
+    """One capture node: a bounded pool of concurrent captures."""
+
+    def __init__(self, node, workers=None):
+        self.node = node
+        self.workers = workers or settings.QUATTRETV['PVR_CAPTURE_WORKERS']
+        self.running = {}
+        self.progress = {}
+        self.http = None
+
+    async def capture(self, asset_id):
+        asset = await CaptureAsset.objects.select_related('channel').filter(
+            id=asset_id, status=RecordingStatus.RECORDING, capture_node=self.node
+        ).afirst()
+        if asset is None:
+            return
+        path = asset_path(asset)
+        end_ts = asset.end_time.timestamp()
+        # A resumed capture carries on counting from what is already stored
+        progress = self.progress[asset_id] = {
+            'bytes': os.path.getsize(path) if os.path.exists(path) else 0,
+            'seconds': float(asset.duration or 0),
+        }
+        error = ''
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Append: a resumed capture continues the same file
+            with open(path, 'ab') as out:
+                while True:
+                    # Failover picks another stream if this one is reported down
+                    url = await sync_to_async(select_stream)(asset.channel)
+                    try:
+                        await capture_stream(self.http, url, out, end_ts, progress)
+                        error = ''
+                        break
+                    except (httpx.HTTPError, ValueError) as e:
+                        error = f'{type(e).__name__}: {e}'[:255]
+                        logger.warning(f"Capture {asset_id} interrupted: {error}")
+                        await sync_to_async(report_error)(url, f'capture:{self.node}')
+                        if time.time() + RETRY_DELAY >= end_ts:
+                            break
+                        await asyncio.sleep(RETRY_DELAY)
+        except OSError as e:
+            error = f'{type(e).__name__}: {e}'[:255]
+            logger.error(f"Capture {asset_id} can't write {path}: {error}")
+        finally:
+            self.progress.pop(asset_id, None)
+            if not await sync_to_async(finish_asset)(asset_id, path, progress, error):
+                # Every recording let go of it meanwhile
+                await sync_to_async(queue_deletion)([path])
+
+    def start(self, asset_id):
+        if asset_id in self.running:
+            return
+        task = asyncio.create_task(self.capture(asset_id))
+        self.running[asset_id] = task
+        task.add_done_callback(lambda _: self.running.pop(asset_id, None))
+
+    async def flush_progress(self):
+        """Write size/seconds of every running capture in one batch."""
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            snapshot = {asset_id: dict(p) for asset_id, p in self.progress.items()}
+            if not snapshot:
+                continue
+            assets = [
+                CaptureAsset(id=asset_id, file_size=p['bytes'], duration=int(p.get('seconds', 0)))
+                for asset_id, p in snapshot.items()
+            ]
+            try:
+                await CaptureAsset.objects.abulk_update(assets, ['file_size', 'duration'])
+                alive = {pk async for pk in CaptureAsset.objects.filter(id__in=snapshot).values_list('id', flat=True)}
+            except DatabaseError as e:
+                logger.warning(f"Could not store capture progress: {e}")
+                continue
+            for asset_id in snapshot.keys() - alive:
+                # Deleted (no recordings left): stop capturing it
+                task = self.running.get(asset_id)
+                if task:
+                    task.cancel()
+
+    async def heartbeat(self):
+        while True:
+            try:
+                await get_async_redis().zadd(NODES_KEY, {self.node: time.time()})
+                nodes = await sync_to_async(live_nodes)()
+                if await sync_to_async(requeue_orphans)(nodes):
+                    logger.info("Requeued captures of dead nodes")
+            except redis.RedisError as e:
+                logger.warning(f"Capture node heartbeat failed: {e}")
+            await asyncio.sleep(HEARTBEAT)
+
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.workers * 2)
+        async with httpx.AsyncClient(
+            timeout=settings.QUATTRETV['STREAM_PROBE_TIMEOUT'], limits=limits,
+            follow_redirects=True, headers={'User-Agent': USER_AGENT},
+        ) as self.http:
+            await get_async_redis().zadd(NODES_KEY, {self.node: time.time()})
+            background = [asyncio.create_task(self.heartbeat()), asyncio.create_task(self.flush_progress())]
+
+            # Resume what this node was capturing before a restart
+            async for asset_id in CaptureAsset.objects.filter(
+                status=RecordingStatus.RECORDING, capture_node=self.node
+            ).values_list('id', flat=True):
+                self.start(asset_id)
+
+            queue = QUEUE_KEY.format(self.node)
+            try:
+                while True:
+                    if len(self.running) >= self.workers:
+                        await asyncio.sleep(1)
+                        continue
+                    try:
+                        item = await get_async_redis().blpop(queue, timeout=HEARTBEAT)
+                    except redis.RedisError as e:
+                        logger.warning(f"Capture queue unavailable: {e}")
+                        await asyncio.sleep(HEARTBEAT)
+                        continue
+                    if item:
+                        self.start(int(item[1]))
+            finally:
+                for task in background:
+                    task.cancel()
+                await get_async_redis().zrem(NODES_KEY, self.node)
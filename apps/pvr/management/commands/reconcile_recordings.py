@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.pvr.storage import reap, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Compare the PVR storage directory with the database and fix the differences'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report, change nothing')
+
+    def handle(self, *args, **options):
+        result = reconcile(dry_run=options['dry_run'])
+        self.stdout.write(f"  {result['files']:>8} files on disk")
+        self.stdout.write(f"  {result['orphans']:>8} orphan files")
+        self.stdout.write(f"  {result['missing']:>8} captures with a missing file")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing changed'))
+            return
+        deleted = reap()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled; {deleted} files deleted'))
@@ -0,0 +1,24 @@
+import asyncio
+import logging
+import socket
+
+from django.core.management.base import BaseCommand
+
+from apps.pvr.capture import CaptureWorker
+
+
+class Command(BaseCommand):
+    help = 'Run a PVR capture node (records the captures assigned to it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--node', default=socket.gethostname(), help='Node name (default: hostname)')
+        parser.add_argument('--workers', type=int, help='Concurrent captures (default: PVR_CAPTURE_WORKERS)')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+        worker = CaptureWorker(options['node'], options['workers'])
+        self.stdout.write(f'Capture node {worker.node} running ({worker.workers} workers)')
+        try:
+            asyncio.run(worker.run())
+        except KeyboardInterrupt:
+            self.stdout.write('Capture node stopped')
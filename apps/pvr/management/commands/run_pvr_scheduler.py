@@ -0,0 +1,20 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.pvr.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the PVR scheduler (starts and stops recordings on time)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resync', type=int, help='Seconds between full reloads (default: PVR_SCHEDULER_RESYNC)')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+        self.stdout.write('PVR scheduler running')
+        try:
+            Scheduler().run(resync=options['resync'])
+        except KeyboardInterrupt:
+            self.stdout.write('PVR scheduler stopped')
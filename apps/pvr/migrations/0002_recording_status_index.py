@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0004_stream_health'),
+        ('epg', '0001_initial'),
+        ('pvr', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recording',
+            index=models.Index(fields=['status', 'start_time'], name='pvr_recordi_status_ecb84f_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('channels', '0004_stream_health'),
+        ('epg', '0001_initial'),
+        ('pvr', '0002_recording_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaptureAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('recording', 'Recording'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='scheduled', max_length=20)),
+                ('error_message', models.TextField(blank=True)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('file_size', models.BigIntegerField(blank=True, null=True)),
+                ('stream_url', models.URLField(blank=True, max_length=500)),
+                ('duration', models.PositiveIntegerField(blank=True, help_text='Duration in seconds', null=True)),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Recordings using this capture')),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capture_assets', to='channels.channel')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='capture_assets', to='epg.program')),
+            ],
+            options={
+                'verbose_name': 'Capture Asset',
+                'verbose_name_plural': 'Capture Assets',
+                'ordering': ['-start_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recordings', to='pvr.captureasset'),
+        ),
+        migrations.AddConstraint(
+            model_name='captureasset',
+            constraint=models.UniqueConstraint(fields=('channel', 'start_time', 'end_time'), name='unique_capture_window'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pvr', '0003_capture_asset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='rule',
+            field=models.ForeignKey(blank=True, help_text='Rule that scheduled it (series recording)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recordings', to='pvr.recordingrule'),
+        ),
+    ]
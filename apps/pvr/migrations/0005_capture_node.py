@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pvr', '0004_recording_rule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='captureasset',
+            name='capture_node',
+            field=models.CharField(blank=True, help_text='Capture worker node recording it', max_length=100),
+        ),
+    ]
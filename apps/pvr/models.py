@@ -13,6 +13,54 @@ class RecordingStatus(models.TextChoices):
     CANCELLED = 'cancelled', 'Cancelled'
 
 
+class CaptureAsset(TimeStampedModel):
+    """
+    One physical capture of a channel window (padding included), shared by
+    every Recording of that window. Deleted, with its file, when the last
+    recording referencing it lets go.
+    """
+    channel = models.ForeignKey(
+        'channels.Channel',
+        on_delete=models.CASCADE,
+        related_name='capture_assets'
+    )
+    program = models.ForeignKey(
+        'epg.Program',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='capture_assets'
+    )
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+
+    status = models.CharField(
+        max_length=20,
+        choices=RecordingStatus.choices,
+        default=RecordingStatus.SCHEDULED
+    )
+    error_message = models.TextField(blank=True)
+
+    file_path = models.CharField(max_length=500, blank=True)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    stream_url = models.URLField(max_length=500, blank=True)
+    duration = models.PositiveIntegerField(null=True, blank=True, help_text='Duration in seconds')
+
+    ref_count = models.PositiveIntegerField(default=0, help_text='Recordings using this capture')
+    capture_node = models.CharField(max_length=100, blank=True, help_text='Capture worker node recording it')
+
+    class Meta:
+        verbose_name = 'Capture Asset'
+        verbose_name_plural = 'Capture Assets'
+        ordering = ['-start_time']
+        constraints = [
+            models.UniqueConstraint(fields=['channel', 'start_time', 'end_time'], name='unique_capture_window'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel_id} {self.start_time:%Y-%m-%d %H:%M} ({self.ref_count} refs)"
+
+
 class Recording(TimeStampedModel):
     """Scheduled or completed recording."""
     user = models.ForeignKey(
@@ -33,6 +81,22 @@ class Recording(TimeStampedModel):
         related_name='recordings'
     )
 
+    rule = models.ForeignKey(
+        'RecordingRule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recordings',
+        help_text='Rule that scheduled it (series recording)'
+    )
+    asset = models.ForeignKey(
+        CaptureAsset,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recordings'
+    )
+
     # Recording details
     title = models.CharField(max_length=300)
     description = models.TextField(blank=True)
@@ -53,6 +117,9 @@ class Recording(TimeStampedModel):
     stream_url = models.URLField(max_length=500, blank=True)
     duration = models.PositiveIntegerField(null=True, blank=True, help_text='Duration in seconds')
 
+    # Bytes counted in the user's StorageUsage for this recording
+    charged_bytes = models.BigIntegerField(default=0)
+
     # Options
     pre_padding = models.PositiveIntegerField(default=0, help_text='Minutes before start')
     post_padding = models.PositiveIntegerField(default=0, help_text='Minutes after end')
@@ -61,6 +128,9 @@ class Recording(TimeStampedModel):
         verbose_name = 'Recording'
         verbose_name_plural = 'Recordings'
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['status', 'start_time']),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.status})"
@@ -76,6 +146,37 @@ class Recording(TimeStampedModel):
         return self.end_time + timedelta(minutes=self.post_padding)
 
 
+class StorageUsage(models.Model):
+    """PVR bytes used by a user (the full size of each of their recordings)."""
+    user = models.OneToOneField(
+        'accounts.User',
+        on_delete=models.CASCADE,
+        related_name='pvr_usage'
+    )
+    bytes_used = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Storage Usage'
+        verbose_name_plural = 'Storage Usage'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.bytes_used} bytes"
+
+
+class FileDeletion(models.Model):
+    """Recording file waiting to be deleted by the reaper."""
+    path = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Pending File Deletion'
+        verbose_name_plural = 'Pending File Deletions'
+
+    def __str__(self):
+        return self.path
+
+
 class RecordingRule(TimeStampedModel):
     """Auto-recording rules (series recording)."""
     user = models.ForeignKey(
@@ -0,0 +1,258 @@
+"""
+Series recording: RecordingRule matching.
+
+Rules are compiled once per run into a RuleMatcher. `title_contains`
+patterns go into an Aho-Corasick automaton, so each programme title is
+scanned once whatever the number of rules; channel and category are then
+plain lookups. Rules without a title pattern are bucketed by
+(channel, category). Only the programmes inserted by an EPG ingest are
+matched, and the resulting recordings are bulk-created; a rule that is
+created or edited is matched against the programmes already in the guide.
+
+keep_recordings caps both the upcoming recordings a rule schedules and the
+completed ones it keeps: when a recording completes, the oldest completed
+recordings of its rule beyond that number are deleted (prune()).
+"""
+import logging
+from collections import defaultdict, deque
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.epg.models import Program
+from .assets import attach
+from .models import Recording, RecordingRule, RecordingStatus
+from .scheduler import notify
+from .storage import available_bytes, estimate_bytes, window_seconds
+
+logger = logging.getLogger(__name__)
+
+UPCOMING_STATUSES = (RecordingStatus.SCHEDULED, RecordingStatus.RECORDING)
+
+
+class AhoCorasick:
+    """Multi-pattern substring search; patterns map to arbitrary values."""
+
+    def __init__(self, patterns):
+        # Trie as parallel lists: transitions, failure links, outputs
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern, value in patterns:
+            node = 0
+            for char in pattern:
+                nxt = self.goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(value)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self.goto[node].items():
+                queue.append(nxt)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[nxt] = self.goto[fail].get(char, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def search(self, text):
+        """Values of every pattern found in text."""
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            found.update(self.out[node])
+        return found
+
+
+class RuleMatcher:
+    """Active rules compiled for matching many programmes."""
+
+    def __init__(self, rules):
+        self.rules = {rule.id: rule for rule in rules}
+        self.untitled = defaultdict(list)
+        patterns = []
+        for rule in self.rules.values():
+            title = rule.title_contains.lower()
+            if title:
+                patterns.append((title, rule.id))
+            else:
+                self.untitled[(rule.channel_id, (rule.category or '').lower())].append(rule)
+        self.automaton = AhoCorasick(patterns)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def match(self, channel_id, title, category):
+        """Rules matching a programme (same semantics as matches_program)."""
+        category = (category or '').lower()
+        matched = []
+        for rule_id in self.automaton.search((title or '').lower()):
+            rule = self.rules[rule_id]
+            if rule.channel_id and rule.channel_id != channel_id:
+                continue
+            if rule.category and rule.category.lower() != category:
+                continue
+            matched.append(rule)
+        # A set: with an uncategorised programme the keys would repeat and
+        # the same rules would match twice
+        for key in {(channel_id, category), (channel_id, ''), (None, category), (None, '')}:
+            matched.extend(self.untitled.get(key, ()))
+        return matched
+
+
+def active_rules():
+    return RecordingRule.objects.filter(is_active=True, user__is_active=True).exclude(
+        user__tariff__has_pvr=False
+    ).select_related('user__tariff')
+
+
+def _existing_keys(user_ids, programs):
+    """(user, channel, start) of recordings already covering these programmes."""
+    if not programs:
+        return set()
+    starts = [p.start_time for p in programs]
+    return set(Recording.objects.filter(
+        user_id__in=user_ids,
+        start_time__gte=min(starts),
+        start_time__lte=max(starts),
+    ).exclude(status=RecordingStatus.CANCELLED).values_list('user_id', 'channel_id', 'start_time'))
+
+
+def _upcoming_counts(rules):
+    """{rule id: scheduled or in-progress recordings} of rules with keep_recordings."""
+    rule_ids = [rule.id for rule in rules if rule.keep_recordings]
+    if not rule_ids:
+        return {}
+    return dict(
+        Recording.objects.filter(rule_id__in=rule_ids, status__in=UPCOMING_STATUSES)
+        .values('rule_id').annotate(count=Count('id')).values_list('rule_id', 'count')
+    )
+
+
+def prune(rule_ids):
+    """
+    Delete the oldest completed recordings of each rule beyond its
+    keep_recordings; returns how many were deleted.
+    """
+    deleted = 0
+    for rule in RecordingRule.objects.filter(id__in=rule_ids, keep_recordings__gt=0):
+        completed = Recording.objects.filter(rule=rule, status=RecordingStatus.COMPLETED).order_by('-start_time')
+        # One by one through the signals, so shared captures and files are released
+        for recording in completed[rule.keep_recordings:]:
+            recording.delete()
+            deleted += 1
+    return deleted
+
+
+def apply_rules(programs, rules=None):
+    """
+    Schedule recordings for programmes matching active rules.
+    Returns the created recordings.
+    """
+    matcher = RuleMatcher(list(rules if rules is not None else active_rules()))
+    if not matcher:
+        return []
+
+    matches = defaultdict(list)
+    for program in programs:
+        for rule in matcher.match(program.channel_id, program.title, program.category):
+            matches[rule.id].append(program)
+    if not matches:
+        return []
+
+    user_ids = {matcher.rules[rule_id].user_id for rule_id in matches}
+    existing = _existing_keys(user_ids, {p for progs in matches.values() for p in progs})
+    upcoming = _upcoming_counts(matcher.rules[rule_id] for rule_id in matches)
+
+    # Room left per user, spent as recordings are added
+    budgets = {}
+    skipped = 0
+
+    recordings = []
+    for rule_id, progs in matches.items():
+        rule = matcher.rules[rule_id]
+        # A rule never has more upcoming recordings than it keeps
+        room = rule.keep_recordings - upcoming.get(rule.id, 0) if rule.keep_recordings else None
+        for program in sorted(progs, key=lambda p: p.start_time):
+            if room is not None and room <= 0:
+                break
+            key = (rule.user_id, program.channel_id, program.start_time)
+            if key in existing:
+                continue
+            if rule.user_id not in budgets:
+                budgets[rule.user_id] = available_bytes(rule.user)
+            if budgets[rule.user_id] is not None:
+                size = estimate_bytes(window_seconds(
+                    program.start_time, program.end_time, rule.pre_padding, rule.post_padding
+                ))
+                if size > budgets[rule.user_id]:
+                    skipped += 1
+                    continue
+                budgets[rule.user_id] -= size
+            existing.add(key)
+            if room is not None:
+                room -= 1
+            recordings.append(Recording(
+                user_id=rule.user_id,
+                channel_id=program.channel_id,
+                program=program,
+                rule=rule,
+                title=program.title,
+                description=program.description,
+                start_time=program.start_time,
+                end_time=program.end_time,
+                pre_padding=rule.pre_padding,
+                post_padding=rule.post_padding,
+            ))
+
+    with transaction.atomic():
+        created = Recording.objects.bulk_create(recordings, batch_size=1000)
+        # bulk_create doesn't send post_save
+        attach(created)
+        ids = [r.id for r in created]
+        transaction.on_commit(lambda: notify(ids))
+
+    logger.info(
+        f"Recording rules: {len(created)} recordings scheduled for {len(matches)} rules"
+        f" ({skipped} over quota)"
+    )
+    return created
+
+
+PROGRAM_FIELDS = ('id', 'channel_id', 'title', 'description', 'category', 'start_time', 'end_time')
+
+
+def apply_rules_to_new_programs(first_id, last_id):
+    """Match the programmes inserted by one EPG ingest (an id range)."""
+    programs = Program.objects.filter(
+        id__range=(first_id, last_id), end_time__gt=timezone.now()
+    ).only(*PROGRAM_FIELDS)
+    return apply_rules(programs.iterator(chunk_size=5000))
+
+
+def apply_rule(rule_id):
+    """Match one (new or edited) rule against the programmes still to come."""
+    rules = list(active_rules().filter(id=rule_id))
+    if not rules:
+        return []
+    rule = rules[0]
+    programs = Program.objects.filter(end_time__gt=timezone.now())
+    # Narrowed in the database; the matcher has the final word
+    if rule.channel_id:
+        programs = programs.filter(channel_id=rule.channel_id)
+    if rule.title_contains:
+        programs = programs.filter(title__icontains=rule.title_contains)
+    if rule.category:
+        programs = programs.filter(category__iexact=rule.category)
+    return apply_rules(programs.only(*PROGRAM_FIELDS).iterator(chunk_size=5000), rules)
@@ -0,0 +1,251 @@
+"""
+PVR recording scheduler.
+
+A single long-running process (`manage.py run_pvr_scheduler`) keeps every
+SCHEDULED/RECORDING recording in an in-memory heap of start/stop jobs keyed
+by actual_start_time/actual_end_time, and sleeps until the next one is due.
+Recordings firing in the same second are started/stopped with one UPDATE,
+along with the shared capture assets behind them (see assets.py).
+
+The database is only read on startup and on a slow periodic resync. Changes
+made through the API are announced on a Redis pub/sub channel (see
+signals.py) and reloaded by id. Jobs are conditional updates on the current
+status, so a second scheduler or a replayed job is harmless.
+"""
+import heapq
+import itertools
+import json
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+
+from apps.core.redis_client import get_redis
+from .assets import attach, release
+from .capture import dispatch
+from .models import CaptureAsset, Recording, RecordingStatus
+from .tasks import prune_rule_recordings
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_CHANNEL = 'pvr:scheduler'
+ACTIVE_STATUSES = (RecordingStatus.SCHEDULED, RecordingStatus.RECORDING)
+
+START, STOP = 'start', 'stop'
+# Longest sleep while Redis is unreachable (pub/sub can't wake us)
+REDIS_RETRY = 5
+
+
+def notify(recording_ids):
+    """Tell the scheduler these recordings were created, changed or deleted."""
+    if not recording_ids:
+        return
+    try:
+        get_redis().publish(SCHEDULER_CHANNEL, json.dumps(list(recording_ids)))
+    except redis.RedisError as e:
+        # Picked up by the next resync
+        logger.warning(f"Could not notify the PVR scheduler: {e}")
+
+
+# ============== Jobs ==============
+
+def _durations(field, durations):
+    return Case(
+        *(When(**{field: pk}, then=Value(seconds)) for pk, seconds in durations.items()),
+        output_field=IntegerField(),
+    )
+
+
+def start_recordings(ids):
+    """
+    SCHEDULED -> RECORDING, starting the shared capture of each window
+    once; returns how many recordings started.
+    """
+    # Recordings scheduled before captures were shared
+    attach(Recording.objects.filter(id__in=ids, asset__isnull=True))
+    asset_ids = list(CaptureAsset.objects.filter(
+        recordings__id__in=ids, status=RecordingStatus.SCHEDULED
+    ).values_list('id', flat=True).distinct())
+    CaptureAsset.objects.filter(id__in=asset_ids).update(status=RecordingStatus.RECORDING)
+    started = Recording.objects.filter(id__in=ids, status=RecordingStatus.SCHEDULED).update(
+        status=RecordingStatus.RECORDING,
+    )
+    dispatch(asset_ids)
+    return started
+
+
+def stop_recordings(durations):
+    """RECORDING -> COMPLETED for {id: seconds}; returns how many stopped."""
+    assets = CaptureAsset.objects.filter(recordings__id__in=durations, status=RecordingStatus.RECORDING)
+    asset_durations = {
+        pk: int((end - start).total_seconds())
+        for pk, start, end in assets.values_list('id', 'start_time', 'end_time').distinct()
+    }
+    if asset_durations:
+        CaptureAsset.objects.filter(id__in=asset_durations).update(
+            status=RecordingStatus.COMPLETED, duration=_durations('id', asset_durations),
+        )
+    stopping = Recording.objects.filter(id__in=durations, status=RecordingStatus.RECORDING)
+    rule_ids = set(stopping.filter(rule__keep_recordings__gt=0).values_list('rule_id', flat=True))
+    stopped = stopping.update(status=RecordingStatus.COMPLETED, duration=_durations('id', durations))
+    if rule_ids:
+        # Out of the scheduler loop: deleting recordings releases files and captures
+        prune_rule_recordings.delay(sorted(rule_ids))
+    return stopped
+
+
+def fail_recordings(ids, message):
+    failed = Recording.objects.filter(id__in=ids, status__in=ACTIVE_STATUSES).update(
+        status=RecordingStatus.FAILED, error_message=message,
+    )
+    release(ids)
+    return failed
+
+
+# ============== Scheduler ==============
+
+class Scheduler:
+    """
+    Heap of (time, seq, action, recording id, version). Rescheduling a
+    recording bumps its version instead of searching the heap; stale entries
+    are dropped when they reach the top.
+    """
+
+    def __init__(self):
+        self.heap = []
+        # id -> (version, start, end) of recordings with pending jobs
+        self.jobs = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def _push(self, when, action, recording_id, version):
+        heapq.heappush(self.heap, (when, next(self._seq), action, recording_id, version))
+
+    def schedule(self, recording_id, status, start, end):
+        """(Re)schedule one recording; start/end are epoch seconds."""
+        version = self.jobs[recording_id][0] + 1 if recording_id in self.jobs else 0
+        self.jobs[recording_id] = (version, start, end)
+        if status == RecordingStatus.SCHEDULED:
+            self._push(start, START, recording_id, version)
+        self._push(end, STOP, recording_id, version)
+
+    def unschedule(self, recording_id):
+        self.jobs.pop(recording_id, None)
+
+    def load(self, ids=None, now=None):
+        """
+        Read active recordings from the database (all, or just `ids`).
+        Recordings whose window already ended while nobody was watching
+        are marked FAILED.
+        """
+        now = now or time.time()
+        recordings = Recording.objects.filter(status__in=ACTIVE_STATUSES)
+        if ids is None:
+            self.heap, self.jobs = [], {}
+        else:
+            recordings = recordings.filter(id__in=ids)
+            for recording_id in ids:
+                self.unschedule(recording_id)
+
+        missed = []
+        rows = recordings.values_list('id', 'status', 'start_time', 'end_time', 'pre_padding', 'post_padding')
+        for recording_id, status, start_time, end_time, pre, post in rows.iterator(chunk_size=5000):
+            start = start_time.timestamp() - pre * 60
+            end = end_time.timestamp() + post * 60
+            if status == RecordingStatus.SCHEDULED and end <= now:
+                missed.append(recording_id)
+            else:
+                self.schedule(recording_id, status, start, end)
+        if missed:
+            fail_recordings(missed, 'Missed: the scheduler was not running')
+        return len(missed)
+
+    def next_time(self):
+        """Time of the next live job, None if there are none."""
+        while self.heap:
+            when, _, _, recording_id, version = self.heap[0]
+            job = self.jobs.get(recording_id)
+            if job and job[0] == version:
+                return when
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now):
+        """Live jobs due at `now`: ([ids to start], {id: seconds to stop})."""
+        starts, stops = [], {}
+        while self.heap and self.heap[0][0] <= now:
+            _, _, action, recording_id, version = heapq.heappop(self.heap)
+            job = self.jobs.get(recording_id)
+            if not job or job[0] != version:
+                continue
+            if action == START:
+                starts.append(recording_id)
+            else:
+                _, start, end = job
+                stops[recording_id] = int(end - start)
+                del self.jobs[recording_id]
+        return starts, stops
+
+    def fire(self, now=None):
+        """Run every due job; returns (started, stopped)."""
+        starts, stops = self.pop_due(now or time.time())
+        started = start_recordings(starts) if starts else 0
+        stopped = stop_recordings(stops) if stops else 0
+        if started or stopped:
+            logger.info(f"PVR scheduler: {started} started, {stopped} stopped")
+        return started, stopped
+
+    def _subscribe(self):
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(SCHEDULER_CHANNEL)
+            return pubsub
+        except redis.RedisError as e:
+            logger.warning(f"PVR scheduler can't subscribe to Redis: {e}")
+            return None
+
+    def run(self, resync=None):
+        """Main loop; never returns."""
+        resync = resync or settings.QUATTRETV['PVR_SCHEDULER_RESYNC']
+        pubsub = None
+        next_resync = 0
+        while True:
+            if pubsub is None:
+                pubsub = self._subscribe()
+                if pubsub is not None:
+                    # Changes published while we weren't listening
+                    next_resync = 0
+
+            now = time.time()
+            if now >= next_resync:
+                self.load(now=now)
+                next_resync = now + resync
+                logger.info(f"PVR scheduler: {len(self)} recordings scheduled")
+
+            self.fire(now)
+
+            next_job = self.next_time()
+            wake = next_resync if next_job is None else min(next_job, next_resync)
+            timeout = max(wake - time.time(), 0)
+            if pubsub is None:
+                time.sleep(min(timeout, REDIS_RETRY))
+                continue
+
+            changed = set()
+            try:
+                message = pubsub.get_message(timeout=timeout)
+                while message:
+                    try:
+                        changed.update(json.loads(message['data']))
+                    except (TypeError, ValueError):
+                        pass
+                    message = pubsub.get_message(timeout=0)
+            except redis.RedisError as e:
+                logger.warning(f"PVR scheduler lost Redis: {e}")
+                pubsub = None
+            if changed:
+                self.load(ids=changed)
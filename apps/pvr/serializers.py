@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import Recording, RecordingRule
+from .models import Recording, RecordingRule, RecordingStatus
+from .storage import PENDING_STATUSES, quota_error, window_seconds
+
+# Fields that make up a recording window
+WINDOW_FIELDS = ('start_time', 'end_time', 'pre_padding', 'post_padding')
 
 
 class RecordingSerializer(serializers.ModelSerializer):
@@ -20,6 +24,33 @@ class RecordingSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['user', 'status', 'file_path', 'file_size', 'stream_url', 'duration']
 
+    def validate(self, attrs):
+        recording = self.instance
+        if recording is None:
+            return attrs
+        window = {field: attrs.get(field, getattr(recording, field)) for field in WINDOW_FIELDS}
+        if all(window[field] == getattr(recording, field) for field in WINDOW_FIELDS):
+            return attrs
+        # The current window is already reserved unless it's been charged for real
+        reserved = recording.status in PENDING_STATUSES and not recording.charged_bytes
+        error = quota_error(
+            recording.user,
+            window_seconds(**window),
+            replacing=window_seconds(*(getattr(recording, field) for field in WINDOW_FIELDS)) if reserved else 0,
+        )
+        if error:
+            raise serializers.ValidationError(error)
+        return attrs
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        asset = instance.asset
+        if asset and asset.status == RecordingStatus.COMPLETED:
+            # The file belongs to the capture shared with other users
+            for field in ('file_path', 'file_size', 'stream_url', 'duration'):
+                data[field] = getattr(asset, field) or data[field]
+        return data
+
 
 class RecordingCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,6 +60,15 @@ class RecordingCreateSerializer(serializers.ModelSerializer):
             'start_time', 'end_time', 'pre_padding', 'post_padding'
         ]
 
+    def validate(self, attrs):
+        seconds = window_seconds(
+            attrs['start_time'], attrs['end_time'], attrs.get('pre_padding', 0), attrs.get('post_padding', 0)
+        )
+        error = quota_error(self.context['request'].user, seconds)
+        if error:
+            raise serializers.ValidationError(error)
+        return attrs
+
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
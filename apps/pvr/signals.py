@@ -0,0 +1,46 @@
+"""
+Keep capture assets and the PVR scheduler in step with recording changes,
+and apply recording rules as soon as they are saved.
+Bulk creates/updates don't send signals: call assets.attach()/release() and
+scheduler.notify() after them.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .assets import RELEASED_STATUSES, asset_key, attach, detach
+from .models import Recording, RecordingRule, RecordingStatus
+from .scheduler import notify
+
+
+@receiver(post_save, sender=Recording)
+def recording_saved(sender, instance, created, **kwargs):
+    if instance.status in RELEASED_STATUSES:
+        detach([instance])
+    elif instance.status == RecordingStatus.SCHEDULED:
+        asset = instance.asset
+        if asset and asset_key(instance) != (asset.channel_id, asset.start_time, asset.end_time):
+            # Times or padding changed: it's another window now
+            detach([instance])
+        attach([instance])
+
+
+@receiver(post_delete, sender=Recording)
+def recording_deleted(sender, instance, **kwargs):
+    detach([instance])
+
+
+@receiver(post_save, sender=Recording)
+@receiver(post_delete, sender=Recording)
+def recording_changed(sender, instance, **kwargs):
+    recording_id = instance.id
+    transaction.on_commit(lambda: notify([recording_id]))
+
+
+@receiver(post_save, sender=RecordingRule)
+def rule_saved(sender, instance, **kwargs):
+    if instance.is_active:
+        from .tasks import apply_recording_rule
+
+        rule_id = instance.id
+        transaction.on_commit(lambda: apply_recording_rule.delay(rule_id))
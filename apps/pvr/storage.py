@@ -0,0 +1,236 @@
+"""
+PVR storage: quotas, file reaping and disk reconciliation.
+
+Each user is charged the full size of every recording they keep, even when
+the capture is shared. The totals live in StorageUsage and are updated in
+the same transaction as the recordings (Recording.charged_bytes says what
+each one added), so they never need a SUM over the recordings table.
+Scheduling is refused when the tariff quota can't fit the estimated size.
+
+Files are never deleted inline: paths go to the FileDeletion table with
+the database change that orphaned them, and the reaper task deletes them in
+batches. reconcile() walks the storage directory with os.scandir to queue
+files no asset knows about and to drop assets whose file is gone.
+"""
+import logging
+import os
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import CaptureAsset, FileDeletion, Recording, RecordingStatus, StorageUsage
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+REAP_BATCH = 500
+# Files younger than this may belong to a capture that just started
+ORPHAN_GRACE = 60 * 60
+
+# Recordings that hold on to their charge
+CHARGED_STATUSES = (RecordingStatus.RECORDING, RecordingStatus.COMPLETED)
+PENDING_STATUSES = (RecordingStatus.SCHEDULED, RecordingStatus.RECORDING)
+
+
+def asset_path(asset):
+    return os.path.join(settings.QUATTRETV['PVR_STORAGE_DIR'], str(asset.channel_id), f'{asset.id}.ts')
+
+
+# ============== Quota ==============
+
+def quota_bytes(user):
+    """User's PVR quota in bytes, None if unlimited."""
+    tariff = user.tariff
+    if tariff is None or not tariff.pvr_quota_gb:
+        return None
+    return tariff.pvr_quota_gb * GB
+
+
+def estimate_bytes(seconds):
+    return int(max(seconds, 0) * settings.QUATTRETV['PVR_ESTIMATED_BITRATE'] / 8)
+
+
+def window_seconds(start_time, end_time, pre_padding=0, post_padding=0):
+    """Length of a recording window, padding included."""
+    return (end_time - start_time).total_seconds() + (pre_padding + post_padding) * 60
+
+
+def reserved_bytes(user_id):
+    """Estimated size of the user's recordings not captured yet."""
+    windows = Recording.objects.filter(
+        user_id=user_id, status__in=PENDING_STATUSES, charged_bytes=0
+    ).values_list('start_time', 'end_time', 'pre_padding', 'post_padding')
+    return sum(estimate_bytes(window_seconds(*window)) for window in windows)
+
+
+def used_bytes(user_id):
+    return StorageUsage.objects.filter(user_id=user_id).values_list('bytes_used', flat=True).first() or 0
+
+
+def available_bytes(user):
+    """Room left in the user's quota (estimates included), None if unlimited."""
+    quota = quota_bytes(user)
+    if quota is None:
+        return None
+    return quota - used_bytes(user.id) - reserved_bytes(user.id)
+
+
+def quota_error(user, seconds, replacing=0):
+    """
+    Message if recording `seconds` more would exceed the quota, else None.
+    `replacing` is the reserved length of a recording being resized.
+    """
+    available = available_bytes(user)
+    if available is not None and estimate_bytes(seconds) - estimate_bytes(replacing) > available:
+        return f'PVR storage quota exceeded ({quota_bytes(user) // GB} GB)'
+    return None
+
+
+# ============== Accounting ==============
+
+def add_usage(deltas):
+    """Apply {user_id: byte delta} to the usage counters."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Only charges can need a new row (and a user being deleted must not get one)
+    StorageUsage.objects.bulk_create(
+        [StorageUsage(user_id=user_id) for user_id, delta in deltas.items() if delta > 0],
+        ignore_conflicts=True,
+    )
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        StorageUsage.objects.filter(user_id__in=user_ids).update(
+            bytes_used=F('bytes_used') + delta, updated_at=timezone.now()
+        )
+
+
+def charge(asset):
+    """Charge the recordings of an asset its current file size."""
+    size = asset.file_size or 0
+    with transaction.atomic():
+        rows = list(Recording.objects.select_for_update().filter(
+            asset=asset, status__in=CHARGED_STATUSES
+        ).values_list('id', 'user_id', 'charged_bytes'))
+        deltas = defaultdict(int)
+        for _, user_id, charged in rows:
+            deltas[user_id] += size - charged
+        Recording.objects.filter(id__in=[r[0] for r in rows]).update(charged_bytes=size)
+        add_usage(deltas)
+
+
+def uncharge(recordings):
+    """Give back what recordings were charged (they're deleted or let go)."""
+    deltas = defaultdict(int)
+    for recording in recordings:
+        if recording.charged_bytes:
+            deltas[recording.user_id] -= recording.charged_bytes
+            recording.charged_bytes = 0
+    if deltas:
+        Recording.objects.filter(id__in=[r.id for r in recordings]).update(charged_bytes=0)
+        add_usage(deltas)
+
+
+# ============== Reaping ==============
+
+def queue_deletion(paths):
+    """Delete files once the current transaction commits (in the background)."""
+    paths = [p for p in paths if p]
+    if not paths:
+        return
+    FileDeletion.objects.bulk_create([FileDeletion(path=p) for p in paths])
+    from .tasks import reap_recording_files
+    transaction.on_commit(reap_recording_files.delay)
+
+
+def reap(batch_size=REAP_BATCH):
+    """Delete queued files in batches; returns how many were processed."""
+    done = 0
+    while True:
+        batch = list(FileDeletion.objects.order_by('id').values_list('id', 'path')[:batch_size])
+        if not batch:
+            return done
+        for _, path in batch:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete recording file {path}: {e}")
+        FileDeletion.objects.filter(id__in=[pk for pk, _ in batch]).delete()
+        done += len(batch)
+
+
+# ============== Reconciliation ==============
+
+def scan(root):
+    """Yield DirEntry of every file under root (os.scandir, no os.walk)."""
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def reconcile(dry_run=False):
+    """
+    Compare the storage directory with the database:
+    - files no asset or recording refers to (and older than ORPHAN_GRACE)
+      are queued for deletion;
+    - completed assets whose file is missing lose it, and their
+      recordings give back their charge;
+    - usage counters are recomputed from the recordings.
+    Returns counts.
+    """
+    root = settings.QUATTRETV['PVR_STORAGE_DIR']
+    known = set(CaptureAsset.objects.exclude(file_path='').values_list('file_path', flat=True))
+    known.update(Recording.objects.exclude(file_path='').values_list('file_path', flat=True))
+    known.update(
+        asset_path(a) for a in CaptureAsset.objects.filter(status__in=PENDING_STATUSES).only('id', 'channel_id')
+    )
+    queued = set(FileDeletion.objects.values_list('path', flat=True))
+
+    on_disk = set()
+    orphans = []
+    cutoff = time.time() - ORPHAN_GRACE
+    for entry in scan(root):
+        on_disk.add(entry.path)
+        if entry.path not in known and entry.path not in queued and entry.stat().st_mtime < cutoff:
+            orphans.append(entry.path)
+
+    missing = [
+        pk for pk, path in CaptureAsset.objects.exclude(file_path='').values_list('id', 'file_path')
+        if path.startswith(root) and path not in on_disk
+    ]
+
+    if not dry_run:
+        with transaction.atomic():
+            queue_deletion(orphans)
+            uncharge(list(Recording.objects.filter(asset_id__in=missing, charged_bytes__gt=0)))
+            CaptureAsset.objects.filter(id__in=missing).update(
+                file_path='', file_size=None, stream_url='', error_message='File missing on disk',
+            )
+            # Fix any drift of the counters
+            totals = dict(
+                Recording.objects.filter(charged_bytes__gt=0).values('user_id')
+                .annotate(total=Sum('charged_bytes')).values_list('user_id', 'total')
+            )
+            usage = dict(StorageUsage.objects.values_list('user_id', 'bytes_used'))
+            add_usage({
+                user_id: totals.get(user_id, 0) - usage.get(user_id, 0)
+                for user_id in totals.keys() | usage.keys()
+            })
+
+    return {'files': len(on_disk), 'orphans': len(orphans), 'missing': len(missing)}
@@ -0,0 +1,54 @@
+"""
+Celery tasks for the PVR.
+"""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def apply_recording_rules(first_program_id, last_program_id):
+    """Schedule series recordings for the programmes of an EPG ingest."""
+    from .rules import apply_rules_to_new_programs
+
+    created = apply_rules_to_new_programs(first_program_id, last_program_id)
+    logger.info(f"Recording rules scheduled {len(created)} recordings")
+
+
+@shared_task
+def apply_recording_rule(rule_id):
+    """Schedule the recordings of a rule that was just created or edited."""
+    from .rules import apply_rule
+
+    created = apply_rule(rule_id)
+    logger.info(f"Recording rule {rule_id} scheduled {len(created)} recordings")
+
+
+@shared_task
+def prune_rule_recordings(rule_ids):
+    """Drop completed recordings of these rules beyond their keep_recordings."""
+    from .rules import prune
+
+    deleted = prune(rule_ids)
+    if deleted:
+        logger.info(f"Deleted {deleted} recordings beyond their rules' keep_recordings")
+
+
+@shared_task
+def reap_recording_files():
+    """Delete the recording files queued for deletion."""
+    from .storage import reap
+
+    deleted = reap()
+    if deleted:
+        logger.info(f"Deleted {deleted} recording files")
+
+
+@shared_task
+def reconcile_recording_storage():
+    """Match the recordings directory with the database."""
+    from .storage import reconcile
+
+    logger.info(f"PVR storage reconciled: {reconcile()}")
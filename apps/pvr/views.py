@@ -3,7 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
+from .assets import detach
 from .models import Recording, RecordingRule, RecordingStatus
+from .storage import queue_deletion, quota_error, window_seconds
 from .serializers import (
     RecordingSerializer, RecordingCreateSerializer, RecordingRuleSerializer
 )
@@ -16,7 +18,7 @@ class RecordingViewSet(viewsets.ModelViewSet):
     search_fields = ['title']
 
     def get_queryset(self):
-        return Recording.objects.filter(user=self.request.user)
+        return Recording.objects.filter(user=self.request.user).select_related('channel', 'asset')
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -71,7 +73,10 @@ class RecordingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # TODO: Actually delete file from storage
+        # The shared capture (and its file) goes with the last reference
+        detach([recording])
+        # Recordings from before shared captures own their file
+        queue_deletion([recording.file_path])
         recording.file_path = ''
         recording.stream_url = ''
         recording.save()
@@ -107,6 +112,23 @@ class RecordingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            pre_padding = int(request.data.get('pre_padding') or 0)
+            post_padding = int(request.data.get('post_padding') or 0)
+        except (TypeError, ValueError):
+            pre_padding = post_padding = -1
+        if pre_padding < 0 or post_padding < 0:
+            return Response(
+                {'error': 'pre_padding and post_padding must be minutes (0 or more)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        error = quota_error(
+            request.user, window_seconds(program.start_time, program.end_time, pre_padding, post_padding)
+        )
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
         recording = Recording.objects.create(
             user=request.user,
             channel=program.channel,
@@ -115,6 +137,8 @@ class RecordingViewSet(viewsets.ModelViewSet):
             description=program.description,
             start_time=program.start_time,
             end_time=program.end_time,
+            pre_padding=pre_padding,
+            post_padding=post_padding,
         )
 
         return Response(
@@ -0,0 +1,145 @@
+"""
+Async Stalker Portal views for ASGI deployments.
+
+The actions every box hammers (lineup, genres, short EPG, watchdog) are
+served natively with the async ORM and the async Redis client, as is the
+device message push channel (SSE and long-poll). Everything else is handed
+to the sync portal_handler in views.py.
+"""
+import asyncio
+import json
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from apps.channels.cache import aget_favorite_ids, aget_genres, aget_lineup
+from apps.devices.push import anext_event, astream_events
+from apps.epg.cache import anow_playing, ashort_epg
+from . import views
+from .authentication import MACAuthentication
+from .views import stalker_response
+
+
+async def aget_device_from_request(request):
+    """Async version of views.get_device_from_request()."""
+    auth = MACAuthentication()
+    try:
+        result = await auth.aauthenticate(request)
+        if result:
+            return result[1]
+    except Exception:
+        pass
+    return None
+
+
+async def ahandle_get_genres(request):
+    """Get channel categories/genres."""
+    return stalker_response(await aget_genres())
+
+
+async def ahandle_get_ordered_list(request):
+    """Get ordered channel list."""
+    device = await aget_device_from_request(request)
+
+    tariff_id = device.user.tariff_id if device else None
+    favorite_ids = await aget_favorite_ids(device.user_id) if device else set()
+    channels, total = views.paginate_lineup(request, await aget_lineup(tariff_id), favorite_ids)
+
+    current_programs = await anow_playing([int(ch['id']) for ch in channels])
+
+    return views.ordered_list_response(channels, total, current_programs, favorite_ids)
+
+
+async def ahandle_get_short_epg(request):
+    """Get short EPG for channel."""
+    channel_id = request.GET.get('ch_id')
+    if not channel_id:
+        return stalker_response({'data': []})
+
+    data = [views.short_epg_item(item) for item in await ashort_epg(channel_id)]
+    return stalker_response({'data': data})
+
+
+async def ahandle_get_events(request):
+    """
+    Watchdog/keepalive that also delivers pending device messages.
+    Pass `wait=N` to long-poll for up to N seconds.
+    """
+    # Authenticating already refreshes last_seen/last_ip
+    device = await aget_device_from_request(request)
+    if not device:
+        return stalker_response({'data': {'msgs': 0}})
+
+    try:
+        wait = min(int(request.GET.get('wait', 0)), settings.QUATTRETV['PUSH_LONG_POLL_MAX'])
+    except ValueError:
+        wait = 0
+
+    try:
+        event = await anext_event(device, wait)
+    except redis.RedisError:
+        event = None
+    if not event:
+        return stalker_response({'data': {'msgs': 0}})
+    return stalker_response({'data': {'msgs': 1, **event}})
+
+
+async def ahandle_event_stream(request):
+    """Server-Sent Events stream of device messages."""
+    device = await aget_device_from_request(request)
+    if not device:
+        return stalker_response({'error': 'Not authenticated'})
+
+    heartbeat = settings.QUATTRETV['PUSH_HEARTBEAT']
+    touch_every = settings.QUATTRETV['WATCHDOG_TIMEOUT']
+    ip_address = MACAuthentication.get_client_ip(request)
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        last_touch = loop.time()
+        yield f'retry: {heartbeat * 1000}\n\n'
+        async for event in astream_events(device, heartbeat):
+            if event is None:
+                yield ': ping\n\n'
+            else:
+                yield f'id: {event["id"]}\ndata: {json.dumps(event)}\n\n'
+            # An open stream counts as the box being online
+            if loop.time() - last_touch >= touch_every:
+                await device.aupdate_activity(ip_address=ip_address)
+                last_touch = loop.time()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+ASYNC_HANDLERS = {
+    ('itv', 'get_all_channels'): ahandle_get_ordered_list,
+    ('itv', 'get_ordered_list'): ahandle_get_ordered_list,
+    ('itv', 'get_genres'): ahandle_get_genres,
+    ('itv', 'get_short_epg'): ahandle_get_short_epg,
+    ('watchdog', 'get_events'): ahandle_get_events,
+    ('watchdog', 'stream'): ahandle_event_stream,
+}
+
+sync_portal_handler = sync_to_async(views.portal_handler)
+
+
+@csrf_exempt
+async def portal_handler(request):
+    """
+    Async entry point for Stalker portal requests.
+    Hot read actions run on the event loop, the rest in the sync handler.
+    """
+    request_type = request.GET.get('type', request.POST.get('type', ''))
+    action = request.GET.get('action', request.POST.get('action', ''))
+
+    handler = ASYNC_HANDLERS.get((request_type, action))
+    if handler:
+        return await handler(request)
+
+    return await sync_portal_handler(request)
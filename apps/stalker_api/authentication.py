@@ -26,11 +26,7 @@ class MACAuthentication(BaseAuthentication):
         except Device.DoesNotExist:
             raise AuthenticationFailed('Device not registered')
 
-        if not device.user.is_active:
-            raise AuthenticationFailed('User account is disabled')
-
-        if not device.user.is_subscription_active:
-            raise AuthenticationFailed('Subscription expired')
+        self.check_device(device)
 
         # Update device activity
         device.update_activity(
@@ -39,6 +35,37 @@ class MACAuthentication(BaseAuthentication):
 
         return (device.user, device)
 
+    async def aauthenticate(self, request):
+        """Async version of authenticate() for ASGI views."""
+        mac_address = self.get_mac_from_request(request)
+        if not mac_address:
+            return None
+
+        try:
+            device = await Device.objects.select_related('user').aget(
+                mac_address=mac_address,
+                is_active=True
+            )
+        except Device.DoesNotExist:
+            raise AuthenticationFailed('Device not registered')
+
+        self.check_device(device)
+
+        await device.aupdate_activity(
+            ip_address=self.get_client_ip(request)
+        )
+
+        return (device.user, device)
+
+    @staticmethod
+    def check_device(device):
+        """Reject devices whose account can't watch."""
+        if not device.user.is_active:
+            raise AuthenticationFailed('User account is disabled')
+
+        if not device.user.is_subscription_active:
+            raise AuthenticationFailed('Subscription expired')
+
     def get_mac_from_request(self, request):
         """Extract MAC address from request."""
         # Try Cookie header first (standard Stalker format)
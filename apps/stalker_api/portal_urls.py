@@ -2,8 +2,8 @@
 URLs for portal.php compatible endpoint.
 """
 from django.urls import path
-from . import views
+from . import async_views
 
 urlpatterns = [
-    path('', views.portal_handler, name='portal'),
+    path('', async_views.portal_handler, name='portal'),
 ]
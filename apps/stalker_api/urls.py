@@ -1,10 +1,10 @@
 from django.urls import path
-from . import views
+from . import async_views
 
 app_name = 'stalker_api'
 
 urlpatterns = [
-    path('', views.portal_handler, name='root'),
-    path('server/load.php', views.portal_handler, name='load'),
-    path('c/', views.portal_handler, name='c'),
+    path('', async_views.portal_handler, name='root'),
+    path('server/load.php', async_views.portal_handler, name='load'),
+    path('c/', async_views.portal_handler, name='c'),
 ]
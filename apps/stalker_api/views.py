@@ -1,17 +1,28 @@
 """
 Stalker Portal compatible API views.
 """
+import copy
 import hashlib
+import json
 import time
+from urllib.parse import urlsplit
+from django.conf import settings
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny
 from apps.devices.models import Device
-from apps.channels.models import Channel, Category
+from apps.channels.models import Channel
+from apps.channels.cache import get_favorite_ids, get_genres, get_lineup
+from apps.channels.hls import make_token, proxy_path, upstream_url
+from apps.channels.streams import report_error, select_stream, with_token
+from apps.core.images import image_url
+from apps.epg.cache import item_time, now_playing, short_epg
+from apps.timeshift.index import in_window, resolve
 from apps.epg.models import Program
-from apps.vod.models import Movie, Series, VodCategory
+from apps.vod.cache import get_vod_categories
+from apps.vod.models import Episode, Movie, Series
 from .authentication import MACAuthentication
 
 
@@ -37,6 +48,9 @@ def stb_portal_app(request):
     var volume = 50;
     var volTimeout = null;
     var useHTML5 = false;
+    var msgTimeout = null;
+    var playingUrl = null;
+    var playRetries = 0;
 
     function fitScreen() {
         // El surface de la app webOS ya es 1920x1080, no hace falta escalar.
@@ -72,9 +86,76 @@ def stb_portal_app(request):
             htmlPlayer = document.getElementById('html5video');
             htmlPlayer.style.display = 'block';
             htmlPlayer.volume = volume / 100;
+            htmlPlayer.addEventListener('error', onPlayError);
+        } else {
+            // MAG: 1 = fin del stream, 5 = error al abrir el contenido
+            window.stbEvent = {
+                onEvent: function(code) {
+                    if (code == 1 || code == 5) onPlayError();
+                },
+                event: 0
+            };
         }
 
         loadData();
+        startEvents();
+    }
+
+    function startEvents() {
+        // Mensajes del servidor: SSE si el navegador lo soporta, si no long-poll
+        if (typeof EventSource !== "undefined") {
+            var es = new EventSource("?type=watchdog&action=stream");
+            es.onmessage = function(e) {
+                try { handleEvent(JSON.parse(e.data)); } catch(err) {}
+            };
+            return;
+        }
+        pollEvents();
+    }
+
+    function pollEvents() {
+        var xhr = new XMLHttpRequest();
+        xhr.onreadystatechange = function() {
+            if (xhr.readyState !== 4) return;
+            var delay = 1000;
+            if (xhr.status === 200) {
+                try {
+                    var r = JSON.parse(xhr.responseText);
+                    if (r.js && r.js.data && r.js.data.msgs) handleEvent(r.js.data);
+                } catch(err) {}
+            } else {
+                delay = 10000;
+            }
+            setTimeout(pollEvents, delay);
+        };
+        xhr.open("GET", "?type=watchdog&action=get_events&wait=30&_t=" + Date.now(), true);
+        xhr.send();
+    }
+
+    function handleEvent(ev) {
+        if (!ev || !ev.event) return;
+        if (ev.event === "reload_portal") {
+            location.reload();
+        } else if (ev.event === "send_msg") {
+            showMessage(ev.title, ev.msg);
+        }
+    }
+
+    function showMessage(title, text) {
+        var m = document.getElementById("msg");
+        var t = document.createElement("div");
+        var b = document.createElement("div");
+        t.className = "msg-t";
+        b.className = "msg-b";
+        // Texto del servidor, nunca HTML
+        t.textContent = title || "";
+        b.textContent = text || "";
+        m.innerHTML = "";
+        m.appendChild(t);
+        m.appendChild(b);
+        m.style.display = "block";
+        clearTimeout(msgTimeout);
+        msgTimeout = setTimeout(function() { m.style.display = "none"; }, 10000);
     }
 
     function loadData() {
@@ -82,16 +163,23 @@ def stb_portal_app(request):
         xhr.onreadystatechange = function() {
             if (xhr.readyState === 4 && xhr.status === 200) {
                 try {
-                    var r = JSON.parse(xhr.responseText);
-                    if (r.js && r.js.data) {
-                        channels = r.js.data;
+                    // Respuestas en el mismo orden que las acciones pedidas
+                    var r = JSON.parse(xhr.responseText).js.results;
+                    var list = r[1].js;
+                    if (list && list.data) {
+                        channels = list.data;
                         showChannels();
                         startPreview();
                     }
                 } catch(err) {}
             }
         };
-        xhr.open("GET", "?type=itv&action=get_ordered_list&p=0&_t=" + Date.now(), true);
+        // Arranque en una sola peticion: handshake + canales
+        var actions = [
+            {type: "stb", action: "handshake"},
+            {type: "itv", action: "get_ordered_list", p: 0}
+        ];
+        xhr.open("GET", "?type=stb&action=batch&requests=" + encodeURIComponent(JSON.stringify(actions)) + "&_t=" + Date.now(), true);
         xhr.send();
     }
 
@@ -122,19 +210,47 @@ def stb_portal_app(request):
         }
     }
 
-    function playChannel(ch) {
+    function playUrl(cmd) {
+        playingUrl = cmd;
         if (useHTML5) {
-            var url = ch.cmd.replace('ffmpeg ', '').replace('ffrt ', '');
+            var url = cmd.replace('ffmpeg ', '').replace('ffrt ', '');
             htmlPlayer.src = url;
             htmlPlayer.play().catch(function(e) { console.log('Play error:', e); });
         } else if (player) {
-            try { player.play({uri: ch.cmd}); } catch(err) {}
+            try { player.play({uri: cmd}); } catch(err) {}
         } else if (stbAPI) {
-            try { stbAPI.Play(ch.cmd); } catch(err) {}
+            try { stbAPI.Play(cmd); } catch(err) {}
         }
         document.body.style.background = "transparent";
     }
 
+    function playChannel(ch) {
+        playRetries = 0;
+        playUrl(ch.cmd);
+    }
+
+    function onPlayError() {
+        // Avisar del fallo y pedir otro enlace: el servidor pasa al stream de respaldo
+        var ch = channels[playingChannelIdx];
+        if (!ch || !playingUrl || playRetries >= 2) return;
+        playRetries++;
+        var actions = [
+            {type: "itv", action: "stream_error", cmd: playingUrl},
+            {type: "itv", action: "create_link", cmd: ch.id}
+        ];
+        var xhr = new XMLHttpRequest();
+        xhr.onreadystatechange = function() {
+            if (xhr.readyState === 4 && xhr.status === 200) {
+                try {
+                    var link = JSON.parse(xhr.responseText).js.results[1].js;
+                    if (link && link.cmd && channels[playingChannelIdx] === ch) playUrl(link.cmd);
+                } catch(err) {}
+            }
+        };
+        xhr.open("GET", "?type=stb&action=batch&requests=" + encodeURIComponent(JSON.stringify(actions)) + "&_t=" + Date.now(), true);
+        xhr.send();
+    }
+
     function startPreview() {
         if (channels.length === 0 || isFullscreen) return;
         var ch = channels[currentChannel];
@@ -340,6 +456,15 @@ def stb_portal_app(request):
         .osd-ch { font-size: 26px; font-weight: 600; }
         .osd-epg { font-size: 16px; color: #aaa; margin-top: 8px; }
 
+        #msg {
+            display: none; position: fixed; top: 60px; right: 60px; width: 640px;
+            background: linear-gradient(180deg, rgba(15,15,35,0.97) 0%, rgba(10,10,25,0.95) 100%);
+            padding: 25px 30px; border-radius: 15px; border-left: 4px solid #00a651;
+            box-shadow: 0 10px 40px rgba(0,0,0,0.5);
+        }
+        .msg-t { font-size: 26px; font-weight: 600; }
+        .msg-b { font-size: 20px; color: #ccc; margin-top: 10px; }
+
         #vol {
             display: none; position: fixed; top: 50%; left: 50%;
             transform: translate(-50%,-50%);
@@ -356,6 +481,7 @@ def stb_portal_app(request):
     <div id="content" style="position:relative;z-index:10;"><div class="panel" style="text-align:center;padding:60px 40px;"><div class="logo">Quattre<span>TV</span></div><div style="color:#666;margin-top:20px;">Cargando canales...</div></div></div>
     <div id="osd" style="position:relative;z-index:10;"></div>
     <div id="vol" style="z-index:20;"></div>
+    <div id="msg" style="z-index:30;"></div>
 </body>
 </html>'''
     return HttpResponse(html, content_type='text/html')
@@ -561,6 +687,9 @@ def portal_handler(request):
         'account_info': handle_account_info,
     }
 
+    if request_type == 'stb' and action == 'batch':
+        return handle_batch(request, handlers)
+
     handler = handlers.get(request_type, handle_unknown)
     return handler(request, action)
 
@@ -574,15 +703,81 @@ def stalker_response(data, js_callback=True):
 
 
 def get_device_from_request(request):
-    """Get authenticated device from request."""
+    """
+    Get authenticated device from request.
+    The result is remembered on the request, so handlers sharing it
+    (e.g. the actions of a batch) only authenticate once.
+    """
+    if hasattr(request, '_stalker_device'):
+        return request._stalker_device
+
+    device = None
     auth = MACAuthentication()
     try:
         result = auth.authenticate(request)
         if result:
-            return result[1]  # Return device
+            device = result[1]
     except Exception:
         pass
-    return None
+    request._stalker_device = device
+    return device
+
+
+# ============== Batch ==============
+
+BATCH_MAX_ACTIONS = 20
+
+
+def batch_subrequest(request, params, device):
+    """Copy of the request with the params of one batched action."""
+    base = getattr(request, '_request', request)
+    sub = copy.copy(base)
+    query = base.GET.copy()
+    query.pop('requests', None)
+    for key, value in params.items():
+        query[key] = str(value)
+    sub.GET = query
+    sub._stalker_device = device
+    return sub
+
+
+def handle_batch(request, handlers):
+    """
+    Run several type/action pairs in one request.
+
+    `requests` is a JSON list like
+    [{"type": "stb", "action": "handshake"}, {"type": "itv", "action": "get_ordered_list", "p": 0}].
+    Extra keys of each item are passed as that action's params. Results
+    come back in the same order under `results`.
+    """
+    raw = request.GET.get('requests', request.POST.get('requests', ''))
+    try:
+        items = json.loads(raw)
+    except ValueError:
+        items = None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return stalker_response({'error': 'Invalid batch'})
+    if len(items) > BATCH_MAX_ACTIONS:
+        return stalker_response({'error': f'Too many actions (max {BATCH_MAX_ACTIONS})'})
+
+    device = get_device_from_request(request)
+
+    results = []
+    for item in items:
+        item_type = str(item.get('type', ''))
+        item_action = str(item.get('action', ''))
+        if item_action == 'batch':
+            js = {'error': 'Unknown action'}
+        else:
+            handler = handlers.get(item_type, handle_unknown)
+            response = handler(batch_subrequest(request, item, device), item_action)
+            try:
+                js = json.loads(response.content)['js']
+            except (ValueError, KeyError):
+                js = {'error': 'Invalid response'}
+        results.append({'type': item_type, 'action': item_action, 'js': js})
+
+    return stalker_response({'results': results})
 
 
 # ============== STB Handlers ==============
@@ -701,6 +896,7 @@ def handle_get_profile(request):
             'language': device.language,
             'timezone': device.timezone,
         },
+        'watchdog_timeout': settings.QUATTRETV['WATCHDOG_TIMEOUT'],
         'now': timezone.now().isoformat(),
     })
 
@@ -746,27 +942,19 @@ def handle_itv(request, action):
         return handle_get_short_epg(request)
     elif action == 'set_fav':
         return handle_set_favorite(request)
+    elif action == 'get_fav_ids':
+        return handle_get_fav_ids(request)
     elif action == 'create_link':
         return handle_create_link(request)
+    elif action == 'stream_error':
+        return handle_stream_error(request)
 
     return stalker_response({'error': 'Unknown action'})
 
 
 def handle_get_genres(request):
     """Get channel categories/genres."""
-    categories = Category.objects.filter(is_active=True).order_by('order')
-
-    data = []
-    for cat in categories:
-        data.append({
-            'id': str(cat.id),
-            'title': cat.name,
-            'alias': cat.alias,
-            'active_sub': True,
-            'censored': cat.is_adult,
-        })
-
-    return stalker_response(data)
+    return stalker_response(get_genres())
 
 
 def handle_get_all_channels(request):
@@ -774,89 +962,133 @@ def handle_get_all_channels(request):
     return handle_get_ordered_list(request)
 
 
-def handle_get_ordered_list(request):
-    """Get ordered channel list."""
-    device = get_device_from_request(request)
+LINEUP_PAGE_SIZE = 50
+
+
+def paginate_lineup(request, channels, favorite_ids=frozenset()):
+    """Apply genre/favorites filter and paging to a cached lineup."""
     genre_id = request.GET.get('genre', '*')
     page = int(request.GET.get('p', 0))
-    per_page = 50
-
-    channels = Channel.objects.filter(is_active=True).order_by('number')
 
     if genre_id and genre_id != '*':
-        channels = channels.filter(category_id=genre_id)
+        channels = [ch for ch in channels if ch['tv_genre_id'] == genre_id]
+    if request.GET.get('fav') == '1':
+        channels = [ch for ch in channels if ch['id'] in favorite_ids]
 
-    # Filter by user's packages if authenticated
-    if device and device.user.tariff:
-        package_ids = device.user.tariff.channel_packages.values_list('id', flat=True)
-        from django.db.models import Q
-        channels = channels.filter(
-            Q(packages__id__in=package_ids) | Q(packages__isnull=True)
-        ).distinct()
+    total = len(channels)
+    return channels[page * LINEUP_PAGE_SIZE:(page + 1) * LINEUP_PAGE_SIZE], total
 
-    total = channels.count()
-    channels = channels[page * per_page:(page + 1) * per_page]
-
-    # Get current programs for EPG
-    now = timezone.now()
-    current_programs = {
-        p.channel_id: p for p in Program.objects.filter(
-            channel__in=channels,
-            start_time__lte=now,
-            end_time__gte=now
-        )
-    }
 
+def ordered_list_response(channels, total, current_programs, favorite_ids=frozenset()):
+    """Merge favorites and now-playing EPG into a page of lineup cards."""
     data = []
     for ch in channels:
-        current = current_programs.get(ch.id)
+        current = current_programs.get(int(ch['id']))
         data.append({
-            'id': str(ch.id),
-            'name': ch.name,
-            'number': ch.number,
-            'cmd': ch.stream_url,
-            'logo': ch.logo_display_url,
-            'censored': ch.is_adult,
-            'hd': 1 if ch.is_hd else 0,
-            'fav': 0,  # TODO: Check favorites
-            'archive': 1 if ch.has_timeshift else 0,
-            'archive_range': ch.timeshift_hours,
-            'cur_playing': current.title if current else '',
-            'epg_start': current.start_time.isoformat() if current else '',
-            'epg_end': current.end_time.isoformat() if current else '',
+            **ch,
+            'fav': 1 if ch['id'] in favorite_ids else 0,
+            'cur_playing': current['name'] if current else '',
+            'epg_start': item_time(current['start']).isoformat() if current else '',
+            'epg_end': item_time(current['end']).isoformat() if current else '',
         })
 
     return stalker_response({
         'total_items': total,
-        'max_page_items': per_page,
+        'max_page_items': LINEUP_PAGE_SIZE,
         'data': data,
     })
 
 
+def handle_get_ordered_list(request):
+    """Get ordered channel list."""
+    device = get_device_from_request(request)
+
+    # Lineup is filtered by the user's packages if authenticated
+    tariff_id = device.user.tariff_id if device else None
+    favorite_ids = get_favorite_ids(device.user_id) if device else set()
+    channels, total = paginate_lineup(request, get_lineup(tariff_id), favorite_ids)
+
+    # Get current programs for EPG
+    current_programs = now_playing([int(ch['id']) for ch in channels])
+
+    return ordered_list_response(channels, total, current_programs, favorite_ids)
+
+
+def handle_get_fav_ids(request):
+    """Get the ids of the user's favorite channels."""
+    device = get_device_from_request(request)
+    if not device:
+        return stalker_response([])
+    return stalker_response(sorted(int(i) for i in get_favorite_ids(device.user_id)))
+
+
+def playback_url(request, stream_url, device):
+    """
+    Link handed to a device: through the HLS proxy when enabled (HLS
+    streams only), otherwise the upstream URL with the device token.
+    Only for URLs taken from the catalog: a proxy link makes the server
+    fetch whatever it points at.
+    """
+    if not device:
+        return stream_url
+    if settings.QUATTRETV['HLS_PROXY_ENABLED'] and urlsplit(stream_url).path.endswith('.m3u8'):
+        return request.build_absolute_uri(proxy_path(stream_url, make_token(device.id)))
+    return with_token(stream_url, device.token)
+
+
+def raw_url(cmd, device):
+    """A URL sent by the client that matches nothing in the catalog: returned as is, never proxied."""
+    url = cmd[7:] if cmd.startswith('ffmpeg ') else cmd
+    return with_token(url, device.token) if device and url else url
+
+
+def channel_for_cmd(request, cmd):
+    """Channel a get_url/create_link request is about, None if unknown."""
+    channel_id = cmd if cmd.isdigit() else request.GET.get('ch_id', '')
+    channels = Channel.objects.filter(is_active=True)
+    if channel_id.isdigit():
+        return channels.filter(id=channel_id).first()
+    # Players send back the card's cmd (the channel's main URL)
+    url = cmd[7:] if cmd.startswith('ffmpeg ') else cmd
+    return channels.filter(stream_url=url).first() if url else None
+
+
 def handle_get_url(request):
-    """Get stream URL for a channel."""
+    """
+    Get stream URL for a channel.
+    The stream is chosen by the failover engine (apps.channels.streams).
+    """
     cmd = request.GET.get('cmd', '')
     device = get_device_from_request(request)
 
-    # cmd could be channel ID or direct URL
-    if cmd.isdigit():
-        try:
-            channel = Channel.objects.get(id=cmd, is_active=True)
-            stream_url = channel.stream_url
-        except Channel.DoesNotExist:
-            return stalker_response({'error': 'Channel not found'})
+    channel = channel_for_cmd(request, cmd)
+    if channel:
+        stream_url = select_stream(channel, device.device_type if device else None)
+    elif cmd.isdigit():
+        return stalker_response({'error': 'Channel not found'})
     else:
-        stream_url = cmd
-
-    # Add authentication token if needed
-    if device:
-        stream_url = f"{stream_url}?token={device.token}"
+        return stalker_response({'cmd': raw_url(cmd, device)})
 
     return stalker_response({
-        'cmd': stream_url,
+        'cmd': playback_url(request, stream_url, device),
     })
 
 
+def handle_stream_error(request):
+    """Player couldn't play a link; counts towards failing its stream over."""
+    device = get_device_from_request(request)
+    if not device:
+        return stalker_response({'error': 'Not authenticated'})
+
+    cmd = request.GET.get('cmd', '')
+    url = cmd[7:] if cmd.startswith('ffmpeg ') else cmd
+    if not url:
+        return stalker_response({'error': 'cmd required'})
+
+    report_error(upstream_url(url), device.mac_address)
+    return stalker_response({'result': True})
+
+
 def handle_create_link(request):
     """Create streaming link (alias for get_url)."""
     return handle_get_url(request)
@@ -868,23 +1100,18 @@ def handle_get_short_epg(request):
     if not channel_id:
         return stalker_response({'data': []})
 
-    now = timezone.now()
-    programs = Program.objects.filter(
-        channel_id=channel_id,
-        end_time__gte=now
-    ).order_by('start_time')[:10]
+    data = [short_epg_item(item) for item in short_epg(channel_id)]
+    return stalker_response({'data': data})
 
-    data = []
-    for prog in programs:
-        data.append({
-            'id': str(prog.id),
-            't_time': prog.start_time.strftime('%H:%M'),
-            't_time_end': prog.end_time.strftime('%H:%M'),
-            'name': prog.title,
-            'descr': prog.description[:200] if prog.description else '',
-        })
 
-    return stalker_response({'data': data})
+def short_epg_item(item):
+    return {
+        'id': item['id'],
+        't_time': item_time(item['start']).strftime('%H:%M'),
+        't_time_end': item_time(item['end']).strftime('%H:%M'),
+        'name': item['name'],
+        'descr': item['descr'],
+    }
 
 
 def handle_set_favorite(request):
@@ -895,9 +1122,12 @@ def handle_set_favorite(request):
 
     ch_id = request.GET.get('ch_id')
     fav = request.GET.get('fav', '1')
+    if not ch_id:
+        return stalker_response({'error': 'ch_id required'})
 
     from apps.channels.models import Favorite
 
+    # The favorites cache is updated by the Favorite signals
     if fav == '1':
         Favorite.objects.get_or_create(
             user=device.user,
@@ -928,18 +1158,7 @@ def handle_vod(request, action):
 
 def handle_vod_categories(request):
     """Get VOD categories."""
-    categories = VodCategory.objects.filter(is_active=True).order_by('order')
-
-    data = []
-    for cat in categories:
-        data.append({
-            'id': str(cat.id),
-            'title': cat.name,
-            'alias': cat.alias,
-            'censored': cat.is_adult,
-        })
-
-    return stalker_response(data)
+    return stalker_response(get_vod_categories())
 
 
 def handle_vod_list(request):
@@ -968,7 +1187,7 @@ def handle_vod_list(request):
             'year': str(movie.year) if movie.year else '',
             'rating_imdb': str(movie.rating) if movie.rating else '',
             'time': str(movie.duration) if movie.duration else '',
-            'screenshot_uri': movie.poster_url or '',
+            'screenshot_uri': image_url(movie.poster_url, 'poster'),
             'hd': 1 if movie.is_hd else 0,
             'cmd': movie.stream_url,
         })
@@ -992,12 +1211,16 @@ def handle_vod_link(request):
         except Movie.DoesNotExist:
             return stalker_response({'error': 'Movie not found'})
     else:
-        stream_url = cmd
-
-    if device:
-        stream_url = f"{stream_url}?token={device.token}"
+        # Players send back the card's cmd (the movie or episode URL)
+        url = cmd[7:] if cmd.startswith('ffmpeg ') else cmd
+        stream_url = url and (
+            Movie.objects.filter(stream_url=url, is_active=True).values_list('stream_url', flat=True).first()
+            or Episode.objects.filter(stream_url=url, is_active=True).values_list('stream_url', flat=True).first()
+        )
+        if not stream_url:
+            return stalker_response({'cmd': raw_url(cmd, device)})
 
-    return stalker_response({'cmd': stream_url})
+    return stalker_response({'cmd': playback_url(request, stream_url, device)})
 
 
 # ============== Series Handlers ==============
@@ -1036,7 +1259,7 @@ def handle_series_list(request):
             'actors': s.cast,
             'year': str(s.year_start) if s.year_start else '',
             'rating_imdb': str(s.rating) if s.rating else '',
-            'screenshot_uri': s.poster_url or '',
+            'screenshot_uri': image_url(s.poster_url, 'poster'),
             'series': s.seasons.count(),
         })
 
@@ -1161,14 +1384,27 @@ def handle_archive_link(request):
         return stalker_response({'error': 'Timeshift not available'})
 
     stream_url = channel.stream_url
+    position = 0
     if utc:
-        stream_url = f"{stream_url}?utc={utc}"
-
-    if device:
-        separator = '&' if '?' in stream_url else '?'
-        stream_url = f"{stream_url}{separator}token={device.token}"
+        try:
+            ts = float(utc)
+        except ValueError:
+            return stalker_response({'error': 'Invalid utc'})
+        if not in_window(channel, ts):
+            return stalker_response({'error': 'Outside the timeshift window'})
+
+        segment = resolve(channel, ts)
+        if segment:
+            stream_url = segment['url']
+            position = int(segment['offset'])
+        else:
+            separator = '&' if urlsplit(stream_url).query else '?'
+            stream_url = f"{stream_url}{separator}utc={utc}"
 
-    return stalker_response({'cmd': stream_url})
+    return stalker_response({
+        'cmd': playback_url(request, stream_url, device),
+        'position': position,
+    })
 
 
 # ============== Other Handlers ==============
@@ -5,3 +5,6 @@ class TimeshiftConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.timeshift'
     verbose_name = 'Timeshift / Catchup'
+
+    def ready(self):
+        from . import signals  # noqa: F401
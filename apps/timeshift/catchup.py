@@ -0,0 +1,119 @@
+"""
+Catchup playlists.
+
+A programme is played back as an HLS playlist listing exactly the archive
+segments it spans (from the timeshift index), each tagged with
+EXT-X-PROGRAM-DATE-TIME so players show wall-clock times and can seek by
+them. EXT-X-START points at the programme start inside the first segment.
+
+The playlist is cached per programme with TOKEN_PLACEHOLDER in place of the
+viewer's token, so every viewer of a popular catchup shares one rendering.
+A programme still on air is an EVENT playlist refreshed every target
+duration; a finished one is VOD and cached until it leaves the window.
+
+catchup_denied() is the entitlement rule for both the catchup API and the
+playlist endpoint: the channel must be in the user's tariff lineup and the
+tariff must include catchup.
+"""
+import json
+import logging
+import math
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.utils import timezone
+
+from apps.channels.cache import in_lineup
+from apps.channels.m3u import TOKEN_PLACEHOLDER
+from apps.channels.streams import with_token
+from apps.core.redis_client import get_redis, store_json
+from .index import segments_between, window_start
+
+logger = logging.getLogger(__name__)
+
+CATCHUP_KEY = 'timeshift:catchup:{}'
+CATCHUP_TTL = 60 * 60
+# Programmes with no segments yet (the recorder may register them late)
+EMPTY_TTL = 30
+MAX_LIVE_TTL = 10
+
+PLAYLIST_PATH = '/catchup/{}.m3u8'
+
+
+def _program_date_time(ts):
+    return datetime.fromtimestamp(ts, dt_timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def render_catchup(segments, start_ts, end_ts, ended=True):
+    """HLS playlist template for the segments covering [start_ts, end_ts)."""
+    durations = [s['end'] - s['start'] for s in segments]
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{math.ceil(max(durations))}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        f"#EXT-X-PLAYLIST-TYPE:{'VOD' if ended else 'EVENT'}",
+    ]
+    offset = start_ts - segments[0]['start']
+    if offset > 0:
+        lines.append(f'#EXT-X-START:TIME-OFFSET={offset:.3f},PRECISE=YES')
+    for segment, duration in zip(segments, durations):
+        lines.append(f"#EXT-X-PROGRAM-DATE-TIME:{_program_date_time(segment['start'])}")
+        lines.append(f'#EXTINF:{duration:.3f},')
+        lines.append(with_token(segment['url'], TOKEN_PLACEHOLDER))
+    if ended:
+        lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def build_catchup(program, now=None):
+    """(template or None, ttl) for a programme."""
+    now = now or timezone.now()
+    channel = program.channel
+    start_ts = max(program.start_time.timestamp(), window_start(channel, now))
+    end_ts = min(program.end_time.timestamp(), now.timestamp())
+    if end_ts <= start_ts:
+        return None, EMPTY_TTL
+
+    segments = segments_between(channel.id, start_ts, end_ts)
+    if not segments:
+        return None, EMPTY_TTL
+
+    ended = program.end_time <= now
+    template = render_catchup(segments, start_ts, end_ts, ended)
+    if not ended:
+        return template, max(1, min(math.ceil(segments[-1]['end'] - segments[-1]['start']), MAX_LIVE_TTL))
+    # Gone when the programme start leaves the window
+    expires = program.start_time.timestamp() + channel.timeshift_hours * 3600 - now.timestamp()
+    return template, max(1, min(CATCHUP_TTL, int(expires)))
+
+
+def get_catchup(program):
+    """Cached playlist template of a programme; None if nothing is archived."""
+    key = CATCHUP_KEY.format(program.id)
+    try:
+        raw = get_redis().get(key)
+        if raw is not None:
+            return json.loads(raw)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading {key}: {e}")
+
+    template, ttl = build_catchup(program)
+    store_json(key, template, ttl)
+    return template
+
+
+def catchup_denied(user, program):
+    """Why `user` may not watch `program` back; None if they may."""
+    channel = program.channel
+    if not (channel.is_active and channel.has_timeshift and channel.has_catchup):
+        return 'Catchup not available for this channel'
+    if user.tariff and not user.tariff.has_catchup:
+        return 'Catchup not included in your subscription'
+    if not in_lineup(user.tariff_id, channel.id):
+        return 'Channel not included in your subscription'
+    return None
+
+
+def playlist_path(program_id, token):
+    return f'{PLAYLIST_PATH.format(program_id)}?token={token}'
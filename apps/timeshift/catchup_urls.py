@@ -0,0 +1,9 @@
+"""
+URLs for catchup playlists.
+"""
+from django.urls import path
+from . import catchup_views
+
+urlpatterns = [
+    path('<int:program_id>.m3u8', catchup_views.catchup_playlist, name='catchup_playlist'),
+]
@@ -0,0 +1,45 @@
+"""
+Catchup playlist endpoint (see catchup.py).
+"""
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.views.decorators.http import require_GET
+
+from apps.channels.hls import check_token
+from apps.channels.m3u import TOKEN_PLACEHOLDER
+from apps.devices.models import Device
+from apps.epg.models import Program
+from .catchup import catchup_denied, get_catchup
+
+
+@require_GET
+def catchup_playlist(request, program_id):
+    """Serve a programme's catchup playlist with the viewer's token filled in."""
+    token = request.GET.get('token', '')
+    device_id = check_token(token)
+    if device_id is None:
+        return HttpResponseForbidden('Invalid or expired token')
+    device = Device.objects.filter(
+        id=device_id, is_active=True, user__is_active=True
+    ).select_related('user__tariff').first()
+    if device is None or not device.user.is_subscription_active:
+        return HttpResponseForbidden('Device not allowed')
+
+    program = Program.objects.filter(
+        id=program_id, channel__is_active=True, channel__has_timeshift=True
+    ).select_related('channel').first()
+    if program is None:
+        return HttpResponseNotFound('Program not found')
+    denied = catchup_denied(device.user, program)
+    if denied:
+        return HttpResponseForbidden(denied)
+
+    template = get_catchup(program)
+    if template is None:
+        return HttpResponseNotFound('Program not archived')
+
+    response = HttpResponse(
+        template.replace(TOKEN_PLACEHOLDER, token),
+        content_type='application/vnd.apple.mpegurl',
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,235 @@
+"""
+Timeshift segment index.
+
+Archive segments of each channel are kept in a Redis sorted set scored by
+their start time, so the segment covering a timestamp is a single
+ZREVRANGEBYSCORE (O(log n)) instead of a range scan over TimeshiftArchive.
+Members are compact JSON arrays [start, end, size, url]. Segments older
+than the channel's timeshift window are trimmed as new ones are
+registered. The index of a channel is only trusted once rebuild_index()
+has filled it from the database and set its "complete" marker, and while
+the set itself exists; otherwise (never built, Redis flushed, set evicted,
+Redis down, nothing archived) lookups fall back to an indexed
+database query, even if new segments have already been added to the set.
+The set and its marker share a TTL (the window plus slack), refreshed
+together on every write, and are swapped in by one MULTI, so the marker
+never outlives the set it vouches for by more than an eviction; the cache
+warm-up rebuilds the indexes that lost their marker or their set.
+"""
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import redis
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.redis_client import get_redis
+from .models import TimeshiftArchive
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = 'timeshift:index:{}'
+COMPLETE_KEY = 'timeshift:index:{}:complete'
+REBUILD_BATCH = 5000
+# Beyond the window: trimmed segments linger a day, plus a day of slack
+INDEX_TTL_SLACK = 2 * 86400
+
+
+def _member(start, end, size, url):
+    return json.dumps([round(start, 3), round(end, 3), size, url], separators=(',', ':'))
+
+
+def _segment(member):
+    start, end, size, url = json.loads(member)
+    return {'start': start, 'end': end, 'size': size, 'url': url}
+
+
+def _archive_member(archive):
+    return _member(archive.start_time.timestamp(), archive.end_time.timestamp(), archive.size, archive.stream_url)
+
+
+def window_start(channel, now=None):
+    """Oldest timestamp still inside the channel's timeshift window."""
+    now = now or timezone.now()
+    return (now - timedelta(hours=channel.timeshift_hours)).timestamp()
+
+
+def index_ttl(channel):
+    return channel.timeshift_hours * 3600 + INDEX_TTL_SLACK
+
+
+def in_window(channel, ts, now=None):
+    """Whether a UTC timestamp can be played back on a channel."""
+    now = now or timezone.now()
+    return window_start(channel, now) <= ts <= now.timestamp()
+
+
+# ============== Writing ==============
+
+def index_segments(channel, archives):
+    """Add TimeshiftArchive rows to the index and trim expired segments."""
+    key = INDEX_KEY.format(channel.id)
+    try:
+        pipe = get_redis().pipeline()
+        if archives:
+            pipe.zadd(key, {_archive_member(a): a.start_time.timestamp() for a in archives})
+        pipe.zremrangebyscore(key, '-inf', f'({window_start(channel) - 86400}')
+        pipe.expire(key, index_ttl(channel))
+        pipe.expire(COMPLETE_KEY.format(channel.id), index_ttl(channel))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable indexing timeshift of channel {channel.id}: {e}")
+
+
+def unindex_segment(archive):
+    try:
+        get_redis().zrem(INDEX_KEY.format(archive.channel_id), _archive_member(archive))
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable unindexing timeshift segment: {e}")
+
+
+def register_segments(channel, segments):
+    """
+    Store newly written archive segments and index them.
+    `segments` are dicts with start/end (aware datetimes), url and size.
+    """
+    archives = [
+        TimeshiftArchive(
+            channel=channel,
+            start_time=seg['start'],
+            end_time=seg['end'],
+            stream_url=seg['url'],
+            duration=round((seg['end'] - seg['start']).total_seconds()),
+            size=seg.get('size') or 0,
+        )
+        for seg in segments
+    ]
+    with transaction.atomic():
+        TimeshiftArchive.objects.bulk_create(archives)
+        # bulk_create doesn't send post_save
+        transaction.on_commit(lambda: index_segments(channel, archives))
+    return archives
+
+
+def rebuild_index(channel):
+    """Rebuild a channel's index from the database; returns the segment count."""
+    key = INDEX_KEY.format(channel.id)
+    since = datetime.fromtimestamp(window_start(channel), dt_timezone.utc)
+    archives = TimeshiftArchive.objects.filter(
+        channel=channel, end_time__gte=since
+    ).order_by('start_time')
+
+    client = get_redis()
+    tmp_key = f'{key}:rebuild'
+    client.delete(tmp_key)
+    count = 0
+    batch = {}
+    for archive in archives.iterator(chunk_size=REBUILD_BATCH):
+        batch[_archive_member(archive)] = archive.start_time.timestamp()
+        if len(batch) >= REBUILD_BATCH:
+            client.zadd(tmp_key, batch)
+            count += len(batch)
+            batch = {}
+    if batch:
+        client.zadd(tmp_key, batch)
+        count += len(batch)
+
+    pipe = client.pipeline()
+    if count:
+        pipe.rename(tmp_key, key)
+        pipe.expire(key, index_ttl(channel))
+    else:
+        pipe.delete(key)
+    pipe.set(COMPLETE_KEY.format(channel.id), 1, ex=index_ttl(channel))
+    pipe.execute()
+    return count
+
+
+def ensure_index(channel):
+    """
+    Rebuild a channel's index unless it is complete; returns the segments
+    indexed. A marker without its set (evicted) is rebuilt too; for a
+    channel with nothing archived that is one empty query.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.exists(COMPLETE_KEY.format(channel.id))
+    pipe.exists(INDEX_KEY.format(channel.id))
+    complete, indexed = pipe.execute()
+    if complete and indexed:
+        return 0
+    return rebuild_index(channel)
+
+
+# ============== Lookup ==============
+
+def _db_segment(channel_id, ts):
+    archive = TimeshiftArchive.objects.filter(
+        channel_id=channel_id,
+        start_time__lte=datetime.fromtimestamp(ts, dt_timezone.utc),
+    ).order_by('-start_time').first()
+    if archive is None:
+        return None
+    return _segment(_archive_member(archive))
+
+
+def find_segment(channel_id, ts):
+    """Segment starting at or before a timestamp (it may end before it)."""
+    key = INDEX_KEY.format(channel_id)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zrevrangebyscore(key, ts, '-inf', start=0, num=1)
+        pipe.exists(COMPLETE_KEY.format(channel_id), key)
+        members, trusted = pipe.execute()
+        if trusted == 2:
+            return _segment(members[0]) if members else None
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading timeshift index: {e}")
+    return _db_segment(channel_id, ts)
+
+
+def _db_segments_between(channel_id, start_ts, end_ts):
+    start = datetime.fromtimestamp(start_ts, dt_timezone.utc)
+    end = datetime.fromtimestamp(end_ts, dt_timezone.utc)
+    archives = TimeshiftArchive.objects.filter(
+        channel_id=channel_id, start_time__lt=end, end_time__gt=start
+    ).order_by('start_time')
+    return [_segment(_archive_member(a)) for a in archives]
+
+
+def segments_between(channel_id, start_ts, end_ts):
+    """Segments overlapping [start_ts, end_ts), oldest first."""
+    key = INDEX_KEY.format(channel_id)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        # The segment already playing at start_ts, then the ones starting inside
+        pipe.zrevrangebyscore(key, start_ts, '-inf', start=0, num=1)
+        pipe.zrangebyscore(key, f'({start_ts}', f'({end_ts}')
+        pipe.exists(COMPLETE_KEY.format(channel_id), key)
+        first, rest, trusted = pipe.execute()
+        if trusted == 2:
+            segments = [_segment(m) for m in first + rest]
+            return [s for s in segments if s['end'] > start_ts]
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading timeshift index: {e}")
+    return _db_segments_between(channel_id, start_ts, end_ts)
+
+
+def resolve(channel, ts):
+    """
+    Segment playing a channel at UTC timestamp `ts`, with the position in it:
+    {'url', 'start', 'end', 'size', 'offset' (seconds), 'byte_offset'}.
+    byte_offset assumes a constant bitrate (None if the size is unknown).
+    None if `ts` is outside the timeshift window or not archived.
+    """
+    if not in_window(channel, ts):
+        return None
+    segment = find_segment(channel.id, ts)
+    if segment is None or ts >= segment['end']:
+        return None
+
+    offset = ts - segment['start']
+    duration = segment['end'] - segment['start']
+    segment['offset'] = round(offset, 3)
+    segment['byte_offset'] = int(segment['size'] * offset / duration) if segment['size'] and duration else None
+    return segment
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.channels.models import Channel
+from apps.timeshift.index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis timeshift segment index from TimeshiftArchive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', type=int, action='append', help='Only this channel id')
+
+    def handle(self, *args, **options):
+        channels = Channel.objects.filter(has_timeshift=True)
+        if options['channel']:
+            channels = channels.filter(id__in=options['channel'])
+
+        total = 0
+        for channel in channels:
+            count = rebuild_index(channel)
+            total += count
+            if count:
+                self.stdout.write(f'  {channel.number:>5} {channel.name:<40} {count:>8} segments')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} segments'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeshift', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeshiftarchive',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, help_text='Size in bytes (0 = unknown)'),
+        ),
+    ]
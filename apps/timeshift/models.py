@@ -16,6 +16,7 @@ class TimeshiftArchive(TimeStampedModel):
     end_time = models.DateTimeField(db_index=True)
     stream_url = models.URLField(max_length=500)
     duration = models.PositiveIntegerField(help_text='Duration in seconds')
+    size = models.PositiveBigIntegerField(default=0, help_text='Size in bytes (0 = unknown)')
 
     class Meta:
         verbose_name = 'Timeshift Archive'
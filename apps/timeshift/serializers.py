@@ -9,5 +9,18 @@ class TimeshiftArchiveSerializer(serializers.ModelSerializer):
         model = TimeshiftArchive
         fields = [
             'id', 'channel', 'channel_name', 'start_time', 'end_time',
-            'stream_url', 'duration'
+            'stream_url', 'duration', 'size'
         ]
+
+
+class SegmentSerializer(serializers.Serializer):
+    """An archive segment reported by the recorder."""
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    url = serializers.URLField(max_length=500)
+    size = serializers.IntegerField(min_value=0, required=False, default=0)
+
+    def validate(self, data):
+        if data['end'] <= data['start']:
+            raise serializers.ValidationError('end must be after start')
+        return data
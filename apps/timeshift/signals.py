@@ -0,0 +1,32 @@
+"""
+Keep the timeshift segment index in sync with TimeshiftArchive.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .index import index_segments, unindex_segment
+from .models import TimeshiftArchive
+
+
+@receiver(pre_save, sender=TimeshiftArchive)
+def archive_saving(sender, instance, **kwargs):
+    # An edited segment has a new index member; the old one must go
+    instance._indexed = TimeshiftArchive.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+
+@receiver(post_save, sender=TimeshiftArchive)
+def archive_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_indexed', None)
+
+    def reindex():
+        if previous is not None:
+            unindex_segment(previous)
+        index_segments(instance.channel, [instance])
+
+    transaction.on_commit(reindex)
+
+
+@receiver(post_delete, sender=TimeshiftArchive)
+def archive_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: unindex_segment(instance))
@@ -1,12 +1,16 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
+from apps.channels.export_views import playlist_device
+from apps.channels.hls import make_token
+from .catchup import catchup_denied, get_catchup, playlist_path
+from .index import in_window, register_segments, resolve
 from .models import TimeshiftArchive
-from .serializers import TimeshiftArchiveSerializer
+from .serializers import SegmentSerializer, TimeshiftArchiveSerializer
 
 
 class TimeshiftViewSet(viewsets.ReadOnlyModelViewSet):
@@ -50,19 +54,59 @@ class TimeshiftViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Generate timeshift URL
-        # Format depends on streaming server implementation
-        # Common formats: ?utc=TIMESTAMP or /timeshift/CHANNEL/TIMESTAMP
-        base_url = channel.stream_url
-        timeshift_url = f"{base_url}?utc={timestamp}" if timestamp else base_url
+        segment = None
+        timeshift_url = channel.stream_url
+        if timestamp:
+            try:
+                ts = float(timestamp)
+            except ValueError:
+                return Response(
+                    {'error': 'timestamp must be a UTC epoch'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not in_window(channel, ts):
+                return Response(
+                    {'error': f'timestamp outside the {channel.timeshift_hours} h timeshift window'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Indexed archive segment; otherwise let the streaming server
+            # seek (?utc=TIMESTAMP)
+            segment = resolve(channel, ts)
+            if segment:
+                timeshift_url = segment['url']
+            else:
+                separator = '&' if '?' in timeshift_url else '?'
+                timeshift_url = f"{timeshift_url}{separator}utc={timestamp}"
 
         return Response({
             'url': timeshift_url,
             'channel_id': channel_id,
             'timestamp': timestamp,
             'max_hours': channel.timeshift_hours,
+            'segment': segment,
         })
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def segments(self, request):
+        """
+        Register archive segments as the recorder writes them:
+        {"channel": id, "segments": [{"start", "end", "url", "size"}]}
+        """
+        from apps.channels.models import Channel
+        try:
+            channel = Channel.objects.get(id=request.data.get('channel'))
+        except (Channel.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {'error': 'Channel not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = SegmentSerializer(data=request.data.get('segments', []), many=True)
+        serializer.is_valid(raise_exception=True)
+        archives = register_segments(channel, serializer.validated_data)
+        return Response({'registered': len(archives)}, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get'])
     def catchup(self, request):
         """Get catchup program URL."""
@@ -84,6 +128,10 @@ class TimeshiftViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        denied = catchup_denied(request.user, program)
+        if denied:
+            return Response({'error': denied}, status=status.HTTP_403_FORBIDDEN)
+
         # Check if program is within catchup window
         max_hours = program.channel.timeshift_hours
         cutoff = timezone.now() - timedelta(hours=max_hours)
@@ -94,13 +142,20 @@ class TimeshiftViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Generate catchup URL
-        start_ts = int(program.start_time.timestamp())
-        end_ts = int(program.end_time.timestamp())
-        base_url = program.channel.stream_url
+        # Playlist of the archived segments, signed for the user's device;
+        # otherwise let the streaming server cut it (?utc=START&lutc=END)
+        device = playlist_device(request, request.user)
+        if device and get_catchup(program) is not None:
+            url = request.build_absolute_uri(playlist_path(program.id, make_token(device.id)))
+        else:
+            start_ts = int(program.start_time.timestamp())
+            end_ts = int(program.end_time.timestamp())
+            base_url = program.channel.stream_url
+            separator = '&' if '?' in base_url else '?'
+            url = f"{base_url}{separator}utc={start_ts}&lutc={end_ts}"
 
         return Response({
-            'url': f"{base_url}?utc={start_ts}&lutc={end_ts}",
+            'url': url,
             'program': {
                 'id': program.id,
                 'title': program.title,
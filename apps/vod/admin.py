@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import VodCategory, Movie, Series, Season, Episode, WatchHistory
+from .models import VodCategory, Genre, Person, Movie, Series, Season, Episode, WatchHistory
 
 
 @admin.register(VodCategory)
@@ -53,3 +53,15 @@ class WatchHistoryAdmin(admin.ModelAdmin):
     list_display = ('user', 'movie', 'episode', 'position', 'completed', 'watched_at')
     list_filter = ('completed', 'watched_at')
     search_fields = ('user__username',)
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name',)
+
+
+@admin.register(Person)
+class PersonAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name',)
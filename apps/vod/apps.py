@@ -5,3 +5,6 @@ class VodConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.vod'
     verbose_name = 'Video On Demand'
+
+    def ready(self):
+        from . import signals  # noqa: F401
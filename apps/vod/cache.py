@@ -0,0 +1,45 @@
+"""
+Cached VOD category list for the portal.
+"""
+import logging
+
+import redis
+from django.conf import settings
+
+from apps.core.redis_client import cached_json, get_redis, store_json
+from .models import VodCategory
+
+logger = logging.getLogger(__name__)
+
+VOD_CATEGORIES_KEY = 'vod:categories'
+
+
+def _category_item(cat):
+    return {
+        'id': str(cat.id),
+        'title': cat.name,
+        'alias': cat.alias,
+        'censored': cat.is_adult,
+    }
+
+
+def build_vod_categories():
+    categories = VodCategory.objects.filter(is_active=True).order_by('order')
+    return [_category_item(cat) for cat in categories]
+
+
+def get_vod_categories():
+    """Get the cached list of active VOD categories."""
+    # Same lifetime as the channel lineups
+    return cached_json(VOD_CATEGORIES_KEY, build_vod_categories, settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+def refresh_vod_categories():
+    store_json(VOD_CATEGORIES_KEY, build_vod_categories(), settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+def invalidate_vod_categories():
+    try:
+        get_redis().delete(VOD_CATEGORIES_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable invalidating VOD categories: {e}")
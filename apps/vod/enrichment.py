@@ -0,0 +1,321 @@
+"""
+Catalog metadata enrichment (TMDB-compatible API).
+
+Movies and series with a tmdb_id or imdb_id get their blank fields
+(description, posters, rating, year, genres, cast...) filled in from the
+metadata provider. Fields that already have a value are left alone, so
+manual edits win.
+
+enrich_catalog() splits the pending items into batches of BATCH_SIZE and
+queues one enrich_batch task per batch. A batch fetches its items
+concurrently, at most METADATA_CONCURRENCY requests in flight, and every
+request first takes a slot from a per-second counter in Redis shared by all
+workers (METADATA_RATE_LIMIT); 429 answers are retried after Retry-After.
+Responses are cached on disk per id (METADATA_CACHE_DIR), so re-runs and
+retries don't go back to the provider. Results are written with one
+bulk_update per batch.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import httpx
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.redis_client import get_async_redis
+from apps.core.warmup import schedule_warmup
+from .home import invalidate_home
+from .models import Movie, Series
+from .taxonomy import join_names, sync_index
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+MAX_RETRIES = 3
+CAST_SIZE = 10
+RATE_KEY = 'vod:metadata:rate:{}'
+MODELS = {'movie': Movie, 'series': Series}
+# Provider paths per kind
+PROVIDER_KINDS = {'movie': 'movie', 'series': 'tv'}
+
+
+# ============== Disk cache ==============
+
+def cache_path(kind, key):
+    return Path(settings.QUATTRETV['METADATA_CACHE_DIR']) / kind / f'{key}.json'
+
+
+def read_cache(kind, key):
+    """(hit, data); data is None for ids the provider doesn't know."""
+    path = cache_path(kind, key)
+    try:
+        if path.stat().st_mtime < time.time() - settings.QUATTRETV['METADATA_CACHE_DAYS'] * 86400:
+            return False, None
+        return True, json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return False, None
+
+
+def write_cache(kind, key, data):
+    path = cache_path(kind, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+# ============== Fetching ==============
+
+class RateLimiter:
+    """Requests per second shared by every worker (fixed one-second windows in Redis)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.local_next = 0.0
+
+    async def wait(self):
+        while True:
+            now = time.time()
+            window = int(now)
+            key = RATE_KEY.format(window)
+            try:
+                client = get_async_redis()
+                count = await client.incr(key)
+                if count == 1:
+                    await client.expire(key, 2)
+            except redis.RedisError:
+                # No Redis: space requests out in this process only
+                delay = self.local_next - time.monotonic()
+                self.local_next = max(self.local_next, time.monotonic()) + 1 / self.rate
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                return
+            if count <= self.rate:
+                return
+            await asyncio.sleep(window + 1 - now)
+
+
+class MetadataClient:
+    """TMDB-style API client with bounded parallelism, rate limiting and the disk cache."""
+
+    def __init__(self, http, concurrency=None, rate=None):
+        self.http = http
+        self.semaphore = asyncio.Semaphore(concurrency or settings.QUATTRETV['METADATA_CONCURRENCY'])
+        self.limiter = RateLimiter(rate or settings.QUATTRETV['METADATA_RATE_LIMIT'])
+        self.requests = 0
+
+    async def get(self, path, **params):
+        """JSON of a provider path, None on 404."""
+        params['language'] = settings.QUATTRETV['METADATA_LANGUAGE']
+        if settings.QUATTRETV['METADATA_API_KEY']:
+            params['api_key'] = settings.QUATTRETV['METADATA_API_KEY']
+        async with self.semaphore:
+            for attempt in range(MAX_RETRIES + 1):
+                await self.limiter.wait()
+                self.requests += 1
+                response = await self.http.get(path, params=params)
+                if response.status_code == 429 and attempt < MAX_RETRIES:
+                    await asyncio.sleep(float(response.headers.get('Retry-After') or 1))
+                    continue
+                if response.status_code == 404:
+                    return None
+                response.raise_for_status()
+                return response.json()
+
+    async def cached(self, kind, key, path, **params):
+        hit, data = read_cache(kind, key)
+        if not hit:
+            data = await self.get(path, **params)
+            write_cache(kind, key, data)
+        return data
+
+    async def find(self, kind, imdb_id):
+        """Provider id of an IMDb id, None if unknown."""
+        found = await self.cached(
+            'find', imdb_id, f'/find/{imdb_id}', external_source='imdb_id'
+        ) or {}
+        results = found.get(f'{PROVIDER_KINDS[kind]}_results') or []
+        return str(results[0]['id']) if results else None
+
+    async def details(self, kind, provider_id):
+        extra = 'credits,videos' if kind == 'movie' else 'credits,videos,external_ids'
+        return await self.cached(
+            kind, provider_id, f'/{PROVIDER_KINDS[kind]}/{provider_id}', append_to_response=extra
+        )
+
+    async def lookup(self, kind, obj):
+        """(provider id, details) of a Movie or Series; details None if unknown."""
+        provider_id = obj.tmdb_id or None
+        if not provider_id and obj.imdb_id:
+            provider_id = await self.find(kind, obj.imdb_id)
+        if not provider_id:
+            return None, None
+        return provider_id, await self.details(kind, provider_id)
+
+
+async def fetch_metadata(kind, objects, concurrency=None, rate=None):
+    """
+    {pk: (provider id, details)} for objects, fetched concurrently.
+    Objects whose lookup failed (network, 5xx) are left out.
+    """
+    async with httpx.AsyncClient(
+        base_url=settings.QUATTRETV['METADATA_API_URL'], timeout=15, follow_redirects=True
+    ) as http:
+        client = MetadataClient(http, concurrency, rate)
+        results = await asyncio.gather(
+            *[client.lookup(kind, obj) for obj in objects], return_exceptions=True
+        )
+    metadata = {}
+    for obj, result in zip(objects, results):
+        if isinstance(result, (httpx.HTTPError, ValueError)):
+            logger.warning(f"Metadata lookup failed for {kind} {obj.pk}: {result}")
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            metadata[obj.pk] = result
+    return metadata
+
+
+# ============== Applying ==============
+
+def _image(path):
+    return settings.QUATTRETV['METADATA_IMAGE_URL'].rstrip('/') + path if path else ''
+
+
+def _year(date):
+    return int(date[:4]) if date and date[:4].isdigit() else None
+
+
+def _trailer(data):
+    for video in (data.get('videos') or {}).get('results') or []:
+        if video.get('site') == 'YouTube' and video.get('type') == 'Trailer':
+            return f"https://www.youtube.com/watch?v={video['key']}"
+    return ''
+
+
+def _rating(data):
+    vote = data.get('vote_average')
+    return Decimal(str(round(vote, 1))) if vote else None
+
+
+def _cast(data):
+    cast = sorted((data.get('credits') or {}).get('cast') or [], key=lambda c: c.get('order', 0))
+    return join_names([c['name'].replace(',', ' ') for c in cast[:CAST_SIZE]])
+
+
+def _genres(data, max_length):
+    return join_names([g['name'].replace(',', ' ') for g in data.get('genres') or []], max_length)
+
+
+def metadata_values(kind, provider_id, data):
+    """Field values offered by the provider for a Movie or Series."""
+    model = MODELS[kind]
+    values = {
+        'tmdb_id': provider_id,
+        'description': data.get('overview') or '',
+        'rating': _rating(data),
+        'poster_url': _image(data.get('poster_path')),
+        'backdrop_url': _image(data.get('backdrop_path')),
+        'genres': _genres(data, model._meta.get_field('genres').max_length),
+        'cast': _cast(data),
+    }
+    if kind == 'movie':
+        directors = [c['name'] for c in (data.get('credits') or {}).get('crew') or [] if c.get('job') == 'Director']
+        values.update({
+            'original_title': data.get('original_title') or '',
+            'year': _year(data.get('release_date')),
+            'duration': data.get('runtime') or None,
+            'imdb_id': data.get('imdb_id') or '',
+            'director': join_names(directors, model._meta.get_field('director').max_length),
+            'trailer_url': _trailer(data),
+        })
+    else:
+        values.update({
+            'original_title': data.get('original_name') or '',
+            'year_start': _year(data.get('first_air_date')),
+            'year_end': _year(data.get('last_air_date')) if data.get('status') in ('Ended', 'Canceled') else None,
+            'imdb_id': (data.get('external_ids') or {}).get('imdb_id') or '',
+        })
+    return values
+
+
+def apply_metadata(obj, values):
+    """Fill the blank fields of obj; returns the names of the fields changed."""
+    changed = set()
+    for name, value in values.items():
+        if value in (None, '') or getattr(obj, name) not in (None, ''):
+            continue
+        field = obj._meta.get_field(name)
+        if isinstance(value, str) and field.max_length:
+            value = value[:field.max_length]
+        setattr(obj, name, value)
+        changed.add(name)
+    return changed
+
+
+def enrich(kind, ids, concurrency=None, rate=None):
+    """Enrich a batch of Movie or Series ids; returns how many were changed."""
+    model = MODELS[kind]
+    objects = list(model.objects.filter(id__in=ids))
+    if not objects:
+        return 0
+    metadata = asyncio.run(fetch_metadata(kind, objects, concurrency, rate))
+
+    now = timezone.now()
+    fields = {'metadata_updated_at', 'updated_at'}
+    done, terms_changed = [], []
+    changed_count = 0
+    for obj in objects:
+        if obj.pk not in metadata:
+            # Lookup failed: retried on the next run
+            continue
+        provider_id, data = metadata[obj.pk]
+        changed = apply_metadata(obj, metadata_values(kind, provider_id, data)) if data else set()
+        if changed:
+            changed_count += 1
+            fields |= changed
+        if changed & {'genres', 'cast'}:
+            terms_changed.append(obj)
+        # Unknown ids are marked done too, so they aren't looked up again
+        obj.metadata_updated_at = now
+        obj.updated_at = now
+        done.append(obj)
+
+    with transaction.atomic():
+        model.objects.bulk_update(done, sorted(fields), batch_size=500)
+        # bulk_update doesn't send post_save
+        sync_index(model, terms_changed)
+        if kind == 'movie':
+            invalidate_home([obj.pk for obj in done])
+        transaction.on_commit(schedule_warmup)
+    logger.info(f"Metadata enrichment: {changed_count}/{len(objects)} {kind} updated")
+    return changed_count
+
+
+def pending(kind, force=False):
+    """Ids of the items that can be enriched (only never-enriched ones unless force)."""
+    queryset = MODELS[kind].objects.filter(Q(tmdb_id__gt='') | Q(imdb_id__gt=''))
+    if not force:
+        queryset = queryset.filter(metadata_updated_at__isnull=True)
+    return list(queryset.order_by('id').values_list('id', flat=True))
+
+
+def enrich_catalog(kinds=None, force=False, limit=None):
+    """Queue one enrich_batch task per BATCH_SIZE pending items; returns the count queued."""
+    from .tasks import enrich_batch
+
+    queued = 0
+    for kind in kinds or MODELS:
+        ids = pending(kind, force)[:limit]
+        for start in range(0, len(ids), BATCH_SIZE):
+            enrich_batch.delay(kind, ids[start:start + BATCH_SIZE])
+        queued += len(ids)
+    return queued
@@ -0,0 +1,166 @@
+"""
+VOD home feed.
+
+The home rows (featured, recent, top rated, one per genre and one per
+category) are built in a single pass over the catalog, genres coming from
+the MovieGenre index, and cached as lists of movie ids, one set per
+audience (with and without adult content).
+Movies are drawn from a card store, a Redis hash of serialized
+MovieListSerializer cards; cards missing from it are loaded with one
+in_bulk call for the whole feed. Catalog changes drop the affected cards
+and rows and schedule a warm-up, which rebuilds the rows.
+
+Continue watching is per user and is added on top of the cached rows.
+"""
+import json
+import logging
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+
+from apps.core.redis_client import cached_json, get_redis, store_json
+from . import positions
+from .models import Genre, Movie, MovieGenre, VodCategory
+from .serializers import MovieListSerializer, WatchHistorySerializer
+
+logger = logging.getLogger(__name__)
+
+ROWS_KEY = 'vod:home:rows:{}'
+CARDS_KEY = 'vod:home:cards'
+CARDS_TTL = 60 * 60 * 24
+AUDIENCES = ('all', 'safe')
+ROW_SIZE = 20
+GENRE_ROWS = 10
+
+
+def audience(user):
+    """Same rule as MovieViewSet: no adult content without a parental password."""
+    return 'all' if user.is_staff or user.parental_password else 'safe'
+
+
+def build_rows(audience):
+    """Home rows as [{'id', 'title', 'ids'}], from one pass over the catalog."""
+    movies = Movie.objects.filter(is_active=True)
+    categories = VodCategory.objects.filter(is_active=True).order_by('order')
+    if audience == 'safe':
+        movies = movies.filter(is_adult=False)
+        categories = categories.filter(is_adult=False)
+
+    movie_genres = defaultdict(list)
+    for movie_id, genre_id in MovieGenre.objects.filter(movie__in=movies).values_list('movie_id', 'genre_id'):
+        movie_genres[movie_id].append(genre_id)
+
+    featured, recent, rated = [], [], []
+    by_genre = defaultdict(list)
+    by_category = defaultdict(list)
+    rows = movies.order_by('-created_at').values_list('id', 'is_featured', 'rating', 'category_id')
+    for movie_id, is_featured, rating, category_id in rows.iterator(chunk_size=5000):
+        recent.append(movie_id)
+        if is_featured:
+            featured.append(movie_id)
+        if rating is not None:
+            rated.append((rating, movie_id))
+        if category_id:
+            by_category[category_id].append(movie_id)
+        for genre_id in movie_genres.get(movie_id, ()):
+            by_genre[genre_id].append(movie_id)
+
+    # Stable sort: equal ratings keep the newest first
+    rated.sort(key=lambda item: item[0], reverse=True)
+    result = [
+        {'id': 'featured', 'title': 'Destacadas', 'ids': featured[:ROW_SIZE]},
+        {'id': 'recent', 'title': 'Novedades', 'ids': recent[:ROW_SIZE]},
+        {'id': 'top_rated', 'title': 'Mejor valoradas', 'ids': [i for _, i in rated[:ROW_SIZE]]},
+    ]
+    top_genres = sorted(by_genre, key=lambda genre_id: len(by_genre[genre_id]), reverse=True)[:GENRE_ROWS]
+    genres = Genre.objects.in_bulk(top_genres)
+    for genre_id in top_genres:
+        genre = genres[genre_id]
+        result.append({'id': f'genre:{genre.slug}', 'title': genre.name, 'ids': by_genre[genre_id][:ROW_SIZE]})
+    for category in categories:
+        if by_category[category.id]:
+            result.append({
+                'id': f'category:{category.id}', 'title': category.name, 'ids': by_category[category.id][:ROW_SIZE]
+            })
+    return [row for row in result if row['ids']]
+
+
+def get_rows(audience):
+    return cached_json(ROWS_KEY.format(audience), lambda: build_rows(audience), settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+def refresh_rows():
+    for name in AUDIENCES:
+        store_json(ROWS_KEY.format(name), build_rows(name), settings.QUATTRETV['LINEUP_CACHE_TTL'])
+
+
+def get_cards(ids):
+    """{movie_id: card} for ids, filling the card store from one in_bulk call."""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    cards = {}
+    try:
+        for movie_id, raw in zip(ids, get_redis().hmget(CARDS_KEY, ids)):
+            if raw is not None:
+                cards[movie_id] = json.loads(raw)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading VOD cards: {e}")
+
+    missing = [i for i in ids if i not in cards]
+    if missing:
+        movies = Movie.objects.filter(is_active=True).select_related('category').in_bulk(missing)
+        fresh = {movie_id: MovieListSerializer(movie).data for movie_id, movie in movies.items()}
+        cards.update(fresh)
+        if fresh:
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                pipe.hset(CARDS_KEY, mapping={movie_id: json.dumps(card) for movie_id, card in fresh.items()})
+                pipe.expire(CARDS_KEY, CARDS_TTL)
+                pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f"Redis unavailable writing VOD cards: {e}")
+    return cards
+
+
+def get_home(user):
+    """Home rows with their movie cards, continue watching first."""
+    rows = get_rows(audience(user))
+    cards = get_cards([i for row in rows for i in row['ids']])
+    home = []
+    watching = positions.continue_watching(user)
+    if watching:
+        home.append({
+            'id': 'continue_watching',
+            'title': 'Seguir viendo',
+            'items': WatchHistorySerializer(watching, many=True).data,
+        })
+    for row in rows:
+        items = [cards[i] for i in row['ids'] if i in cards]
+        if items:
+            home.append({'id': row['id'], 'title': row['title'], 'items': items})
+    return home
+
+
+def get_row(user, row_id):
+    """Cards of a single cached row."""
+    row = next((r for r in get_rows(audience(user)) if r['id'] == row_id), None)
+    if row is None:
+        return []
+    cards = get_cards(row['ids'])
+    return [cards[i] for i in row['ids'] if i in cards]
+
+
+def invalidate_home(movie_ids=None):
+    """Drop the cached rows and the cards of movie_ids (every card if None)."""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.delete(*[ROWS_KEY.format(name) for name in AUDIENCES])
+        if movie_ids is None:
+            pipe.delete(CARDS_KEY)
+        elif movie_ids:
+            pipe.hdel(CARDS_KEY, *movie_ids)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable invalidating the VOD home: {e}")
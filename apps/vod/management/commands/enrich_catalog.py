@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from apps.vod.enrichment import BATCH_SIZE, MODELS, enrich, enrich_catalog, pending
+
+
+class Command(BaseCommand):
+    help = 'Fill in movie and series metadata (posters, descriptions, ratings...) from the metadata provider'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(MODELS), action='append', help='Only movies or series')
+        parser.add_argument('--force', action='store_true', help='Also items enriched before')
+        parser.add_argument('--limit', type=int, help='At most this many items per kind')
+        parser.add_argument(
+            '--sync', action='store_true',
+            help='Run the batches here instead of queueing Celery tasks'
+        )
+        parser.add_argument('--concurrency', type=int, help='Requests in flight (default: METADATA_CONCURRENCY)')
+        parser.add_argument('--rate', type=int, help='Requests per second (default: METADATA_RATE_LIMIT)')
+
+    def handle(self, *args, **options):
+        if not options['sync']:
+            queued = enrich_catalog(options['kind'], options['force'], options['limit'])
+            self.stdout.write(self.style.SUCCESS(f'Queued {queued} items for enrichment'))
+            return
+
+        total = changed = 0
+        for kind in options['kind'] or MODELS:
+            ids = pending(kind, options['force'])[:options['limit']]
+            for start in range(0, len(ids), BATCH_SIZE):
+                batch = ids[start:start + BATCH_SIZE]
+                changed += enrich(kind, batch, options['concurrency'], options['rate'])
+                total += len(batch)
+                self.stdout.write(f'  {kind:<7} {start + len(batch):>7}/{len(ids)}')
+        self.stdout.write(self.style.SUCCESS(f'{changed} of {total} items updated'))
@@ -0,0 +1,124 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vod', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Genre',
+                'verbose_name_plural': 'Genres',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Person',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=200, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Person',
+                'verbose_name_plural': 'People',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.genre')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.movie')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='genre_index',
+            field=models.ManyToManyField(blank=True, related_name='movies', through='vod.MovieGenre', to='vod.genre'),
+        ),
+        migrations.CreateModel(
+            name='MovieCast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.movie')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.person')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='cast_index',
+            field=models.ManyToManyField(blank=True, related_name='movies', through='vod.MovieCast', to='vod.person'),
+        ),
+        migrations.CreateModel(
+            name='SeriesCast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.person')),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.series')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='cast_index',
+            field=models.ManyToManyField(blank=True, related_name='series', through='vod.SeriesCast', to='vod.person'),
+        ),
+        migrations.CreateModel(
+            name='SeriesGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.genre')),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vod.series')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='genre_index',
+            field=models.ManyToManyField(blank=True, related_name='series', through='vod.SeriesGenre', to='vod.genre'),
+        ),
+        migrations.AddConstraint(
+            model_name='moviegenre',
+            constraint=models.UniqueConstraint(fields=('movie', 'genre'), name='unique_movie_genre'),
+        ),
+        migrations.AddConstraint(
+            model_name='moviecast',
+            constraint=models.UniqueConstraint(fields=('movie', 'person'), name='unique_movie_cast'),
+        ),
+        migrations.AddConstraint(
+            model_name='seriescast',
+            constraint=models.UniqueConstraint(fields=('series', 'person'), name='unique_series_cast'),
+        ),
+        migrations.AddConstraint(
+            model_name='seriesgenre',
+            constraint=models.UniqueConstraint(fields=('series', 'genre'), name='unique_series_genre'),
+        ),
+    ]
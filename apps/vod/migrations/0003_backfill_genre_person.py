@@ -0,0 +1,77 @@
+import unicodedata
+
+from django.db import migrations
+from django.utils.text import slugify
+
+BATCH_SIZE = 1000
+
+# (owner model, text field, term model, through model, term field)
+INDEXES = [
+    ('Movie', 'genres', 'Genre', 'MovieGenre', 'genre'),
+    ('Movie', 'cast', 'Person', 'MovieCast', 'person'),
+    ('Series', 'genres', 'Genre', 'SeriesGenre', 'genre'),
+    ('Series', 'cast', 'Person', 'SeriesCast', 'person'),
+]
+
+
+# Frozen copy of apps.vod.taxonomy as of this migration
+
+def split_names(text):
+    return [name.strip() for name in (text or '').split(',') if name.strip()]
+
+
+def term_slug(name, max_length):
+    chars = []
+    for c in unicodedata.normalize('NFD', name):
+        if unicodedata.combining(c) and chars and chars[-1].isascii():
+            continue
+        chars.append(c)
+    return slugify(unicodedata.normalize('NFC', ''.join(chars)), allow_unicode=True)[:max_length]
+
+
+def index_batch(batch, source, Term, Through, owner, term):
+    slug_length = Term._meta.get_field('slug').max_length
+    name_length = Term._meta.get_field('name').max_length
+    names = {}
+    wanted = []
+    for obj in batch:
+        slugs = []
+        for name in split_names(getattr(obj, source)):
+            slug = term_slug(name, slug_length)
+            if slug and slug not in slugs:
+                slugs.append(slug)
+                names.setdefault(slug, name[:name_length])
+        wanted += [(obj.id, slug, position) for position, slug in enumerate(slugs)]
+    if not names:
+        return
+    Term.objects.bulk_create([Term(name=name, slug=slug) for slug, name in names.items()], ignore_conflicts=True)
+    term_ids = dict(Term.objects.filter(slug__in=names).values_list('slug', 'id'))
+    Through.objects.bulk_create([
+        Through(**{f'{owner}_id': obj_id, f'{term}_id': term_ids[slug], 'position': position})
+        for obj_id, slug, position in wanted
+    ], ignore_conflicts=True)
+
+
+def backfill(apps, schema_editor):
+    for owner_name, source, term_name, through_name, term in INDEXES:
+        model = apps.get_model('vod', owner_name)
+        Term = apps.get_model('vod', term_name)
+        Through = apps.get_model('vod', through_name)
+        last_id = 0
+        while True:
+            batch = list(model.objects.filter(id__gt=last_id).order_by('id').only('id', source)[:BATCH_SIZE])
+            if not batch:
+                break
+            index_batch(batch, source, Term, Through, owner_name.lower(), term)
+            last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vod', '0002_genre_person'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vod', '0003_backfill_genre_person'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='metadata_updated_at',
+            field=models.DateTimeField(blank=True, help_text='Last metadata enrichment', null=True),
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='metadata_updated_at',
+            field=models.DateTimeField(blank=True, help_text='Last metadata enrichment', null=True),
+        ),
+    ]
@@ -30,6 +30,34 @@ class VodCategory(TimeStampedModel, ActivableModel):
         return self.name
 
 
+class Genre(models.Model):
+    """Normalized VOD genre (from the comma-separated `genres` fields)."""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+
+    class Meta:
+        verbose_name = 'Genre'
+        verbose_name_plural = 'Genres'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class Person(models.Model):
+    """Normalized cast member (from the comma-separated `cast` fields)."""
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200, unique=True, allow_unicode=True)
+
+    class Meta:
+        verbose_name = 'Person'
+        verbose_name_plural = 'People'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Movie(TimeStampedModel, ActivableModel):
     """Movie/Film."""
     title = models.CharField(max_length=300)
@@ -40,6 +68,7 @@ class Movie(TimeStampedModel, ActivableModel):
     rating = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
     imdb_id = models.CharField(max_length=20, blank=True)
     tmdb_id = models.CharField(max_length=20, blank=True)
+    metadata_updated_at = models.DateTimeField(null=True, blank=True, help_text='Last metadata enrichment')
 
     # Media
     poster = models.ImageField(upload_to='vod/posters/', blank=True, null=True)
@@ -71,6 +100,9 @@ class Movie(TimeStampedModel, ActivableModel):
     genres = models.CharField(max_length=200, blank=True, help_text='Comma-separated')
     director = models.CharField(max_length=200, blank=True)
     cast = models.TextField(blank=True, help_text='Comma-separated')
+    # Kept in sync with genres/cast (see taxonomy.py), for filtering
+    genre_index = models.ManyToManyField(Genre, through='MovieGenre', related_name='movies', blank=True)
+    cast_index = models.ManyToManyField(Person, through='MovieCast', related_name='movies', blank=True)
     country = models.CharField(max_length=100, blank=True)
     language = models.CharField(max_length=50, blank=True)
 
@@ -99,6 +131,7 @@ class Series(TimeStampedModel, ActivableModel):
     rating = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
     imdb_id = models.CharField(max_length=20, blank=True)
     tmdb_id = models.CharField(max_length=20, blank=True)
+    metadata_updated_at = models.DateTimeField(null=True, blank=True, help_text='Last metadata enrichment')
 
     # Media
     poster = models.ImageField(upload_to='vod/series/posters/', blank=True, null=True)
@@ -116,6 +149,8 @@ class Series(TimeStampedModel, ActivableModel):
     )
     genres = models.CharField(max_length=200, blank=True)
     cast = models.TextField(blank=True)
+    genre_index = models.ManyToManyField(Genre, through='SeriesGenre', related_name='series', blank=True)
+    cast_index = models.ManyToManyField(Person, through='SeriesCast', related_name='series', blank=True)
     country = models.CharField(max_length=100, blank=True)
 
     # Flags
@@ -131,6 +166,46 @@ class Series(TimeStampedModel, ActivableModel):
         return self.title
 
 
+class MovieGenre(models.Model):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [models.UniqueConstraint(fields=['movie', 'genre'], name='unique_movie_genre')]
+
+
+class MovieCast(models.Model):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    person = models.ForeignKey(Person, on_delete=models.CASCADE)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [models.UniqueConstraint(fields=['movie', 'person'], name='unique_movie_cast')]
+
+
+class SeriesGenre(models.Model):
+    series = models.ForeignKey(Series, on_delete=models.CASCADE)
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [models.UniqueConstraint(fields=['series', 'genre'], name='unique_series_genre')]
+
+
+class SeriesCast(models.Model):
+    series = models.ForeignKey(Series, on_delete=models.CASCADE)
+    person = models.ForeignKey(Person, on_delete=models.CASCADE)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [models.UniqueConstraint(fields=['series', 'person'], name='unique_series_cast')]
+
+
 class Season(TimeStampedModel):
     """Season of a TV Series."""
     series = models.ForeignKey(
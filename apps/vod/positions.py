@@ -0,0 +1,236 @@
+"""
+Watch position buffer.
+
+Apps report the playback position every few seconds; writing each report
+to WatchHistory is a SELECT plus an UPDATE/INSERT. Positions go to Redis
+instead, where only the latest one per (user, item) is kept:
+
+- vod:positions:<user_id>  hash  'movie:<id>' / 'episode:<id>' -> 'position:ts'
+  Read by continue_watching, so resume points are fresh before any flush.
+- vod:positions:dirty      hash  '<user_id>:movie:<id>' -> 'position:ts'
+  What changed since the last flush.
+
+The first report after a flush schedules flush_watch_positions
+WATCH_POSITION_FLUSH_INTERVAL seconds later; the flush takes the dirty
+hash with RENAME and writes it with one bulk_update and one bulk_create.
+Positions past the item's duration are dropped there, where the items are
+loaded anyway, so reports never query the database. A batch the database
+refuses (IntegrityError, DataError) is moved to vod:positions:failed:<ts>
+(kept FAILED_TTL) and logged, so it can't block the flushes after it; on any
+other database error the batch stays in place for the task's retry.
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.redis_client import get_redis
+from .models import Episode, Movie, WatchHistory
+
+logger = logging.getLogger(__name__)
+
+USER_KEY = 'vod:positions:{}'
+DIRTY_KEY = 'vod:positions:dirty'
+FLUSHING_KEY = 'vod:positions:flushing'
+SCHEDULED_KEY = 'vod:positions:scheduled'
+LOCK_KEY = 'vod:positions:lock'
+FAILED_KEY = 'vod:positions:failed:{}'
+# Buffered positions outlive any flush by far
+USER_TTL = 60 * 60 * 24
+LOCK_TTL = 60
+FAILED_TTL = 60 * 60 * 24 * 7
+# WatchHistory.position is a PositiveIntegerField
+MAX_POSITION = 2_147_483_647
+KINDS = ('movie', 'episode')
+
+
+def _value(position, ts):
+    return f'{position}:{ts:.3f}'
+
+
+def _parse(value):
+    position, ts = value.split(':')
+    return int(position), float(ts)
+
+
+def record_position(user_id, kind, item_id, position):
+    """Buffer a position report; falls back to the database without Redis."""
+    value = _value(position, timezone.now().timestamp())
+    try:
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        pipe.hset(USER_KEY.format(user_id), f'{kind}:{item_id}', value)
+        pipe.expire(USER_KEY.format(user_id), USER_TTL)
+        pipe.hset(DIRTY_KEY, f'{user_id}:{kind}:{item_id}', value)
+        pipe.execute()
+        interval = settings.QUATTRETV['WATCH_POSITION_FLUSH_INTERVAL']
+        if r.set(SCHEDULED_KEY, 1, nx=True, ex=interval):
+            from .tasks import flush_watch_positions
+            flush_watch_positions.apply_async(countdown=interval)
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable buffering watch position: {e}")
+        WatchHistory.objects.update_or_create(
+            user_id=user_id, **{f'{kind}_id': item_id}, defaults={'position': position}
+        )
+
+
+def buffered_positions(user_id):
+    """{(kind, item_id): (position, ts)} of a user's buffered positions."""
+    try:
+        raw = get_redis().hgetall(USER_KEY.format(user_id))
+    except redis.RedisError as e:
+        logger.warning(f"Redis unavailable reading watch positions: {e}")
+        return {}
+    positions = {}
+    for field, value in raw.items():
+        kind, item_id = field.split(':')
+        positions[(kind, int(item_id))] = _parse(value)
+    return positions
+
+
+def history_key(history):
+    if history.movie_id:
+        return 'movie', history.movie_id
+    return 'episode', history.episode_id
+
+
+def continue_watching(user, limit=20):
+    """
+    Unfinished WatchHistory of a user with the buffered positions applied,
+    newest first. Items only seen in the buffer are unsaved instances.
+    """
+    buffered = buffered_positions(user.id)
+    history = WatchHistory.objects.filter(user=user).select_related('movie', 'episode')
+
+    rows = {}
+    for item in history.filter(completed=False, position__gt=0)[:limit]:
+        rows[history_key(item)] = item
+    if buffered:
+        movie_ids = [i for kind, i in buffered if kind == 'movie']
+        episode_ids = [i for kind, i in buffered if kind == 'episode']
+        # Oldest first, so the newest duplicate wins
+        buffered_rows = history.filter(Q(movie_id__in=movie_ids) | Q(episode_id__in=episode_ids))
+        for item in buffered_rows.order_by('watched_at'):
+            rows[history_key(item)] = item
+
+        movies = Movie.objects.in_bulk(i for key, i in buffered if key == 'movie' and (key, i) not in rows)
+        episodes = Episode.objects.in_bulk(i for key, i in buffered if key == 'episode' and (key, i) not in rows)
+        for (kind, item_id), (position, ts) in buffered.items():
+            item = rows.get((kind, item_id))
+            if item is None:
+                content = (movies if kind == 'movie' else episodes).get(item_id)
+                if content is None:
+                    continue
+                item = rows[(kind, item_id)] = WatchHistory(user=user, **{kind: content})
+            item.position = position
+            item.watched_at = datetime.fromtimestamp(ts, dt_timezone.utc)
+
+    unfinished = [item for item in rows.values() if not item.completed and item.position > 0]
+    unfinished.sort(key=lambda item: item.watched_at, reverse=True)
+    return unfinished[:limit]
+
+
+def max_position(duration):
+    """Furthest position for an item `duration` minutes long (rounded, so one more)."""
+    return min(duration * 60 + 60, MAX_POSITION) if duration else MAX_POSITION
+
+
+def _write(entries):
+    """Store {(user_id, kind, item_id): (position, ts)} in WatchHistory."""
+    movie_ids = {i for _, kind, i in entries if kind == 'movie'}
+    episode_ids = {i for _, kind, i in entries if kind == 'episode'}
+    # Reports for deleted users or content are dropped, not flushed
+    user_ids = set(get_user_model().objects.filter(
+        id__in={u for u, _, _ in entries}
+    ).values_list('id', flat=True))
+    durations = {
+        'movie': dict(Movie.objects.filter(id__in=movie_ids).values_list('id', 'duration')),
+        'episode': dict(Episode.objects.filter(id__in=episode_ids).values_list('id', 'duration')),
+    }
+    existing = {}
+    for item in WatchHistory.objects.filter(user_id__in=user_ids).filter(
+        Q(movie_id__in=movie_ids) | Q(episode_id__in=episode_ids)
+    ).only('id', 'user_id', 'movie_id', 'episode_id').order_by('watched_at'):
+        existing[(item.user_id, *history_key(item))] = item
+
+    now = timezone.now()
+    updated, created = [], []
+    for key, (position, ts) in entries.items():
+        user_id, kind, item_id = key
+        if user_id not in user_ids or item_id not in durations[kind]:
+            continue
+        if position > max_position(durations[kind][item_id]):
+            continue
+        watched_at = datetime.fromtimestamp(ts, dt_timezone.utc)
+        item = existing.get(key)
+        if item is None:
+            created.append(WatchHistory(
+                user_id=user_id, position=position, watched_at=watched_at, **{f'{kind}_id': item_id}
+            ))
+        else:
+            item.position = position
+            item.watched_at = watched_at
+            item.updated_at = now
+            updated.append(item)
+
+    with transaction.atomic():
+        WatchHistory.objects.bulk_update(updated, ['position', 'watched_at', 'updated_at'], batch_size=1000)
+        watched = [item.watched_at for item in created]
+        WatchHistory.objects.bulk_create(created, batch_size=1000)
+        # auto_now stamps inserts with the flush time: put the report time back
+        for item, watched_at in zip(created, watched):
+            item.watched_at = watched_at
+        WatchHistory.objects.bulk_update(created, ['watched_at'], batch_size=1000)
+    return len(updated), len(created)
+
+
+def _take_batch(r):
+    """Batch to flush: one left by a flush that died half-way, else the dirty hash."""
+    if r.exists(FLUSHING_KEY):
+        return True
+    try:
+        r.rename(DIRTY_KEY, FLUSHING_KEY)
+    except redis.ResponseError:
+        # Nothing buffered
+        return False
+    return True
+
+
+def flush():
+    """Write the buffered positions to WatchHistory; returns (updated, created)."""
+    r = get_redis()
+    if not r.set(LOCK_KEY, 1, nx=True, ex=LOCK_TTL):
+        return 0, 0
+    updated = created = 0
+    try:
+        # Reports from now on schedule the next flush
+        r.delete(SCHEDULED_KEY)
+        # At most a leftover batch and the current one
+        for _ in range(2):
+            if not _take_batch(r):
+                break
+            entries = {}
+            for field, value in r.hgetall(FLUSHING_KEY).items():
+                user_id, kind, item_id = field.split(':')
+                if kind in KINDS:
+                    entries[(int(user_id), kind, int(item_id))] = _parse(value)
+            try:
+                batch_updated, batch_created = _write(entries)
+            except (IntegrityError, DataError) as e:
+                # Retrying would fail the same way: set the batch aside
+                failed_key = FAILED_KEY.format(int(timezone.now().timestamp()))
+                r.rename(FLUSHING_KEY, failed_key)
+                r.expire(failed_key, FAILED_TTL)
+                logger.error(f"Watch positions not flushed ({len(entries)} moved to {failed_key}): {e}")
+                continue
+            updated += batch_updated
+            created += batch_created
+            r.delete(FLUSHING_KEY)
+    finally:
+        r.delete(LOCK_KEY)
+    return updated, created
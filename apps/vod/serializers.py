@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import VodCategory, Movie, Series, Season, Episode, WatchHistory
+from apps.core.images import image_url
+from .models import VodCategory, Genre, Person, Movie, Series, Season, Episode, WatchHistory
 
 
 class VodCategorySerializer(serializers.ModelSerializer):
@@ -8,22 +9,39 @@ class VodCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'alias', 'description', 'icon', 'parent', 'order', 'is_adult']
 
 
+class GenreSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Genre
+        fields = ['id', 'name', 'slug']
+
+
+class PersonSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Person
+        fields = ['id', 'name', 'slug']
+
+
 class MovieListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    poster_thumb = serializers.SerializerMethodField()
 
     class Meta:
         model = Movie
         fields = [
             'id', 'title', 'year', 'rating', 'duration',
-            'poster', 'poster_url', 'category', 'category_name',
+            'poster', 'poster_url', 'poster_thumb', 'category', 'category_name',
             'is_hd', 'is_4k', 'is_featured'
         ]
 
+    def get_poster_thumb(self, obj):
+        return image_url(obj.poster_url, 'poster-sm')
+
 
 class MovieDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Movie
-        fields = '__all__'
+        # The genres/cast text is the public form of the index
+        exclude = ['genre_index', 'cast_index']
 
 
 class EpisodeSerializer(serializers.ModelSerializer):
@@ -50,15 +68,19 @@ class SeasonSerializer(serializers.ModelSerializer):
 class SeriesListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     seasons_count = serializers.SerializerMethodField()
+    poster_thumb = serializers.SerializerMethodField()
 
     class Meta:
         model = Series
         fields = [
             'id', 'title', 'year_start', 'year_end', 'rating',
-            'poster', 'poster_url', 'category', 'category_name',
+            'poster', 'poster_url', 'poster_thumb', 'category', 'category_name',
             'is_featured', 'seasons_count'
         ]
 
+    def get_poster_thumb(self, obj):
+        return image_url(obj.poster_url, 'poster-sm')
+
     def get_seasons_count(self, obj):
         return obj.seasons.count()
 
@@ -68,7 +90,7 @@ class SeriesDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Series
-        fields = '__all__'
+        exclude = ['genre_index', 'cast_index']
 
 
 class WatchHistorySerializer(serializers.ModelSerializer):
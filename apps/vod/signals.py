@@ -0,0 +1,34 @@
+"""
+Keep the cached VOD categories, the home feed and the genre/cast index in
+sync with the database.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.core.warmup import schedule_warmup
+from .cache import invalidate_vod_categories
+from .home import invalidate_home
+from .models import Movie, Series, VodCategory
+from .taxonomy import sync_index
+
+
+@receiver([post_save, post_delete], sender=VodCategory)
+def category_changed(sender, **kwargs):
+    invalidate_vod_categories()
+    # Cards carry the category name
+    invalidate_home()
+    transaction.on_commit(schedule_warmup)
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def movie_changed(sender, instance, **kwargs):
+    invalidate_home([instance.id])
+    transaction.on_commit(schedule_warmup)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=Series)
+def terms_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'genres', 'cast'} & set(update_fields):
+        sync_index(sender, [instance])
@@ -0,0 +1,41 @@
+"""
+Celery tasks for VOD.
+"""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def flush_watch_positions(self):
+    """Write the buffered watch positions to WatchHistory."""
+    from django.db import DatabaseError
+
+    from .positions import flush
+
+    try:
+        updated, created = flush()
+    except DatabaseError as e:
+        # The batch is still in Redis; the retry picks it up
+        raise self.retry(exc=e)
+    if updated or created:
+        logger.info(f"Watch positions flushed: {updated} updated, {created} created")
+
+
+@shared_task
+def enrich_catalog(force=False):
+    """Queue metadata enrichment batches for the catalog."""
+    from .enrichment import enrich_catalog
+
+    queued = enrich_catalog(force=force)
+    logger.info(f"Metadata enrichment queued for {queued} items")
+
+
+@shared_task
+def enrich_batch(kind, ids):
+    """Fill in the metadata of a batch of movies or series."""
+    from .enrichment import enrich
+
+    return enrich(kind, ids)
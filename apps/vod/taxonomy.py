@@ -0,0 +1,125 @@
+"""
+Normalized genres and cast.
+
+`genres` and `cast` on Movie and Series stay the comma-separated source of
+truth (the Stalker portal and the admin use them as is). Every save mirrors
+them into Genre/Person rows linked through MovieGenre, MovieCast,
+SeriesGenre and SeriesCast, so filtering by genre or actor is an indexed
+join instead of a substring scan. Terms are matched by slug, so "Acción",
+"accion" and " ACCIÓN " are one genre. Only accents on Latin letters are
+folded: other scripts keep their marks, so "ドラマ" and "トラマ" or "Й" and
+"И" stay apart.
+
+The backfill migration (vod 0003) has its own frozen copy of this logic.
+"""
+import unicodedata
+
+from django.utils.text import slugify
+
+# (M2M field, legacy text field)
+INDEXES = (('genre_index', 'genres'), ('cast_index', 'cast'))
+
+
+def split_names(text):
+    return [name.strip() for name in (text or '').split(',') if name.strip()]
+
+
+def fold_accents(name):
+    """Drop the accents of Latin letters ("Acción" -> "Accion"), nothing else."""
+    chars = []
+    for c in unicodedata.normalize('NFD', name):
+        if unicodedata.combining(c) and chars and chars[-1].isascii():
+            continue
+        chars.append(c)
+    return unicodedata.normalize('NFC', ''.join(chars))
+
+
+def term_slug(name, max_length=None):
+    return slugify(fold_accents(name), allow_unicode=True)[:max_length]
+
+
+def _sync_field(model, objects, field_name, source):
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through
+    Term = field.remote_field.model
+    owner = field.m2m_field_name() + '_id'
+    term = field.m2m_reverse_field_name() + '_id'
+    max_length = Term._meta.get_field('slug').max_length
+
+    names = {}
+    wanted = {}
+    for obj in objects:
+        slugs = []
+        for name in split_names(getattr(obj, source)):
+            slug = term_slug(name, max_length)
+            if slug and slug not in slugs:
+                slugs.append(slug)
+                names.setdefault(slug, name[:Term._meta.get_field('name').max_length])
+        wanted[obj.pk] = slugs
+
+    if names:
+        Term.objects.bulk_create([Term(name=name, slug=slug) for slug, name in names.items()], ignore_conflicts=True)
+    term_ids = dict(Term.objects.filter(slug__in=names).values_list('slug', 'id'))
+    desired = {
+        (obj_id, term_ids[slug], position)
+        for obj_id, slugs in wanted.items()
+        for position, slug in enumerate(slugs)
+    }
+
+    stale = []
+    current = set()
+    for pk, obj_id, term_id, position in through.objects.filter(
+        **{f'{owner}__in': list(wanted)}
+    ).values_list('id', owner, term, 'position'):
+        if (obj_id, term_id, position) in desired:
+            current.add((obj_id, term_id, position))
+        else:
+            stale.append(pk)
+    if stale:
+        through.objects.filter(id__in=stale).delete()
+    through.objects.bulk_create([
+        through(**{owner: obj_id, term: term_id, 'position': position})
+        for obj_id, term_id, position in desired - current
+    ])
+
+
+def sync_index(model, objects):
+    """Mirror the genres/cast text of Movie or Series objects into the index."""
+    objects = [obj for obj in objects if obj.pk]
+    if not objects:
+        return
+    for field_name, source in INDEXES:
+        _sync_field(model, objects, field_name, source)
+
+
+def join_names(names, max_length=None):
+    """Legacy comma-separated text; whole names only if it has to be cut."""
+    text = ''
+    for name in split_names(','.join(names)):
+        joined = f'{text}, {name}' if text else name
+        if max_length and len(joined) > max_length:
+            break
+        text = joined
+    return text
+
+
+def set_terms(obj, genres=None, cast=None):
+    """Replace the genres and/or cast of obj from lists of names (text and index)."""
+    fields = []
+    for source, names in (('genres', genres), ('cast', cast)):
+        if names is not None:
+            setattr(obj, source, join_names(names, obj._meta.get_field(source).max_length))
+            fields.append(source)
+    if fields:
+        # post_save updates the index
+        obj.save(update_fields=fields + ['updated_at'])
+
+
+def filter_terms(queryset, genre=None, actor=None):
+    """Filter Movie or Series by genre and actor (name or slug)."""
+    for field_name, name in (('genre_index', genre), ('cast_index', actor)):
+        if name:
+            Term = queryset.model._meta.get_field(field_name).remote_field.model
+            slug = term_slug(name, Term._meta.get_field('slug').max_length)
+            queryset = queryset.filter(**{f'{field_name}__slug': slug})
+    return queryset
@@ -6,6 +6,8 @@ app_name = 'vod'
 
 router = DefaultRouter()
 router.register(r'categories', views.VodCategoryViewSet)
+router.register(r'genres', views.GenreViewSet)
+router.register(r'people', views.PersonViewSet)
 router.register(r'movies', views.MovieViewSet)
 router.register(r'series', views.SeriesViewSet)
 router.register(r'seasons', views.SeasonViewSet)
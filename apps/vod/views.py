@@ -2,12 +2,14 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import VodCategory, Movie, Series, Season, Episode, WatchHistory
+from .models import VodCategory, Genre, Person, Movie, Series, Season, Episode, WatchHistory
+from . import home, positions
 from .serializers import (
     VodCategorySerializer, MovieListSerializer, MovieDetailSerializer,
     SeriesListSerializer, SeriesDetailSerializer, SeasonSerializer,
-    EpisodeSerializer, WatchHistorySerializer
+    EpisodeSerializer, WatchHistorySerializer, GenreSerializer, PersonSerializer
 )
+from .taxonomy import filter_terms
 
 
 class VodCategoryViewSet(viewsets.ModelViewSet):
@@ -21,6 +23,20 @@ class VodCategoryViewSet(viewsets.ModelViewSet):
         return [IsAdminUser()]
 
 
+class GenreViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Genre.objects.all()
+    serializer_class = GenreSerializer
+    permission_classes = [IsAuthenticated]
+    search_fields = ['name']
+
+
+class PersonViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Person.objects.all()
+    serializer_class = PersonSerializer
+    permission_classes = [IsAuthenticated]
+    search_fields = ['^name']
+
+
 class MovieViewSet(viewsets.ModelViewSet):
     queryset = Movie.objects.filter(is_active=True)
     filterset_fields = ['category', 'is_hd', 'is_4k', 'is_adult', 'is_featured', 'year']
@@ -33,7 +49,7 @@ class MovieViewSet(viewsets.ModelViewSet):
         return MovieListSerializer
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'home', 'featured', 'recent']:
             return [IsAuthenticated()]
         return [IsAdminUser()]
 
@@ -42,21 +58,23 @@ class MovieViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated and not user.is_staff and not user.parental_password:
             queryset = queryset.filter(is_adult=False)
-        return queryset
+        params = self.request.query_params
+        return filter_terms(queryset, genre=params.get('genre'), actor=params.get('actor'))
+
+    @action(detail=False, methods=['get'])
+    def home(self, request):
+        """Home screen rows (cached), continue watching first."""
+        return Response({'rows': home.get_home(request.user)})
 
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Get featured movies."""
-        movies = self.get_queryset().filter(is_featured=True)[:20]
-        serializer = MovieListSerializer(movies, many=True)
-        return Response(serializer.data)
+        return Response(home.get_row(request.user, 'featured'))
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Get recently added movies."""
-        movies = self.get_queryset().order_by('-created_at')[:20]
-        serializer = MovieListSerializer(movies, many=True)
-        return Response(serializer.data)
+        return Response(home.get_row(request.user, 'recent'))
 
 
 class SeriesViewSet(viewsets.ModelViewSet):
@@ -74,6 +92,10 @@ class SeriesViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAdminUser()]
 
+    def get_queryset(self):
+        params = self.request.query_params
+        return filter_terms(super().get_queryset(), genre=params.get('genre'), actor=params.get('actor'))
+
     @action(detail=True, methods=['get'])
     def seasons(self, request, pk=None):
         """Get all seasons for a series."""
@@ -117,37 +139,48 @@ class WatchHistoryViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def update_position(self, request):
-        """Update watch position."""
+        """Update watch position (buffered, flushed to the history in bulk)."""
         movie_id = request.data.get('movie_id')
         episode_id = request.data.get('episode_id')
-        position = request.data.get('position', 0)
+        try:
+            position = int(request.data.get('position', 0))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'position must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         if movie_id:
-            history, _ = WatchHistory.objects.update_or_create(
-                user=request.user,
-                movie_id=movie_id,
-                defaults={'position': position}
-            )
+            kind, item_id = 'movie', movie_id
         elif episode_id:
-            history, _ = WatchHistory.objects.update_or_create(
-                user=request.user,
-                episode_id=episode_id,
-                defaults={'position': position}
-            )
+            kind, item_id = 'episode', episode_id
         else:
             return Response(
                 {'error': 'movie_id or episode_id required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': f'{kind}_id must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Positions past the item's duration are dropped when flushed
+        position = max(position, 0)
+        if position > positions.MAX_POSITION:
+            return Response(
+                {'error': f'position must be at most {positions.MAX_POSITION} seconds'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response(WatchHistorySerializer(history).data)
+        positions.record_position(request.user.id, kind, item_id, position)
+        return Response({f'{kind}_id': item_id, 'position': position})
 
     @action(detail=False, methods=['get'])
     def continue_watching(self, request):
         """Get content to continue watching."""
-        history = self.get_queryset().filter(
-            completed=False,
-            position__gt=0
-        )[:20]
+        history = positions.continue_watching(request.user)
         serializer = self.get_serializer(history, many=True)
         return Response(serializer.data)
@@ -75,6 +75,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # Database
 DATABASES = {
@@ -89,10 +90,12 @@ DATABASES = {
 }
 
 # Cache
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+        'LOCATION': REDIS_URL,
     }
 }
 
@@ -177,4 +180,42 @@ QUATTRETV = {
     'EPG_UPDATE_INTERVAL': 3600,  # seconds
     'MAX_DEVICES_PER_USER': 5,
     'MAX_CONCURRENT_STREAMS': 2,
+    'LINEUP_CACHE_TTL': int(os.getenv('LINEUP_CACHE_TTL', '300')),  # seconds
+    # Messages are pushed over SSE/long-poll, so boxes only need the watchdog
+    # to stay "online" (DeviceViewSet.online uses a 5 minute window)
+    'WATCHDOG_TIMEOUT': int(os.getenv('WATCHDOG_TIMEOUT', '240')),  # seconds
+    'PUSH_HEARTBEAT': 25,  # seconds between SSE keepalives
+    'PUSH_LONG_POLL_MAX': 55,  # seconds
+    'WARMUP_WORKERS': int(os.getenv('WARMUP_WORKERS', '8')),
+    # Public base URL (e.g. https://tv.example.com) for links built outside a request
+    'PUBLIC_URL': os.getenv('PUBLIC_URL', ''),
+    'XMLTV_CACHE_DIR': os.getenv('XMLTV_CACHE_DIR', str(BASE_DIR / 'cache' / 'xmltv')),
+    'STREAM_PROBE_CONCURRENCY': int(os.getenv('STREAM_PROBE_CONCURRENCY', '50')),
+    'STREAM_PROBE_TIMEOUT': int(os.getenv('STREAM_PROBE_TIMEOUT', '10')),  # seconds
+    'STREAM_HEALTH_RETENTION_DAYS': 7,
+    # Hand out HLS links through the manifest proxy (/hls/playlist.m3u8)
+    'HLS_PROXY_ENABLED': os.getenv('HLS_PROXY_ENABLED', 'False').lower() in ('true', '1', 'yes'),
+    'HLS_TOKEN_TTL': int(os.getenv('HLS_TOKEN_TTL', str(60 * 60 * 24))),  # seconds
+    # Full reload of the PVR scheduler (changes arrive over pub/sub meanwhile)
+    'PVR_SCHEDULER_RESYNC': int(os.getenv('PVR_SCHEDULER_RESYNC', '600')),  # seconds
+    # Concurrent captures per capture worker node
+    'PVR_CAPTURE_WORKERS': int(os.getenv('PVR_CAPTURE_WORKERS', '20')),
+    'PVR_STORAGE_DIR': os.getenv('PVR_STORAGE_DIR', str(MEDIA_ROOT / 'recordings')),
+    # Used to estimate the size of recordings not captured yet (quota checks)
+    'PVR_ESTIMATED_BITRATE': int(os.getenv('PVR_ESTIMATED_BITRATE', '8000000')),  # bits/s
+    # Watch positions are buffered in Redis and written to WatchHistory this often
+    'WATCH_POSITION_FLUSH_INTERVAL': int(os.getenv('WATCH_POSITION_FLUSH_INTERVAL', '30')),  # seconds
+    # Hand out logos and posters through the resizing proxy (/img/)
+    'IMAGE_PROXY_ENABLED': os.getenv('IMAGE_PROXY_ENABLED', 'False').lower() in ('true', '1', 'yes'),
+    'IMAGE_CACHE_DIR': os.getenv('IMAGE_CACHE_DIR', str(BASE_DIR / 'cache' / 'images')),
+    'IMAGE_CACHE_MAX_MB': int(os.getenv('IMAGE_CACHE_MAX_MB', '2048')),
+    # Catalog metadata enrichment (TMDB-compatible API)
+    'METADATA_API_URL': os.getenv('METADATA_API_URL', 'https://api.themoviedb.org/3'),
+    'METADATA_API_KEY': os.getenv('METADATA_API_KEY', ''),
+    'METADATA_LANGUAGE': os.getenv('METADATA_LANGUAGE', 'es-ES'),
+    'METADATA_IMAGE_URL': os.getenv('METADATA_IMAGE_URL', 'https://image.tmdb.org/t/p/w780'),
+    'METADATA_RATE_LIMIT': int(os.getenv('METADATA_RATE_LIMIT', '20')),  # requests/s, all workers
+    'METADATA_CONCURRENCY': int(os.getenv('METADATA_CONCURRENCY', '8')),  # requests in flight per batch
+    'METADATA_CACHE_DIR': os.getenv('METADATA_CACHE_DIR', str(BASE_DIR / 'cache' / 'metadata')),
+    'METADATA_CACHE_DAYS': 30,
 }
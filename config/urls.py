@@ -27,6 +27,19 @@ urlpatterns = [
     path('quattretv/stb/', include('apps.stalker_api.urls')),
     path('quattretv/stb/portal.php', include('apps.stalker_api.portal_urls')),
 
+    # Listas para reproductores externos
+    path('get.php', include('apps.channels.export_urls')),
+    path('xmltv.php', include('apps.epg.export_urls')),
+
+    # Proxy de listas HLS con token firmado
+    path('hls/', include('apps.channels.hls_urls')),
+
+    # Listas de catchup por programa
+    path('catchup/', include('apps.timeshift.catchup_urls')),
+
+    # Logos y carátulas redimensionados
+    path('img/', include('apps.core.image_urls')),
+
     # Portal Admin (en la raíz - al final para no interferir con APIs)
     path('', include('apps.core.portal_urls')),
 ]
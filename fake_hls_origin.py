@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+Origen HLS falso para probar las capturas del PVR y el comprobador de
+streams sin un servidor real.
+
+Sirve un directo que avanza con el reloj (ventana de 6 segmentos), una
+lista maestra con dos calidades y el mismo directo con segmentos sin
+Content-Length:
+
+    http://127.0.0.1:8089/live/index.m3u8
+    http://127.0.0.1:8089/master.m3u8
+    http://127.0.0.1:8089/chunked/index.m3u8
+
+Solo servir (para apuntar un canal y ejecutar run_capture_worker):
+
+    python fake_hls_origin.py --port 8089
+
+Capturar N segundos con apps/pvr/capture.py contra el origen falso y
+comprobar tamaño, duración y memoria usada:
+
+    python fake_hls_origin.py --capture 20 --segment 2 --bitrate 4000000
+
+Comprobar apps/channels/prober.py: el bitrate medido debe ser el del
+origen, tanto con segmentos completos como leídos a medias (más de 2 MB):
+
+    python fake_hls_origin.py --probe --segment 2 --bitrate 4000000
+    python fake_hls_origin.py --probe --segment 6 --bitrate 4000000
+    python fake_hls_origin.py --probe --segment 6 --bitrate 20000000000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WINDOW = 6
+PACKET = 188
+
+
+def make_handler(segment_seconds, bitrate):
+    segment_bytes = int(bitrate * segment_seconds / 8) // PACKET * PACKET
+    started = time.time()
+
+    def playlist():
+        newest = int((time.time() - started) // segment_seconds)
+        first = max(newest - WINDOW + 1, 0)
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{segment_seconds}',
+            f'#EXT-X-MEDIA-SEQUENCE:{first}',
+        ]
+        for sequence in range(first, newest + 1):
+            lines += [f'#EXTINF:{segment_seconds:.3f},', f'{sequence}.ts']
+        return '\n'.join(lines) + '\n'
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_text(self, text):
+            body = text.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/master.m3u8':
+                self.send_text(
+                    '#EXTM3U\n'
+                    '#EXT-X-STREAM-INF:BANDWIDTH=800000\n/live/index.m3u8\n'
+                    f'#EXT-X-STREAM-INF:BANDWIDTH={bitrate}\n/live/index.m3u8\n'
+                )
+            elif path in ('/live/index.m3u8', '/chunked/index.m3u8'):
+                self.send_text(playlist())
+            elif path.startswith(('/live/', '/chunked/')) and path.endswith('.ts'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'video/mp2t')
+                if path.startswith('/live/'):
+                    self.send_header('Content-Length', str(segment_bytes))
+                self.end_headers()
+                # TS packets: sync byte + padding, written in pieces
+                packet = b'\x47' + b'\xff' * (PACKET - 1)
+                chunk = packet * 350
+                sent = 0
+                try:
+                    while sent < segment_bytes:
+                        piece = chunk[:segment_bytes - sent]
+                        self.wfile.write(piece)
+                        sent += len(piece)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The prober stops reading after SEGMENT_MAX_BYTES
+                    pass
+            else:
+                self.send_error(404)
+
+    return Handler
+
+
+def serve(port, segment_seconds, bitrate):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(segment_seconds, bitrate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_capture(port, seconds, segment_seconds, bitrate):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    import httpx
+    from apps.pvr.capture import capture_stream
+
+    async def main(path):
+        async with httpx.AsyncClient(timeout=10) as client:
+            with open(path, 'ab') as out:
+                return await capture_stream(
+                    client, f'http://127.0.0.1:{port}/master.m3u8', out, time.time() + seconds
+                )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'capture.ts')
+        tracemalloc.start()
+        started = time.perf_counter()
+        progress = asyncio.run(main(path))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        size = os.path.getsize(path)
+
+    expected = int(bitrate * segment_seconds / 8) // PACKET * PACKET
+    print(f'Capturados {progress["seconds"]:.0f} s en {elapsed:.1f} s: {size / 1e6:.1f} MB')
+    print(f'Segmentos completos: {size // expected}, bytes sueltos: {size % expected}')
+    print(f'Memoria máxima: {peak / 1e6:.1f} MB')
+    if size != progress['bytes'] or size % expected:
+        raise SystemExit('La captura no coincide con los segmentos servidos')
+
+
+def run_probe(port, segment_seconds, bitrate):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from apps.channels.prober import MAX_BITRATE, SEGMENT_MAX_BYTES, probe_urls
+
+    base = f'http://127.0.0.1:{port}'
+    urls = [f'{base}/live/index.m3u8', f'{base}/master.m3u8', f'{base}/chunked/index.m3u8']
+    results = asyncio.run(probe_urls(urls, timeout=30))
+
+    segment_bytes = int(bitrate * segment_seconds / 8) // PACKET * PACKET
+    partial = segment_bytes > SEGMENT_MAX_BYTES
+    served = min(int(segment_bytes * 8 / segment_seconds), MAX_BITRATE)
+    # Sin Content-Length, un segmento leído a medias no dice su tamaño:
+    # se queda sin bitrate (no hay lista maestra de la que sacarlo)
+    expected = {urls[0]: served, urls[1]: served, urls[2]: None if partial else served}
+    print(f'Segmentos de {segment_bytes / 1e6:.1f} MB ({"leídos a medias" if partial else "completos"})')
+
+    wrong = []
+    for url in urls:
+        result = results[url]
+        print(f'  {url:<45} ok={result["ok"]} bitrate={result["bitrate"]} (esperado {expected[url]})')
+        if not result['ok'] or result['bitrate'] != expected[url]:
+            wrong.append(url)
+    if wrong:
+        raise SystemExit(f'Bitrate incorrecto en {", ".join(wrong)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--segment', type=int, default=6, help='Segundos por segmento')
+    parser.add_argument('--bitrate', type=int, default=4_000_000, help='bits/s')
+    parser.add_argument('--capture', type=int, metavar='SEGUNDOS', help='Capturar en vez de solo servir')
+    parser.add_argument('--probe', action='store_true', help='Comprobar el bitrate que mide el prober')
+    args = parser.parse_args()
+
+    serve(args.port, args.segment, args.bitrate)
+    if args.capture:
+        run_capture(args.port, args.capture, args.segment, args.bitrate)
+        return
+    if args.probe:
+        run_probe(args.port, args.segment, args.bitrate)
+        return
+
+    print(f'Origen HLS en http://127.0.0.1:{args.port}/live/index.m3u8 (Ctrl+C para salir)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""
+Servidor de metadatos falso (API tipo TMDB) para probar el enriquecimiento
+del catálogo sin depender del proveedor real.
+
+Responde a /3/movie/<id>, /3/tv/<id> y /3/find/<imdb_id> con datos
+inventados; los ids que acaban en 0 no existen (404). Con --flaky, una de
+cada N peticiones devuelve 429 con Retry-After.
+
+Solo servir (para ejecutar enrich_catalog contra él):
+
+    python fake_metadata_server.py --port 8095
+    METADATA_API_URL=http://127.0.0.1:8095/3 python manage.py enrich_catalog --sync
+
+Comprobar apps/vod/enrichment.py: peticiones por segundo, peticiones
+simultáneas y caché en disco (una segunda pasada no debe pedir nada):
+
+    python fake_metadata_server.py --check 200 --rate 20 --concurrency 8 --flaky 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GENRES = ['Acción', 'Drama', 'Comedia', 'Ciencia ficción', 'Terror', 'Animación']
+
+
+def movie(provider_id):
+    n = int(provider_id)
+    return {
+        'id': n,
+        'title': f'Película {n}',
+        'original_title': f'Movie {n}',
+        'overview': f'Sinopsis de la película {n}.',
+        'release_date': f'{1980 + n % 45}-05-01',
+        'runtime': 80 + n % 70,
+        'vote_average': round(5 + (n % 50) / 10, 3),
+        'poster_path': f'/poster-{n}.jpg',
+        'backdrop_path': f'/backdrop-{n}.jpg',
+        'imdb_id': f'tt{n:07d}',
+        'genres': [{'id': i, 'name': GENRES[(n + i) % len(GENRES)]} for i in range(2)],
+        'credits': {
+            'cast': [{'name': f'Actor {n}-{i}', 'order': i} for i in range(12)],
+            'crew': [{'name': f'Director {n}', 'job': 'Director'}],
+        },
+        'videos': {'results': [{'site': 'YouTube', 'type': 'Trailer', 'key': f'trailer{n}'}]},
+    }
+
+
+def tv(provider_id):
+    n = int(provider_id)
+    return {
+        'id': n,
+        'name': f'Serie {n}',
+        'original_name': f'Show {n}',
+        'overview': f'Sinopsis de la serie {n}.',
+        'first_air_date': f'{2000 + n % 20}-01-10',
+        'last_air_date': f'{2005 + n % 20}-06-20',
+        'status': 'Ended' if n % 2 else 'Returning Series',
+        'vote_average': 7.25,
+        'poster_path': f'/tv-{n}.jpg',
+        'backdrop_path': None,
+        'genres': [{'id': 1, 'name': GENRES[n % len(GENRES)]}],
+        'credits': {'cast': [{'name': f'Intérprete {n}-{i}', 'order': i} for i in range(3)]},
+        'external_ids': {'imdb_id': f'tt9{n:06d}'},
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.per_second = Counter()
+        self.requests = 0
+        self.throttled = 0
+
+
+def make_handler(stats, latency, flaky):
+    routes = [
+        (re.compile(r'^/3/movie/(\d+)$'), movie),
+        (re.compile(r'^/3/tv/(\d+)$'), tv),
+    ]
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, data, headers=None):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with stats.lock:
+                stats.requests += 1
+                stats.in_flight += 1
+                stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+                stats.per_second[int(time.time())] += 1
+                throttle = flaky and stats.requests % flaky == 0
+            try:
+                time.sleep(latency)
+                if throttle:
+                    with stats.lock:
+                        stats.throttled += 1
+                    self.send_json(429, {'status_message': 'Too many requests'}, {'Retry-After': '1'})
+                    return
+                path = self.path.split('?')[0]
+                find = re.match(r'^/3/find/tt(\d+)$', path)
+                if find:
+                    n = int(find.group(1)) % 1_000_000
+                    results = [{'id': n}] if n % 10 else []
+                    self.send_json(200, {'movie_results': results, 'tv_results': results})
+                    return
+                for pattern, build in routes:
+                    match = pattern.match(path)
+                    if match and int(match.group(1)) % 10:
+                        self.send_json(200, build(match.group(1)))
+                        return
+                self.send_json(404, {'status_message': 'The resource you requested could not be found.'})
+            finally:
+                with stats.lock:
+                    stats.in_flight -= 1
+
+    return Handler
+
+
+def serve(port, stats, latency, flaky):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(stats, latency, flaky))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_check(port, stats, count, rate, concurrency):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from apps.vod.enrichment import fetch_metadata, metadata_values
+    from apps.vod.models import Movie
+
+    # Three of every four by tmdb_id, the rest through /find by IMDb id
+    movies = [
+        Movie(id=i, tmdb_id=str(i)) if i % 4 else Movie(id=i, imdb_id=f'tt{i:07d}')
+        for i in range(1, count + 1)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.QUATTRETV['METADATA_API_URL'] = f'http://127.0.0.1:{port}/3'
+        settings.QUATTRETV['METADATA_CACHE_DIR'] = tmp
+
+        started = time.perf_counter()
+        first = asyncio.run(fetch_metadata('movie', movies, concurrency, rate))
+        elapsed = time.perf_counter() - started
+        first_requests = stats.requests
+
+        second = asyncio.run(fetch_metadata('movie', movies, concurrency, rate))
+        second_requests = stats.requests - first_requests
+
+    found = sum(1 for _, data in first.values() if data)
+    print(f'{count} películas en {elapsed:.1f} s: {found} encontradas, {len(first) - found} desconocidas')
+    print(f'Peticiones: {first_requests} ({stats.throttled} con 429), segunda pasada: {second_requests}')
+    print(f'Máximo por segundo: {max(stats.per_second.values())} (límite {rate})')
+    print(f'Máximo simultáneas: {stats.max_in_flight} (límite {concurrency})')
+    provider_id, data = next(value for value in first.values() if value[1])
+    print('Ejemplo:', {k: str(v)[:40] for k, v in metadata_values('movie', provider_id, data).items()})
+
+    if len(first) != count or first != second:
+        raise SystemExit('Faltan resultados o la caché no devuelve lo mismo')
+    if second_requests:
+        raise SystemExit('La segunda pasada no debería pedir nada (caché en disco)')
+    if max(stats.per_second.values()) > rate or stats.max_in_flight > concurrency:
+        raise SystemExit('Se ha superado el límite de peticiones')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8095)
+    parser.add_argument('--latency', type=float, default=0.05, help='Segundos por respuesta')
+    parser.add_argument('--flaky', type=int, default=0, metavar='N', help='Una de cada N peticiones da 429')
+    parser.add_argument('--check', type=int, metavar='PELÍCULAS', help='Comprobar en vez de solo servir')
+    parser.add_argument('--rate', type=int, default=20, help='Peticiones por segundo (con --check)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Peticiones simultáneas (con --check)')
+    args = parser.parse_args()
+
+    stats = Stats()
+    serve(args.port, stats, args.latency, args.flaky)
+    if args.check:
+        run_check(args.port, stats, args.check, args.rate, args.concurrency)
+        return
+
+    print(f'Metadatos en http://127.0.0.1:{args.port}/3 (Ctrl+C para salir)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Carga simple contra los endpoints calientes del portal.
+
+Sirve para comparar el despliegue WSGI (gunicorn sync) con el ASGI
+(gunicorn + UvicornWorker) sobre la misma base de datos:
+
+    python loadtest.py http://localhost:8000 --mac 00:1A:79:00:00:01 -c 50 -n 2000
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PATHS = [
+    '/stalker_portal/c/?type=itv&action=get_ordered_list&p=0',
+    '/stalker_portal/c/?type=itv&action=get_genres',
+    '/stalker_portal/c/?type=itv&action=get_short_epg&ch_id=1',
+    '/stalker_portal/c/?type=watchdog&action=get_events',
+]
+
+
+def run(base_url, path, mac, concurrency, total):
+    session = requests.Session()
+    session.cookies.set('mac', mac)
+    url = base_url.rstrip('/') + path
+
+    def hit(_):
+        start = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(hit, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    errors = sum(1 for r in results if not r[1])
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{path}")
+    print(f"  {total / elapsed:8.1f} req/s  "
+          f"p50={quantiles[49]:.1f}ms p95={quantiles[94]:.1f}ms p99={quantiles[98]:.1f}ms  "
+          f"errors={errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='QuattreTV portal load test')
+    parser.add_argument('base_url')
+    parser.add_argument('--mac', required=True, help='MAC de un dispositivo registrado')
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('-n', '--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    for path in PATHS:
+        run(args.base_url, path, args.mac, args.concurrency, args.requests)
+
+
+if __name__ == '__main__':
+    main()